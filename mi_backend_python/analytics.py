@@ -0,0 +1,315 @@
+# analytics.py
+"""
+Endpoints de ingesta de analytics (sesiones, eventos, heartbeats).
+
+El cliente (`src/hooks/useAnalytics.ts`) acumula eventos y los envía en lotes
+a /api/analytics/events/batch en lugar de un `fetch` por pregunta vista o
+respondida (~80+ requests por sesión de 41 preguntas).
+
+Beneficios de rendimiento del endpoint de lotes:
+- Un solo request HTTP por lote (sin preflight CORS: acepta text/plain, que
+  es lo que envía `navigator.sendBeacon`)
+- Cuerpo opcionalmente comprimido con gzip (Content-Encoding o magic bytes)
+- Validación del lote completo en una sola pasada con `model_validate_json`
+  (parseo + validación en Rust, sin pasar por dicts intermedios)
+- Inserción del lote con executemany en una sola transacción, que además
+  actualiza last_activity (el lote cuenta como heartbeat)
+
+Los endpoints del dashboard (/logs, /health) responden desde memoria; ver
+`registro_logs.py`. El feed en vivo (/stream) está en `analytics_en_vivo.py`.
+El embudo (/funnel) lee las particiones mensuales de `eventos_particionados.py`.
+"""
+import json
+import logging
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Annotated, List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from starlette.concurrency import run_in_threadpool
+
+from analytics_en_vivo import REINTENTO_MS, DemasiadosSuscriptores, evento_sse
+from auth import verificar_dashboard
+from geoip import ip_cliente, resolver_pais
+
+router = APIRouter(prefix="/api/analytics")
+
+MAX_EVENTOS_LOTE = 200
+MAX_BYTES_LOTE = 256 * 1024  # Cuerpo recibido (comprimido o no)
+MAX_BYTES_DESCOMPRIMIDOS = 1024 * 1024  # Protección contra gzip bombs
+VENTANA_TS_CLIENTE = timedelta(hours=24)  # Timestamps del cliente aceptados hacia atrás
+MAX_EVENT_DATA = 2000  # Caracteres de event_data tal como se guarda (dicts ya serializados)
+
+DatosEvento = Annotated[str, Field(max_length=MAX_EVENT_DATA)]
+
+TIPOS_DISPOSITIVO = {"mobile", "desktop", "tablet"}
+
+# Embudo del dashboard: event_type -> clave de la respuesta (mismos nombres que FunnelData)
+PASOS_EMBUDO = {
+    "form_start": "form_starts",
+    "form_submit": "form_submits",
+    "questionnaire_start": "questionnaire_starts",
+    "confirmation_page_viewed": "confirmations",
+}
+PREFIJO_PREGUNTAS = "question_"
+MIN_VISTAS_PREGUNTA_CRITICA = 10  # Con menos vistas la tasa de abandono es ruido
+MAX_DIAS_EMBUDO = 400
+
+
+class NuevaSesion(BaseModel):
+    device_info: Optional[str] = Field(None, max_length=200)
+    utm_source: Optional[str] = Field(None, max_length=50)
+
+
+class EventoIndividual(BaseModel):
+    session_id: str = Field(max_length=64)
+    event_type: str = Field(min_length=1, max_length=100)
+    event_data: Optional[DatosEvento] = None
+
+
+class Heartbeat(BaseModel):
+    session_id: str = Field(max_length=64)
+
+
+class EventoLote(BaseModel):
+    model_config = {"extra": "forbid"}
+
+    event_type: str = Field(min_length=1, max_length=100)
+    event_data: Union[DatosEvento, dict, None] = None
+    ts: Optional[int] = None  # Epoch en ms del momento real del evento (cliente)
+
+    @field_validator("event_data")
+    @classmethod
+    def _serializar(cls, valor):
+        """Los dicts se guardan como JSON: el límite aplica al texto que llega a la base."""
+        if not isinstance(valor, dict):
+            return valor
+        texto = json.dumps(valor, ensure_ascii=False)
+        if len(texto) > MAX_EVENT_DATA:
+            raise ValueError(f"event_data supera {MAX_EVENT_DATA} caracteres")
+        return texto
+
+
+class LoteEventos(BaseModel):
+    model_config = {"extra": "forbid"}
+
+    session_id: str = Field(max_length=64)
+    events: List[EventoLote] = Field(min_length=1, max_length=MAX_EVENTOS_LOTE)
+
+
+def _tipo_dispositivo(device_info: Optional[str], user_agent: str) -> str:
+    if device_info in TIPOS_DISPOSITIVO:
+        return device_info
+    agente = user_agent.lower()
+    if "ipad" in agente or "tablet" in agente:
+        return "tablet"
+    return "mobile" if "mobile" in agente else "desktop"
+
+
+def _momento_evento(ts: Optional[int], ahora: datetime) -> str:
+    """Usa el timestamp del cliente si es plausible; si no, la hora del servidor."""
+    if ts is not None:
+        try:
+            momento = datetime.fromtimestamp(ts / 1000)
+        except (OverflowError, OSError, ValueError):
+            return ahora.isoformat()
+        if ahora - VENTANA_TS_CLIENTE <= momento <= ahora + timedelta(minutes=1):
+            return momento.isoformat()
+    return ahora.isoformat()
+
+
+def _descomprimir(cuerpo: bytes, content_encoding: str) -> bytes:
+    if content_encoding != "gzip" and not cuerpo.startswith(b"\x1f\x8b"):
+        return cuerpo
+    descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        datos = descompresor.decompress(cuerpo, MAX_BYTES_DESCOMPRIMIDOS)
+    except zlib.error:
+        raise HTTPException(status_code=400, detail="Cuerpo gzip inválido")
+    if descompresor.unconsumed_tail:
+        raise HTTPException(status_code=413, detail="Lote demasiado grande")
+    return datos
+
+
+def _limitar_sesion(request: Request, session_id: str) -> None:
+    """Presupuesto por sesión (además del por IP del middleware); lanza 429 si se excede."""
+    limitador = request.app.state.limitador
+    if limitador is not None:
+        limitador.verificar_sesion(session_id)
+
+
+@router.post("/session")
+async def crear_sesion(datos: NuevaSesion, request: Request):
+    user_agent = request.headers.get("user-agent", "")[:300]
+    # Búsqueda local en la tabla mmap (microsegundos): no hace falta un hilo
+    country, country_code = resolver_pais(ip_cliente(request))
+    session_id = await run_in_threadpool(
+        request.app.state.analytics_store.crear_sesion,
+        datos.device_info,
+        user_agent,
+        _tipo_dispositivo(datos.device_info, user_agent),
+        datos.utm_source,
+        country,
+        country_code,
+    )
+    return {"session_id": session_id}
+
+
+@router.post("/event")
+async def registrar_evento(evento: EventoIndividual, request: Request):
+    """Evento individual (compatibilidad con clientes que aún no usan lotes)."""
+    _limitar_sesion(request, evento.session_id)
+    filas = [(evento.event_type, evento.event_data, datetime.now().isoformat())]
+    insertados = await run_in_threadpool(
+        request.app.state.analytics_store.insertar_eventos, evento.session_id, filas
+    )
+    if insertados < 0:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return {"status": "success"}
+
+
+@router.post("/heartbeat")
+async def heartbeat(datos: Heartbeat, request: Request):
+    _limitar_sesion(request, datos.session_id)
+    existe = await run_in_threadpool(request.app.state.analytics_store.registrar_actividad, datos.session_id)
+    if not existe:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return {"status": "success"}
+
+
+@router.post("/events/batch", status_code=202)
+async def registrar_lote(request: Request):
+    """Recibe un lote de eventos (JSON, opcionalmente gzip; compatible con sendBeacon).
+
+    Formato: {"session_id": "...", "events": [{"event_type": "...", "event_data": ..., "ts": 1700000000000}]}
+    El lote se valida completo: si un evento es inválido, no se inserta ninguno.
+    """
+    cuerpo = await request.body()
+    if len(cuerpo) > MAX_BYTES_LOTE:
+        raise HTTPException(status_code=413, detail="Lote demasiado grande")
+    cuerpo = _descomprimir(cuerpo, request.headers.get("content-encoding", "").lower())
+
+    try:
+        lote = LoteEventos.model_validate_json(cuerpo)
+    except ValidationError as e:
+        logging.warning(f"⚠️ Lote de analytics inválido: {e.error_count()} errores")
+        # Sin ctx: trae la excepción original de los validadores propios (no serializable)
+        detalle = e.errors(include_url=False, include_input=False, include_context=False)
+        raise HTTPException(status_code=422, detail=detalle)
+    _limitar_sesion(request, lote.session_id)
+
+    ahora = datetime.now()
+    filas = [(evento.event_type, evento.event_data, _momento_evento(evento.ts, ahora)) for evento in lote.events]
+    insertados = await run_in_threadpool(
+        request.app.state.analytics_store.insertar_eventos, lote.session_id, filas
+    )
+    if insertados < 0:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada")
+    return {"status": "success", "insertados": insertados}
+
+
+# ==============================================================================
+# DASHBOARD: LOGS Y SALUD (desde memoria, ver registro_logs.py)
+# ==============================================================================
+
+@router.get("/logs", dependencies=[Depends(verificar_dashboard)])
+async def logs_sistema(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    level: Optional[str] = Query(None, max_length=10),
+):
+    """Logs más recientes (del más nuevo al más antiguo), opcionalmente por nivel."""
+    return request.app.state.monitor_logs.ultimos(limit, level)
+
+
+@router.get("/health", dependencies=[Depends(verificar_dashboard)])
+async def salud_sistema(request: Request):
+    return request.app.state.monitor_logs.salud()
+
+
+# ==============================================================================
+# DASHBOARD: EMBUDO (desde las particiones mensuales de eventos)
+# ==============================================================================
+
+def _resumen_embudo(conteos: dict) -> dict:
+    embudo = {clave: conteos.get(tipo, 0) for tipo, clave in PASOS_EMBUDO.items()}
+    preguntas = {}
+    for tipo, sesiones in conteos.items():
+        if tipo.startswith(f"{PREFIJO_PREGUNTAS}viewed_"):
+            pregunta = tipo[len(f"{PREFIJO_PREGUNTAS}viewed_"):]
+            respondidas = conteos.get(f"{PREFIJO_PREGUNTAS}answered_{pregunta}", 0)
+            preguntas[pregunta] = {
+                "viewed": sesiones,
+                "answered": respondidas,
+                "dropoff_rate": round(max(sesiones - respondidas, 0) * 100 / sesiones, 1),
+            }
+    criticas = [(p, d) for p, d in preguntas.items() if d["viewed"] >= MIN_VISTAS_PREGUNTA_CRITICA]
+    critica = None
+    if criticas:
+        pregunta, datos = max(criticas, key=lambda c: c[1]["dropoff_rate"])
+        critica = {
+            "question_id": pregunta,
+            "dropoff_rate": datos["dropoff_rate"],
+            "viewed": datos["viewed"],
+            "abandoned": max(datos["viewed"] - datos["answered"], 0),
+        }
+    return {"funnel": embudo, "question_dropoff": preguntas, "killer_question": critica}
+
+
+@router.get("/funnel", dependencies=[Depends(verificar_dashboard)])
+async def embudo(
+    request: Request,
+    start_date: date = Query(...),
+    end_date: date = Query(...),
+):
+    """Embudo del formulario y abandono por pregunta (sesiones distintas por paso).
+
+    Solo abre las particiones mensuales del rango. Los eventos que aún no se
+    migraron desde analytics.db (ver eventos_particionados.py) no se cuentan.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=422, detail="end_date debe ser posterior a start_date")
+    if (end_date - start_date).days > MAX_DIAS_EMBUDO:
+        raise HTTPException(status_code=422, detail=f"El rango máximo es de {MAX_DIAS_EMBUDO} días")
+    conteos = await run_in_threadpool(
+        request.app.state.analytics_store.sesiones_por_evento,
+        PASOS_EMBUDO, PREFIJO_PREGUNTAS, start_date, end_date,
+    )
+    return {**_resumen_embudo(conteos), "generated_at": datetime.now().isoformat()}
+
+
+@router.get("/stream", dependencies=[Depends(verificar_dashboard)])
+async def stream_en_vivo(request: Request):
+    """Server-Sent Events: un `snapshot` al conectar y luego `delta` como máximo una vez por segundo."""
+    feed = request.app.state.feed_analytics
+    try:
+        cola = feed.canal.suscribir()
+    except DemasiadosSuscriptores as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        secuencia, instantanea = await run_in_threadpool(feed.instantanea)
+    except Exception:
+        feed.canal.desuscribir(cola)
+        raise
+
+    async def generar():
+        try:
+            yield f"retry: {REINTENTO_MS}\n\n".encode() + evento_sse("snapshot", instantanea)
+            while True:
+                mensaje = await cola.get()
+                if mensaje is None:  # Cliente lento o apagado del worker
+                    return
+                secuencia_mensaje, datos = mensaje
+                if secuencia_mensaje and secuencia_mensaje <= secuencia:
+                    continue  # Delta calculado antes del snapshot: ya está incluido en él
+                yield datos
+        finally:
+            feed.canal.desuscribir(cola)
+
+    return StreamingResponse(
+        generar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,229 @@
+# analytics_en_vivo.py
+"""
+Feed en vivo del dashboard por Server-Sent Events (/api/analytics/stream).
+
+Antes el dashboard repetía siete requests cada 30 s por cada admin con la
+página abierta. Ahora abre una sola conexión SSE y recibe deltas:
+
+    event: snapshot   {"active_users", "sessions_today", "errors_24h", "conversions_today", ...}
+    event: delta      {"new_sessions", "conversions", "conversion_amount", "active_users",
+                       "errors_24h", "status", "errors"}
+
+`new_sessions` y `conversions` son incrementales; `active_users` y
+`errors_24h` son valores absolutos (se envían solo cuando cambian) y `errors`
+trae a lo sumo los últimos MAX_ERRORES_DELTA errores para la lista de logs.
+
+Funcionamiento:
+- Cada worker tiene un canal pub/sub en memoria con una cola por cliente SSE.
+- Una tarea de fondo, solo mientras el worker tiene clientes conectados, lee
+  una vez por segundo lo nuevo en las bases compartidas (sesiones y leads por
+  PK > cursor, logs de error desde los buffers de `registro_logs.py`) y
+  publica UN mensaje con todo lo ocurrido en ese segundo. Como lee las bases
+  compartidas, cada cliente ve la actividad de TODOS los workers sin importar
+  a cuál está conectado.
+- La ruta de ingesta no cambia: no agrega latencia a sesiones, eventos ni
+  diagnósticos.
+
+Beneficios de rendimiento:
+- A lo sumo un mensaje por segundo por cliente (coalescido), y ninguno si no
+  pasó nada (solo un comentario de keep-alive cada PING_SEGUNDOS)
+- Tres consultas indexadas por segundo por worker, sin importar cuántos
+  admins estén conectados; cero consultas si no hay ninguno
+- Un cliente lento no frena a los demás: si su cola se llena se le cierra la
+  conexión y al reconectar recibe un snapshot nuevo
+
+Consistencia: snapshot y deltas se calculan bajo el mismo lock y sobre los
+mismos cursores. El snapshot cuenta solo hasta esos cursores y retorna la
+secuencia del último delta calculado; el stream descarta los deltas que ya
+estaban en cola con secuencia <= a esa, así nada se cuenta dos veces.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from analytics_store import AnalyticsStore
+from lead_store import LeadStore
+from registro_logs import MonitorLogs
+
+INTERVALO_FEED = 1.0  # segundos: máximo un mensaje por segundo por cliente
+MINUTOS_ACTIVO = 5  # Una sesión con actividad en los últimos N minutos cuenta como usuario activo
+PING_SEGUNDOS = 15  # Keep-alive para proxies que cortan conexiones inactivas
+MAX_COLA = 10  # Mensajes pendientes por cliente antes de desconectarlo
+MAX_ERRORES_DELTA = 20
+MAX_SUSCRIPTORES = int(os.environ.get("ANALYTICS_STREAM_MAX_CLIENTES", "50"))  # Por worker
+REINTENTO_MS = 5000  # `retry:` sugerido al EventSource del cliente
+
+
+class DemasiadosSuscriptores(RuntimeError):
+    """El worker ya tiene MAX_SUSCRIPTORES conexiones SSE abiertas."""
+
+
+def evento_sse(tipo: str, datos: dict) -> bytes:
+    return f"event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False, separators=(',', ':'))}\n\n".encode()
+
+
+class CanalEnVivo:
+    """Pub/sub en memoria: una cola acotada por cliente SSE (solo se usa desde el event loop)."""
+
+    def __init__(self, max_suscriptores: int = MAX_SUSCRIPTORES):
+        self.max_suscriptores = max_suscriptores
+        self.suscriptores: Set[asyncio.Queue] = set()
+
+    def suscribir(self) -> asyncio.Queue:
+        if len(self.suscriptores) >= self.max_suscriptores:
+            raise DemasiadosSuscriptores(f"Máximo {self.max_suscriptores} conexiones en vivo por worker")
+        # Elementos: (secuencia del delta, bytes); 0 = siempre se envía (pings); None = fin
+        cola: asyncio.Queue = asyncio.Queue(MAX_COLA)
+        self.suscriptores.add(cola)
+        return cola
+
+    def desuscribir(self, cola: asyncio.Queue) -> None:
+        self.suscriptores.discard(cola)
+
+    def _cerrar(self, cola: asyncio.Queue) -> None:
+        """None = fin del stream; se descarta lo pendiente para que quepa."""
+        self.suscriptores.discard(cola)
+        while not cola.empty():
+            cola.get_nowait()
+        cola.put_nowait(None)
+
+    def publicar(self, mensaje: bytes, secuencia: int = 0) -> None:
+        for cola in list(self.suscriptores):
+            if cola.full():
+                # Los deltas son incrementales: perder uno deja al cliente desfasado,
+                # así que se le cierra el stream y al reconectar recibe un snapshot
+                logging.warning("⚠️ Cliente del stream de analytics demasiado lento: desconectado")
+                self._cerrar(cola)
+            else:
+                cola.put_nowait((secuencia, mensaje))
+
+    def cerrar(self) -> None:
+        for cola in list(self.suscriptores):
+            self._cerrar(cola)
+
+
+class FeedAnalytics:
+    """Calcula snapshots y deltas a partir de las bases compartidas entre workers."""
+
+    def __init__(self, analytics_store: AnalyticsStore, lead_store: LeadStore, monitor_logs: MonitorLogs):
+        self.analytics_store = analytics_store
+        self.lead_store = lead_store
+        self.monitor_logs = monitor_logs
+        self.canal = CanalEnVivo()
+        self._lock = threading.Lock()  # instantanea() y delta() corren en hilos del threadpool
+        self._cursores: Optional[dict] = None
+        self._secuencia = 0  # Deltas calculados; el snapshot informa hasta cuál incluye
+        self._activos = 0
+        self._errores_24h = 0
+
+    def _usuarios_activos(self) -> int:
+        desde = (datetime.now() - timedelta(minutes=MINUTOS_ACTIVO)).isoformat()
+        return self.analytics_store.contar_activas(desde)
+
+    def _fijar_cursores(self) -> None:
+        ahora = datetime.now().isoformat()  # "Desde ahora": solo interesa el último id
+        self._cursores = {
+            "sesiones": self.analytics_store.contar_sesiones_desde(ahora, 0)[1],
+            "leads": self.lead_store.conversiones_desde(ahora, 0)[2],
+            "errores": self.monitor_logs.ultimo_id,
+        }
+        self._activos = self._usuarios_activos()
+        self._errores_24h = self.monitor_logs.salud()["errors_24h"]
+
+    def reiniciar(self) -> None:
+        """Sin clientes: se olvidan los cursores para no acumular deltas viejos."""
+        with self._lock:
+            self._cursores = None
+
+    def instantanea(self) -> Tuple[int, dict]:
+        """Estado completo para un cliente que se conecta (bloqueante: usar en un hilo).
+
+        Sesiones y conversiones se cuentan hasta los cursores compartidos: el
+        próximo delta empieza justo donde termina el snapshot. Retorna
+        (secuencia del último delta ya incluido, datos).
+        """
+        with self._lock:
+            if self._cursores is None:
+                self._fijar_cursores()
+            hoy = date.today().isoformat()
+            sesiones, _ = self.analytics_store.contar_sesiones_desde(hoy, 0, self._cursores["sesiones"])
+            conversiones, monto, _ = self.lead_store.conversiones_desde(hoy, 0, self._cursores["leads"])
+            salud = self.monitor_logs.salud()
+            return self._secuencia, {
+                "active_users": self._activos,
+                "sessions_today": sesiones,
+                "conversions_today": conversiones,
+                "conversion_amount_today": monto,
+                "errors_24h": salud["errors_24h"],
+                "status": salud["status"],
+                "timestamp": salud["timestamp"],
+            }
+
+    def delta(self) -> Tuple[int, Optional[dict]]:
+        """Lo ocurrido en todos los workers desde la llamada anterior.
+
+        Retorna (secuencia, cambios o None si nada cambió).
+        """
+        with self._lock:
+            self._secuencia += 1
+            if self._cursores is None:
+                self._fijar_cursores()
+                return self._secuencia, None
+            cursores = self._cursores
+            cambios = {}
+
+            nuevas, cursores["sesiones"] = self.analytics_store.contar_sesiones_desde("", cursores["sesiones"])
+            if nuevas:
+                cambios["new_sessions"] = nuevas
+
+            conversiones, monto, cursores["leads"] = self.lead_store.conversiones_desde("", cursores["leads"])
+            if conversiones:
+                cambios["conversions"] = conversiones
+                cambios["conversion_amount"] = monto
+
+            activos = self._usuarios_activos()
+            if activos != self._activos:
+                self._activos = cambios["active_users"] = activos
+
+            # Si hubo más de MAX_ERRORES_DELTA en un segundo, la lista trae solo los últimos;
+            # el KPI no se deriva de la lista sino del contador absoluto de 24 h
+            errores, cursores["errores"] = self.monitor_logs.errores_despues_de(cursores["errores"], MAX_ERRORES_DELTA)
+            if errores:
+                cambios["errors"] = errores
+            salud = self.monitor_logs.salud()
+            if salud["errors_24h"] != self._errores_24h:
+                self._errores_24h = cambios["errors_24h"] = salud["errors_24h"]
+                cambios["status"] = salud["status"]
+            return self._secuencia, cambios or None
+
+
+async def ciclo_feed(feed: FeedAnalytics, intervalo: float = INTERVALO_FEED):
+    """Tarea de fondo del lifespan: publica un delta coalescido por segundo."""
+    ultimo_mensaje = time.monotonic()
+    fallo_reportado = False
+    while True:
+        await asyncio.sleep(intervalo)
+        if not feed.canal.suscriptores:
+            feed.reiniciar()
+            continue
+        try:
+            secuencia, cambios = await run_in_threadpool(feed.delta)
+            fallo_reportado = False
+        except Exception as e:
+            if not fallo_reportado:  # Una vez por racha: los logs de error también alimentan el feed
+                fallo_reportado = True
+                logging.error(f"❌ No se pudo calcular el delta del stream de analytics: {e}")
+            continue
+        if cambios:
+            feed.canal.publicar(evento_sse("delta", cambios), secuencia)
+            ultimo_mensaje = time.monotonic()
+        elif time.monotonic() - ultimo_mensaje >= PING_SEGUNDOS:
+            feed.canal.publicar(b": ping\n\n")
+            ultimo_mensaje = time.monotonic()
@@ -0,0 +1,241 @@
+# analytics_store.py
+"""
+Almacenamiento de analytics (sesiones, eventos y logs del sistema) en SQLite.
+
+El esquema es el mismo que puebla `seed_sample_data.py`, así que una base
+`analytics.db` generada con ese script funciona sin cambios. Los eventos nuevos
+van a particiones mensuales (ver `eventos_particionados.py`); los que queden en
+la tabla `events` de analytics.db se migran en background.
+
+Beneficios de rendimiento:
+- WAL + synchronous=NORMAL: la ingesta no bloquea las lecturas del dashboard
+- Una conexión por hilo (se reutiliza entre requests)
+- Inserción de lotes de eventos y de logs con executemany en UNA transacción
+"""
+import logging
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from eventos_particionados import EventosParticionados
+
+
+class AnalyticsStore:
+    """Acceso a analytics.db con una conexión SQLite por hilo."""
+
+    def __init__(self, ruta: str, eventos_dir: Path):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._inicializar()
+        self.eventos = EventosParticionados(eventos_dir)
+        logging.info(f"📊 Base de datos de Analytics inicializada en: {ruta}")
+
+    def _conectar(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._conectar()
+        return conn
+
+    def _inicializar(self) -> None:
+        conn = self._conectar()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    device_info TEXT,
+                    user_agent TEXT,
+                    is_converted INTEGER DEFAULT 0,
+                    conversion_amount REAL DEFAULT 0,
+                    last_activity TEXT,
+                    country TEXT,
+                    country_code TEXT,
+                    device_type TEXT,
+                    utm_source TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    event_type TEXT NOT NULL,
+                    event_data TEXT,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS system_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    module TEXT
+                )
+            """)
+            try:
+                # Columna nueva: las bases generadas por seed_sample_data.py no la tienen
+                conn.execute("ALTER TABLE system_logs ADD COLUMN traceback TEXT")
+            except sqlite3.OperationalError:
+                pass  # Ya existe
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at)")
+            # Usuarios activos del stream en vivo: rango sobre las sesiones recientes, no un scan
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions(last_activity)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_events_session ON events(session_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_system_logs_timestamp ON system_logs(timestamp)")
+            # Filas antiguas (y las de seed_sample_data.py previas) usan isoformat() en hora local:
+            # se pasan al formato de registro_logs (UTC "YYYY-MM-DD HH:MM:SS") para que las
+            # ventanas por timestamp comparen un solo formato. Idempotente: solo toca filas con 'T'.
+            conn.execute("""
+                UPDATE system_logs SET timestamp = strftime('%Y-%m-%d %H:%M:%S', timestamp, 'utc')
+                WHERE instr(timestamp, 'T') > 0 AND strftime('%Y-%m-%d %H:%M:%S', timestamp, 'utc') IS NOT NULL
+            """)
+        conn.close()
+
+    # --- SESIONES ---
+    def crear_sesion(
+        self,
+        device_info: Optional[str],
+        user_agent: Optional[str],
+        device_type: Optional[str],
+        utm_source: Optional[str],
+        country: Optional[str] = None,
+        country_code: Optional[str] = None,
+    ) -> str:
+        session_id = str(uuid.uuid4())
+        ahora = datetime.now().isoformat()
+        conn = self._conexion()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO sessions (session_id, created_at, device_info, user_agent,
+                    last_activity, country, country_code, device_type, utm_source)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (session_id, ahora, device_info, user_agent, ahora, country, country_code, device_type, utm_source),
+            )
+        return session_id
+
+    def registrar_actividad(self, session_id: str) -> bool:
+        """Actualiza last_activity (heartbeat). Retorna False si la sesión no existe."""
+        conn = self._conexion()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE sessions SET last_activity = ? WHERE session_id = ?",
+                (datetime.now().isoformat(), session_id),
+            )
+        return cursor.rowcount > 0
+
+    # --- EVENTOS ---
+    def insertar_eventos(self, session_id: str, eventos: Iterable[Tuple[str, Optional[str], str]]) -> int:
+        """Inserta (event_type, event_data, created_at) en la partición de cada mes.
+
+        También actualiza last_activity de la sesión (cada lote cuenta como
+        heartbeat). Retorna la cantidad insertada, o -1 si la sesión no existe.
+        """
+        if not self.registrar_actividad(session_id):
+            return -1
+        return self.eventos.insertar((session_id, tipo, datos, creado) for tipo, datos, creado in eventos)
+
+    def contar_sesiones_desde(self, desde: str, despues_de_rowid: int,
+                              hasta_rowid: Optional[int] = None) -> Tuple[int, int]:
+        """Sesiones creadas desde `desde` con rowid mayor al dado (conteo incremental).
+
+        `hasta_rowid` acota el conteo a un cursor ya leído (snapshot consistente).
+        Retorna (cantidad, último rowid visto).
+        """
+        conn = self._conexion()
+        cantidad, maximo = conn.execute(
+            "SELECT COUNT(*), MAX(rowid) FROM sessions WHERE rowid > ? AND rowid <= ? AND created_at >= ?",
+            (despues_de_rowid, hasta_rowid if hasta_rowid is not None else 2**63 - 1, desde),
+        ).fetchone()
+        if maximo is None:
+            (maximo,) = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM sessions").fetchone()
+        return cantidad, max(maximo, despues_de_rowid)
+
+    def contar_activas(self, desde: str) -> int:
+        """Sesiones con actividad (heartbeat o eventos) desde `desde`."""
+        (cantidad,) = self._conexion().execute(
+            "SELECT COUNT(*) FROM sessions WHERE last_activity >= ?", (desde,)
+        ).fetchone()
+        return cantidad
+
+    def sesiones_por_evento(self, tipos: Iterable[str], prefijo: str, desde: date, hasta: date) -> Dict[str, int]:
+        """Sesiones distintas por event_type en [desde, hasta], para `tipos` y los que empiezan con `prefijo`.
+
+        Lee solo las particiones mensuales del rango. Un rango de más de 10
+        meses se cuenta por tramos: una sesión partida entre dos tramos
+        cuenta en ambos.
+        """
+        tipos = list(tipos)
+        marcas = ", ".join("?" * len(tipos)) or "NULL"
+        filas = self.eventos.consultar(
+            f"""SELECT event_type, COUNT(DISTINCT session_id) FROM events
+                WHERE created_at >= ? AND created_at < ?
+                  AND (event_type IN ({marcas}) OR substr(event_type, 1, ?) = ?)
+                GROUP BY event_type""",
+            (desde.isoformat(), (hasta + timedelta(days=1)).isoformat(), *tipos, len(prefijo), prefijo),
+            desde=desde,
+            hasta=hasta,
+        )
+        conteos: Counter = Counter()
+        for tipo, sesiones in filas:
+            conteos[tipo] += sesiones
+        return dict(conteos)
+
+    # --- LOGS DEL SISTEMA ---
+    def insertar_logs(self, logs: Iterable[Tuple[str, str, str, Optional[str], Optional[str]]]) -> None:
+        """Inserta (timestamp, level, message, module, traceback) en una sola transacción."""
+        conn = self._conexion()
+        with conn:
+            conn.executemany(
+                "INSERT INTO system_logs (timestamp, level, message, module, traceback) VALUES (?, ?, ?, ?, ?)",
+                logs,
+            )
+
+    def logs_despues_de(self, ultimo_id: int, limite: int) -> List[tuple]:
+        """Logs con id > ultimo_id en orden ascendente (lectura incremental por PK)."""
+        return self._conexion().execute(
+            """
+            SELECT id, timestamp, level, message, module, traceback FROM system_logs
+            WHERE id > ? ORDER BY id LIMIT ?
+            """,
+            (ultimo_id, limite),
+        ).fetchall()
+
+    def ultimos_logs(self, niveles: Tuple[str, ...], limite: int) -> List[tuple]:
+        """Los `limite` logs más recientes de esos niveles, en orden ascendente."""
+        marcadores = ",".join("?" * len(niveles))
+        filas = self._conexion().execute(
+            f"""
+            SELECT id, timestamp, level, message, module, traceback FROM system_logs
+            WHERE level IN ({marcadores}) ORDER BY id DESC LIMIT ?
+            """,
+            (*niveles, limite),
+        ).fetchall()
+        filas.reverse()
+        return filas
+
+    def niveles_desde(self, desde: str) -> List[Tuple[str, str]]:
+        """(timestamp, level) de los WARNING/ERROR/CRITICAL desde `desde`."""
+        return self._conexion().execute(
+            """
+            SELECT timestamp, level FROM system_logs
+            WHERE timestamp >= ? AND level IN ('WARNING', 'ERROR', 'CRITICAL')
+            """,
+            (desde,),
+        ).fetchall()
+
+    def ultimo_id_log(self) -> int:
+        (maximo,) = self._conexion().execute("SELECT COALESCE(MAX(id), 0) FROM system_logs").fetchone()
+        return maximo
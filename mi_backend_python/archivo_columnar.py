@@ -0,0 +1,233 @@
+# archivo_columnar.py
+"""
+Archivo columnar de diagnósticos históricos para analítica offline.
+
+Una etapa en background compacta los diagnósticos de cada día ya cerrado en
+un archivo Arrow IPC (`diagnosticos-YYYY-MM-DD.arrow`) con columnas tipadas:
+bitmasks de respuestas, conteos por severidad, multa, tipo de empresa y rango
+de trabajadores. Los datos personales (nombre, email, teléfono) NO se archivan.
+
+Beneficios de rendimiento:
+- Arrow IPC sin compresión: los archivos se abren con memory-map (zero-copy),
+  sin parsear JSON ni deserializar filas
+- Solo se abren los archivos del rango de fechas consultado
+- Agregaciones vectorizadas con pyarrow.compute (millones de filas en segundos)
+- La compactación escribe por lotes (memoria constante) y de forma atómica
+
+Ejemplos:
+    agregar(ARCHIVO_DIR, ["tipo_empresa", "rango_trabajadores"],
+            [("monto_multa_soles", "mean"), ("id", "count")],
+            desde=date.today() - timedelta(days=365))
+    preguntas_mas_incumplidas(ARCHIVO_DIR, agrupar_por="tipo_empresa")
+"""
+import asyncio
+import fcntl
+import logging
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from lead_store import NUMERO_PREGUNTAS, LeadStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+
+PREFIJO = "diagnosticos-"
+EXTENSION = ".arrow"
+INTERVALO_COMPACTACION = 3600  # segundos entre ciclos
+
+# Columnas leídas del LeadStore (además de id y created_at)
+COLUMNAS_ORIGEN = [
+    "diagnostico_id",
+    "tipo_empresa",
+    "numero_trabajadores",
+    "rango_trabajadores",
+    "severidad_maxima",
+    "mascara_respondidas",
+    "mascara_no",
+    "hallazgos_leves",
+    "hallazgos_graves",
+    "hallazgos_muy_graves",
+    "total_incumplimientos",
+    "monto_multa_soles",
+    "catalogo_version",
+]
+
+
+def esquema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us")),
+        ("diagnostico_id", pa.string()),
+        ("tipo_empresa", pa.string()),
+        ("numero_trabajadores", pa.int32()),
+        ("rango_trabajadores", pa.string()),
+        ("severidad_maxima", pa.string()),
+        ("mascara_respondidas", pa.uint64()),
+        ("mascara_no", pa.uint64()),
+        ("hallazgos_leves", pa.int16()),
+        ("hallazgos_graves", pa.int16()),
+        ("hallazgos_muy_graves", pa.int16()),
+        ("total_incumplimientos", pa.int16()),
+        ("monto_multa_soles", pa.float64()),
+        ("catalogo_version", pa.string()),
+    ])
+
+
+def _ruta_dia(directorio: Path, dia: str) -> Path:
+    return directorio / f"{PREFIJO}{dia}{EXTENSION}"
+
+
+def _dias_archivados(directorio: Path) -> List[str]:
+    return sorted(
+        p.name[len(PREFIJO):-len(EXTENSION)]
+        for p in directorio.glob(f"{PREFIJO}*{EXTENSION}")
+    )
+
+
+def _lote_a_record_batch(filas: list, schema):
+    columnas = list(zip(*filas))
+    id_, created_at, diagnostico_id, tipo_empresa, *resto = columnas
+    (numero, rango, severidad, respondidas, no, leves, graves, muy_graves, total, monto, version) = resto
+    return pa.record_batch([
+        pa.array(id_, pa.int64()),
+        pa.array([datetime.fromisoformat(c) for c in created_at], pa.timestamp("us")),
+        pa.array(diagnostico_id, pa.string()),
+        # "No Mype" -> "no_mype": mismo código que envía el formulario
+        pa.array([(t or "").lower().replace(" ", "_") for t in tipo_empresa], pa.string()),
+        pa.array(numero, pa.int32()),
+        pa.array(rango, pa.string()),
+        pa.array(severidad, pa.string()),
+        pa.array([m or 0 for m in respondidas], pa.uint64()),
+        pa.array([m or 0 for m in no], pa.uint64()),
+        pa.array([c or 0 for c in leves], pa.int16()),
+        pa.array([c or 0 for c in graves], pa.int16()),
+        pa.array([c or 0 for c in muy_graves], pa.int16()),
+        pa.array([c or 0 for c in total], pa.int16()),
+        pa.array(monto, pa.float64()),
+        pa.array(version, pa.string()),
+    ], schema=schema)
+
+
+def compactar_dia(store: LeadStore, directorio: Path, dia: str) -> int:
+    """Escribe el archivo Arrow de un día. Retorna cuántas filas archivó."""
+    siguiente = (date.fromisoformat(dia) + timedelta(days=1)).isoformat()
+    destino = _ruta_dia(directorio, dia)
+    temporal = destino.with_suffix(".tmp")
+    schema = esquema()
+    filas_escritas = 0
+    try:
+        with pa.OSFile(str(temporal), "wb") as sink, ipc.new_file(sink, schema) as writer:
+            for filas in store.iterar(desde=dia, hasta=siguiente, columnas=COLUMNAS_ORIGEN):
+                writer.write_batch(_lote_a_record_batch(filas, schema))
+                filas_escritas += len(filas)
+        os.replace(temporal, destino)  # Atómico: los lectores nunca ven un archivo a medias
+    finally:
+        temporal.unlink(missing_ok=True)  # Solo queda si falló antes del replace
+    return filas_escritas
+
+
+def compactar(store: LeadStore, directorio: Path) -> int:
+    """Archiva todos los días cerrados (anteriores a hoy) que aún no tienen archivo.
+
+    Los faltantes se calculan contra el conjunto de archivos existentes, no
+    desde el último día archivado: un día que falló (o cuyo archivo se borró)
+    se vuelve a intentar en el ciclo siguiente.
+    Solo un worker compacta a la vez (flock); los demás omiten el ciclo.
+    Retorna la cantidad de días archivados.
+    """
+    directorio.mkdir(parents=True, exist_ok=True)
+    with open(directorio / ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0
+        archivados = set(_dias_archivados(directorio))
+        hoy = date.today().isoformat()
+        dias = [dia for dia in store.dias_con_leads(hasta=hoy) if dia not in archivados]
+        for dia in dias:
+            filas = compactar_dia(store, directorio, dia)
+            logging.info(f"🗃️ Archivo columnar: {dia} compactado ({filas} diagnósticos)")
+        return len(dias)
+
+
+async def ciclo_compactacion(store: LeadStore, directorio: Path, intervalo: float = INTERVALO_COMPACTACION):
+    """Tarea de fondo del lifespan: compacta periódicamente en un hilo."""
+    if pa is None:
+        logging.warning("⚠️ pyarrow no instalado - archivo columnar deshabilitado")
+        return
+    while True:
+        try:
+            await run_in_threadpool(compactar, store, directorio)
+        except Exception as e:
+            logging.error(f"❌ Error en compactación del archivo columnar: {e}")
+        await asyncio.sleep(intervalo)
+
+
+# ==============================================================================
+# CONSULTAS
+# ==============================================================================
+
+def cargar(directorio: Path, desde: Optional[date] = None, hasta: Optional[date] = None):
+    """Tabla Arrow con los días en [desde, hasta], abierta vía memory-map."""
+    tablas = []
+    for dia in _dias_archivados(Path(directorio)):
+        fecha = date.fromisoformat(dia)
+        if (desde and fecha < desde) or (hasta and fecha > hasta):
+            continue
+        fuente = pa.memory_map(str(_ruta_dia(Path(directorio), dia)), "r")
+        tablas.append(ipc.open_file(fuente).read_all())
+    if not tablas:
+        return esquema().empty_table()
+    # Archivos de versiones anteriores pueden no tener columnas nuevas (quedan nulas)
+    return pa.concat_tables(tablas, promote_options="default")
+
+
+def agregar(
+    directorio: Path,
+    agrupar_por: Sequence[str],
+    agregaciones: Sequence[Tuple[str, str]],
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+):
+    """Agregación agrupada, p. ej. multa promedio por tipo de empresa y rango."""
+    tabla = cargar(directorio, desde, hasta)
+    return tabla.group_by(list(agrupar_por)).aggregate(list(agregaciones))
+
+
+def preguntas_mas_incumplidas(
+    directorio: Path,
+    agrupar_por: Optional[str] = "tipo_empresa",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    top: int = 10,
+) -> dict:
+    """Preguntas respondidas con 'no' más frecuentes, por grupo.
+
+    Retorna {grupo: [(pregunta_id, cantidad), ...]} ordenado de mayor a menor.
+    """
+    tabla = cargar(directorio, desde, hasta)
+    grupos = {"todos": tabla}
+    if agrupar_por:
+        grupos = {
+            valor: tabla.filter(pc.equal(tabla[agrupar_por], valor))
+            for valor in pc.unique(tabla[agrupar_por]).to_pylist()
+        }
+    resultado = {}
+    for valor, subtabla in grupos.items():
+        mascaras = subtabla["mascara_no"]
+        conteos = []
+        for indice in range(NUMERO_PREGUNTAS):
+            bit = pa.scalar(1 << indice, pa.uint64())
+            cantidad = pc.sum(pc.not_equal(pc.bit_wise_and(mascaras, bit), pa.scalar(0, pa.uint64()))).as_py() or 0
+            conteos.append((f"q{indice + 1}", cantidad))
+        conteos.sort(key=lambda c: c[1], reverse=True)
+        resultado[valor] = conteos[:top]
+    return resultado
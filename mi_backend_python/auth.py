@@ -0,0 +1,76 @@
+# auth.py
+"""
+Autenticación de endpoints administrativos (exportes, dashboard, debug).
+
+Dos niveles:
+- `verificar_dashboard` (vistas de solo lectura del Dashboard: logs, salud,
+  stream en vivo): HTTP Basic con DASHBOARD_USER / DASHBOARD_PASSWORD o el
+  token de administración. Esas credenciales son las mismas que el Dashboard
+  lleva como VITE_DASHBOARD_USER / VITE_DASHBOARD_PASSWORD, es decir, están
+  en el bundle público de JS: NO protegen nada sensible.
+- `verificar_admin` (exporte de leads con datos personales, perfilador,
+  recarga del catálogo, estado del planificador): SOLO
+  Authorization: Bearer <ADMIN_API_TOKEN>, que vive únicamente en el servidor
+  (scripts, CRM, cron jobs).
+
+Si no hay ninguna credencial configurada, los endpoints quedan CERRADOS.
+"""
+import base64
+import binascii
+import logging
+import os
+import secrets
+
+from fastapi import HTTPException, Request
+
+DASHBOARD_USER = os.environ.get("DASHBOARD_USER", "")
+DASHBOARD_PASSWORD = os.environ.get("DASHBOARD_PASSWORD", "")
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN", "")
+
+if not ADMIN_API_TOKEN:
+    logging.warning("⚠️ ADMIN_API_TOKEN no configurado - exportes, perfilador y recarga del catálogo deshabilitados")
+
+
+def _comparar(recibido: str, esperado: str) -> bool:
+    # compare_digest evita ataques de temporización
+    return bool(esperado) and secrets.compare_digest(recibido.encode(), esperado.encode())
+
+
+def credenciales_validas(authorization: str, permitir_dashboard: bool = False) -> bool:
+    """Bearer ADMIN_API_TOKEN siempre; Basic del Dashboard solo si `permitir_dashboard`."""
+    esquema, _, valor = authorization.partition(" ")
+    esquema = esquema.lower()
+    if esquema == "bearer":
+        return _comparar(valor.strip(), ADMIN_API_TOKEN)
+    if esquema == "basic" and permitir_dashboard and DASHBOARD_USER and DASHBOARD_PASSWORD:
+        try:
+            usuario, _, clave = base64.b64decode(valor.strip()).decode("utf-8").partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            return False
+        # Evaluar ambas comparaciones siempre (sin cortocircuito)
+        ok_usuario = _comparar(usuario, DASHBOARD_USER)
+        ok_clave = _comparar(clave, DASHBOARD_PASSWORD)
+        return ok_usuario and ok_clave
+    return False
+
+
+async def verificar_dashboard(request: Request) -> None:
+    """Dependencia de FastAPI: vistas de solo lectura del Dashboard (Basic o token)."""
+    if not credenciales_validas(request.headers.get("authorization", ""), permitir_dashboard=True):
+        logging.warning(f"🔒 Acceso al dashboard rechazado: {request.url.path}")
+        raise HTTPException(
+            status_code=401,
+            detail="No autorizado",
+            headers={"WWW-Authenticate": 'Basic realm="dashboard"'},
+        )
+
+
+async def verificar_admin(request: Request) -> None:
+    """Dependencia de FastAPI: exige el token de administración (nunca las credenciales del bundle)."""
+    if not credenciales_validas(request.headers.get("authorization", "")):
+        logging.warning(f"🔒 Acceso administrativo rechazado: {request.url.path}")
+        raise HTTPException(
+            status_code=401,
+            detail="No autorizado",
+            headers={"WWW-Authenticate": 'Bearer realm="admin"'},
+        )
@@ -0,0 +1,376 @@
+# catalogo.py
+"""
+Catálogo normativo versionado y recargable en caliente.
+
+La UIT, las tablas de multas y la base de infracciones viven en un archivo
+JSON versionado (`catalogo_sst.json`) en lugar de literales de Python. Cada
+worker lo compila una vez en estructuras de búsqueda y lo reemplaza de forma
+atómica cuando el archivo cambia (watcher) o un admin pide recargarlo.
+
+Multi-jurisdicción: el archivo declara una entrada por país en
+`jurisdicciones` (clases de empresa y cómo se asignan, exenciones por clase,
+rangos de trabajadores y multas por severidad, en moneda local o en una
+unidad de referencia como la UIT, o como monto base × `pesos_severidad`).
+Un solo motor genérico (`Jurisdiccion.evaluar`) evalúa cualquier país;
+agregar uno es agregar datos al JSON, sin código nuevo.
+
+Beneficios de rendimiento:
+- Cambiar la UIT o una tabla NO requiere redeploy ni cold start de workers
+- Cada jurisdicción se compila una vez en tablas planas: severidad por
+  (clase, pregunta) con las exenciones ya aplicadas, y rango por número de
+  trabajadores con índice directo (bisect solo para empresas muy grandes)
+- Multas precalculadas en moneda local (las tablas en UIT se multiplican al compilar)
+- Evaluar no depende de cuántas jurisdicciones haya: elegir una es un dict.get
+- El swap es una sola asignación de referencia: ninguna request se pausa y
+  cada cálculo usa un snapshot consistente de principio a fin
+- Cada diagnóstico registra `catalogo_version`; las versiones cargadas se
+  guardan en un historial para poder recalcular con la misma normativa
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+SEVERIDADES = ("Leves", "Grave", "Muy Grave")  # Comunes a todas las jurisdicciones (columnas de leads)
+UNIDADES = {"moneda": "moneda", "referencia": "referencia", "soles": "moneda", "uit": "referencia"}  # soles/uit: formato legado
+MAX_TABLA_DIRECTA = 4096  # Trabajadores con índice directo de rango; por encima, bisect
+NOTA_LEGAL_PE = (
+    "Estimación referencial según el Reglamento de la Ley General de Inspección del Trabajo "
+    "(D.S. 019-2006-TR). No constituye una resolución de SUNAFIL."
+)
+
+CATALOGO_PATH = Path(os.environ.get("CATALOGO_PATH", Path(__file__).parent / "catalogo_sst.json"))
+CATALOGO_HISTORIAL_DIR = Path(os.environ.get("CATALOGO_HISTORIAL_DIR", "catalogos_historial"))
+INTERVALO_WATCHER = float(os.environ.get("CATALOGO_INTERVALO", "5"))
+
+
+class CatalogoInvalido(ValueError):
+    """El archivo de catálogo no cumple el formato esperado."""
+
+
+class Evaluacion(NamedTuple):
+    """Resultado del motor para un formulario."""
+    clase: str
+    conteos: Tuple[int, ...]  # Hallazgos por severidad, en el orden de SEVERIDADES
+    detalle: List[dict]  # Infracciones encontradas, en el orden de las respuestas
+    rango: Optional[str]  # Etiqueta del rango de trabajadores (None sin trabajadores)
+    multas_unitarias: Optional[Tuple[float, ...]]
+    monto: float
+
+
+class Jurisdiccion:
+    """Reglas de un país compiladas en tablas de decisión planas.
+
+    - `severidad_por_clase[c][p]`: índice de severidad de la pregunta p para
+      la clase de empresa c, o -1 si no es infracción o está exenta (las
+      exenciones se resuelven al compilar, no al evaluar)
+    - `rango_directo[c][n]`: índice del rango para n trabajadores (bisect
+      solo por encima de MAX_TABLA_DIRECTA)
+    - `multas[c][r]`: multas unitarias por severidad ya en moneda local
+    """
+
+    def __init__(self, codigo: str, nombre: str, moneda: str, simbolo_moneda: str, nota_legal: str,
+                 clases: Tuple[str, ...], clase_por_defecto: int, clase_por_trabajadores: Optional[Tuple[List[float], List[int]]],
+                 posicion_pregunta: Dict[str, int], infracciones: List[dict], severidad_por_clase: List[Tuple[int, ...]],
+                 limites: List[List[float]], etiquetas: List[List[str]], multas: List[List[Tuple[float, ...]]]):
+        self.codigo = codigo
+        self.nombre = nombre
+        self.moneda = moneda
+        self.simbolo_moneda = simbolo_moneda
+        self.nota_legal = nota_legal
+        self.clases = clases
+        self._indice_clase = {clase: i for i, clase in enumerate(clases)}
+        self._clase_por_defecto = clase_por_defecto
+        self._clase_por_trabajadores = clase_por_trabajadores
+        self._posicion_pregunta = posicion_pregunta
+        self._infracciones = infracciones
+        self._severidad_por_clase = severidad_por_clase
+        self._limites = limites
+        self._etiquetas = etiquetas
+        self._multas = multas
+        self._rango_directo = [
+            [bisect_left(limites_clase, n) for n in range(min(int(max(limites_clase[:-1], default=0)), MAX_TABLA_DIRECTA) + 1)]
+            for limites_clase in limites
+        ]
+
+    def clasificar(self, tipo_empresa: Optional[str], numero_trabajadores: int) -> int:
+        """Clase declarada por el formulario si existe en esta jurisdicción; si no, por trabajadores.
+
+        Coincidencia exacta (como antes del catálogo): "Micro" no es "micro".
+        """
+        indice = self._indice_clase.get(tipo_empresa or "")
+        if indice is not None:
+            return indice
+        if self._clase_por_trabajadores is not None:
+            limites, clases = self._clase_por_trabajadores
+            return clases[bisect_left(limites, numero_trabajadores)]
+        return self._clase_por_defecto
+
+    def evaluar(self, tipo_empresa: Optional[str], numero_trabajadores: int, respuestas: Dict[str, str]) -> Evaluacion:
+        clase = self.clasificar(tipo_empresa, numero_trabajadores)
+        severidades = self._severidad_por_clase[clase]
+        posicion_pregunta = self._posicion_pregunta
+        conteos = [0] * len(SEVERIDADES)
+        detalle = []
+        for pregunta_id, respuesta in respuestas.items():
+            if respuesta.lower() != "no":
+                continue
+            posicion = posicion_pregunta.get(pregunta_id)
+            if posicion is None:
+                continue
+            severidad = severidades[posicion]
+            if severidad >= 0:
+                conteos[severidad] += 1
+                detalle.append(self._infracciones[posicion])
+
+        if numero_trabajadores <= 0:
+            return Evaluacion(self.clases[clase], tuple(conteos), detalle, None, None, 0.0)
+        directo = self._rango_directo[clase]
+        rango = directo[numero_trabajadores] if numero_trabajadores < len(directo) else bisect_left(self._limites[clase], numero_trabajadores)
+        multas = self._multas[clase][rango]
+        monto = sum(cantidad * multa for cantidad, multa in zip(conteos, multas)) if any(conteos) else 0.0
+        return Evaluacion(self.clases[clase], tuple(conteos), detalle, self._etiquetas[clase][rango], multas, monto)
+
+
+class Catalogo:
+    """Snapshot inmutable de la normativa vigente (todas las jurisdicciones)."""
+
+    def __init__(self, version: str, jurisdicciones: Dict[str, Jurisdiccion], por_defecto: str):
+        self.version = version
+        self.jurisdicciones = jurisdicciones
+        self.por_defecto = por_defecto
+
+    def jurisdiccion(self, codigo: Optional[str] = None) -> Jurisdiccion:
+        """La jurisdicción pedida (código ISO del país) o la por defecto si no está en el catálogo."""
+        return self.jurisdicciones.get((codigo or "").upper()) or self.jurisdicciones[self.por_defecto]
+
+
+def _desde_formato_legado(datos: dict) -> dict:
+    """Catálogos anteriores a las jurisdicciones (siguen en el historial): solo Perú."""
+    return {
+        "version": datos["version"],
+        "jurisdiccion_por_defecto": "PE",
+        "jurisdicciones": {
+            "PE": {
+                "nombre": "Perú - SUNAFIL",
+                "moneda": "PEN",
+                "simbolo_moneda": "S/",
+                "nota_legal": NOTA_LEGAL_PE,
+                "valor_referencia": datos["valor_uit"],
+                "clasificacion": {"clases": list(datos["tablas_multas"]), "por_defecto": "no_mype"},
+                "exenciones": [{"clases": ["micro", "pequena"], "preguntas": datos.get("preguntas_exentas_mype", [])}],
+                "tablas_multas": datos["tablas_multas"],
+                "infracciones": datos["infracciones"],
+            }
+        },
+    }
+
+
+def _compilar_tabla(codigo: str, clase: str, definicion: dict, valor_referencia: Optional[float]):
+    unidad = UNIDADES.get(definicion.get("unidad", "moneda"))
+    if unidad is None:
+        raise CatalogoInvalido(f"{codigo}/{clase}: unidad desconocida '{definicion.get('unidad')}'")
+    if unidad == "referencia" and valor_referencia is None:
+        raise CatalogoInvalido(f"{codigo}/{clase}: la tabla usa la unidad de referencia pero falta 'valor_referencia'")
+    factor = valor_referencia if unidad == "referencia" else 1.0
+    pesos = definicion.get("pesos_severidad")
+    limites, etiquetas, multas = [], [], []
+    for rango in definicion["rangos"]:
+        limites.append(float("inf") if rango["hasta"] is None else float(rango["hasta"]))
+        etiquetas.append(rango["etiqueta"])
+        if "multas" in rango:
+            multas.append(tuple(float(rango["multas"][s]) * factor for s in SEVERIDADES))
+        elif pesos is not None:
+            # Monto base del rango × peso de cada severidad
+            multas.append(tuple(float(rango["base"]) * float(pesos[s]) * factor for s in SEVERIDADES))
+        else:
+            raise CatalogoInvalido(f"{codigo}/{clase}: cada rango necesita 'multas' o 'base' con 'pesos_severidad'")
+    if limites != sorted(limites) or limites[-1] != float("inf"):
+        raise CatalogoInvalido(f"{codigo}/{clase}: los rangos deben ser crecientes y terminar sin tope")
+    return limites, etiquetas, multas
+
+
+def _compilar_jurisdiccion(codigo: str, datos: dict) -> Jurisdiccion:
+    clasificacion = datos["clasificacion"]
+    clases = tuple(clasificacion["clases"])
+    indice_clase = {clase: i for i, clase in enumerate(clases)}
+    if clasificacion["por_defecto"] not in indice_clase:
+        raise CatalogoInvalido(f"{codigo}: la clase por defecto '{clasificacion['por_defecto']}' no está en 'clases'")
+    por_trabajadores = None
+    if clasificacion.get("por_trabajadores"):
+        limites = [float("inf") if r["hasta"] is None else float(r["hasta"]) for r in clasificacion["por_trabajadores"]]
+        if limites != sorted(limites) or limites[-1] != float("inf"):
+            raise CatalogoInvalido(f"{codigo}: 'por_trabajadores' debe ser creciente y terminar sin tope")
+        por_trabajadores = (limites, [indice_clase[r["clase"]] for r in clasificacion["por_trabajadores"]])
+
+    tablas = datos["tablas_multas"]
+    faltantes = [clase for clase in clases if clase not in tablas]
+    if faltantes:
+        raise CatalogoInvalido(f"{codigo}: faltan tablas de multas para {faltantes}")
+    valor_referencia = float(datos["valor_referencia"]) if datos.get("valor_referencia") is not None else None
+    compiladas = [_compilar_tabla(codigo, clase, tablas[clase], valor_referencia) for clase in clases]
+
+    posicion_pregunta, infracciones, severidad_base = {}, [], []
+    for pregunta_id, infraccion in datos["infracciones"].items():
+        if infraccion.get("severidad") not in SEVERIDADES:
+            raise CatalogoInvalido(f"{codigo}: severidad inválida en {pregunta_id}")
+        posicion_pregunta[pregunta_id] = len(infracciones)
+        infracciones.append(infraccion)
+        severidad_base.append(SEVERIDADES.index(infraccion["severidad"]))
+
+    severidad_por_clase = []
+    for clase in clases:
+        fila = list(severidad_base)
+        for exencion in datos.get("exenciones", []):
+            if clase in exencion["clases"]:
+                for pregunta_id in exencion["preguntas"]:
+                    if pregunta_id in posicion_pregunta:
+                        fila[posicion_pregunta[pregunta_id]] = -1
+        severidad_por_clase.append(tuple(fila))
+
+    return Jurisdiccion(
+        codigo=codigo,
+        nombre=datos.get("nombre", codigo),
+        moneda=datos.get("moneda", ""),
+        simbolo_moneda=datos.get("simbolo_moneda", ""),
+        nota_legal=datos.get("nota_legal", ""),
+        clases=clases,
+        clase_por_defecto=indice_clase[clasificacion["por_defecto"]],
+        clase_por_trabajadores=por_trabajadores,
+        posicion_pregunta=posicion_pregunta,
+        infracciones=infracciones,
+        severidad_por_clase=severidad_por_clase,
+        limites=[tabla[0] for tabla in compiladas],
+        etiquetas=[tabla[1] for tabla in compiladas],
+        multas=[tabla[2] for tabla in compiladas],
+    )
+
+
+def compilar(datos: dict) -> Catalogo:
+    """Valida el JSON y compila cada jurisdicción en tablas de decisión."""
+    try:
+        if "jurisdicciones" not in datos:
+            datos = _desde_formato_legado(datos)
+        version = str(datos["version"])
+        jurisdicciones = {
+            codigo.upper(): _compilar_jurisdiccion(codigo.upper(), definicion)
+            for codigo, definicion in datos["jurisdicciones"].items()
+        }
+        por_defecto = datos.get("jurisdiccion_por_defecto", "PE").upper()
+        if por_defecto not in jurisdicciones:
+            raise CatalogoInvalido(f"Falta la jurisdicción por defecto '{por_defecto}'")
+        return Catalogo(version=version, jurisdicciones=jurisdicciones, por_defecto=por_defecto)
+    except (KeyError, TypeError, ValueError) as e:
+        if isinstance(e, CatalogoInvalido):
+            raise
+        raise CatalogoInvalido(f"Catálogo mal formado: {e}") from e
+
+
+def cargar_archivo(ruta: Path) -> Catalogo:
+    with open(ruta, encoding="utf-8") as f:
+        try:
+            datos = json.load(f)
+        except json.JSONDecodeError as e:
+            raise CatalogoInvalido(f"JSON inválido: {e}") from e
+    return compilar(datos)
+
+
+def _verificar_historial(ruta: Path, version: str) -> None:
+    """Lanza CatalogoInvalido si la versión ya está en el historial con otro contenido.
+
+    Los diagnósticos guardan solo `catalogo_version`: editar el catálogo sin
+    subir la versión haría que se recalculen con reglas distintas a las usadas.
+    """
+    destino = CATALOGO_HISTORIAL_DIR / f"catalogo-{version}.json"
+    try:
+        with open(destino, encoding="utf-8") as f:
+            anterior = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"⚠️ No se pudo leer el catálogo {version} del historial: {e}")
+        return
+    with open(ruta, encoding="utf-8") as f:
+        if json.load(f) != anterior:
+            raise CatalogoInvalido(f"el contenido cambió pero la versión sigue siendo '{version}': subir 'version'")
+
+
+def _guardar_en_historial(ruta: Path, version: str) -> None:
+    """Conserva una copia por versión para poder recalcular diagnósticos antiguos."""
+    try:
+        CATALOGO_HISTORIAL_DIR.mkdir(parents=True, exist_ok=True)
+        destino = CATALOGO_HISTORIAL_DIR / f"catalogo-{version}.json"
+        if not destino.exists():
+            temporal = destino.with_suffix(f".{os.getpid()}.tmp")
+            shutil.copyfile(ruta, temporal)
+            os.replace(temporal, destino)
+    except OSError as e:
+        logging.warning(f"⚠️ No se pudo guardar el catálogo {version} en el historial: {e}")
+
+
+# --- CATÁLOGO ACTIVO (uno por worker) ---
+_activo: Catalogo = cargar_archivo(CATALOGO_PATH)
+_mtime_activo: float = CATALOGO_PATH.stat().st_mtime
+try:
+    _verificar_historial(CATALOGO_PATH, _activo.version)
+except CatalogoInvalido as e:
+    # Al iniciar no hay otro catálogo que usar: se avisa y el historial conserva el original
+    logging.error(f"❌ Catálogo {_activo.version}: {e}")
+_guardar_en_historial(CATALOGO_PATH, _activo.version)
+logging.info(f"📚 Catálogo normativo cargado: versión {_activo.version}")
+
+
+def catalogo_activo() -> Catalogo:
+    """Snapshot vigente. Usar UNA vez por cálculo para que sea consistente."""
+    return _activo
+
+
+def recargar(ruta: Path = CATALOGO_PATH) -> Catalogo:
+    """Compila el archivo y lo activa. Si es inválido, el catálogo anterior sigue vigente."""
+    global _activo, _mtime_activo
+    mtime = ruta.stat().st_mtime
+    nuevo = cargar_archivo(ruta)
+    _verificar_historial(ruta, nuevo.version)
+    _guardar_en_historial(ruta, nuevo.version)
+    anterior = _activo
+    _activo = nuevo  # Asignación atómica: las requests en curso conservan su snapshot
+    _mtime_activo = mtime
+    logging.info(f"📚 Catálogo normativo recargado: {anterior.version} → {nuevo.version}")
+    return nuevo
+
+
+@lru_cache(maxsize=16)
+def catalogo_por_version(version: str) -> Catalogo:
+    """Catálogo histórico para recalcular un diagnóstico con su normativa original."""
+    if version == _activo.version:
+        return _activo
+    ruta = CATALOGO_HISTORIAL_DIR / f"catalogo-{version}.json"
+    if not ruta.exists():
+        raise KeyError(f"Versión de catálogo desconocida: {version}")
+    return cargar_archivo(ruta)
+
+
+async def vigilar_catalogo(ruta: Path = CATALOGO_PATH, intervalo: float = INTERVALO_WATCHER):
+    """Tarea de fondo: recarga el catálogo cuando cambia el mtime del archivo.
+
+    Cada worker de gunicorn ejecuta su propio watcher, así que un archivo
+    actualizado se propaga a todos en a lo sumo `intervalo` segundos.
+    """
+    ultimo_mtime = _mtime_activo
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            mtime = ruta.stat().st_mtime
+            if mtime in (ultimo_mtime, _mtime_activo):
+                continue
+            ultimo_mtime = mtime  # Un archivo inválido se reporta una sola vez
+            await run_in_threadpool(recargar, ruta)
+        except (OSError, CatalogoInvalido) as e:
+            logging.error(f"❌ Catálogo no recargado, se mantiene {_activo.version}: {e}")
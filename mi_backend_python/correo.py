@@ -0,0 +1,329 @@
+# correo.py
+"""
+Correo del diagnóstico renderizado en el backend (sin pasar por Make.com).
+
+La plantilla `email design/index.html` (la misma que envía Make, con las
+imágenes alojadas en supportbrigades.com) se compila UNA vez al iniciar el
+worker: se parte en trozos estáticos + nombres de campo, y cada render es un
+solo `"".join`. Las imágenes nunca van adjuntas al correo:
+- URLs absolutas: se dejan como están
+- Rutas relativas (`images/...`): URLs con hash de contenido
+  (`/email-assets/logo.3fa1c2.png`) servidas con caché inmutable por este
+  backend; requieren PUBLIC_BASE_URL
+
+Beneficios de rendimiento:
+- Render en microsegundos (miles de correos por segundo por worker): sin
+  motor de plantillas ni parseo de HTML por lead
+- Correos de ~40 KB: las imágenes se enlazan, no se adjuntan
+- Sin operaciones de Make ni minutos de espera: el correo sale en background
+  apenas se guarda el diagnóstico
+- Conexión SMTP reutilizada entre envíos (se reconecta si el servidor la cierra)
+
+Placeholders soportados en la plantilla:
+- Mailchimp: *|MMERGE5|* / *|FNAME|* (nombre), *|EMAIL|*
+- Make: {{36.nombre_lead}}, {{36.empresa}}, {{40.whatsapp_cta_link}}, ...
+  (el número de módulo se ignora; ver CAMPOS)
+Si la plantilla tiene un placeholder sin dato, o le falta alguno de los que
+completa Make (CAMPOS_MAKE), el correo local queda deshabilitado y lo sigue
+enviando Make: nunca sale un correo con campos vacíos.
+
+Probar localmente con un servidor SMTP de depuración:
+    python -m aiosmtpd -n -l localhost:1025
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=0 uvicorn main:app
+"""
+import hashlib
+import html
+import logging
+import os
+import re
+import smtplib
+import threading
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Dict, Optional, Protocol, Tuple
+from urllib.parse import quote
+
+_DIRECTORIO_APP = Path(__file__).parent
+EMAIL_TEMPLATE_PATH = os.environ.get("EMAIL_TEMPLATE_PATH", "")  # Archivo HTML explícito
+EMAIL_TEMPLATE_DIR = os.environ.get("EMAIL_TEMPLATE_DIR", "")  # Directorio con index.html
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "").rstrip("/")
+EMAIL_FROM = os.environ.get("EMAIL_FROM", "Support Brigades <contactenos@supportbrigades.com>")
+EMAIL_COPIA = os.environ.get("EMAIL_COPIA", "")  # Bcc interno (p. ej. contactenos@...)
+WHATSAPP_NUMBER = os.environ.get("WHATSAPP_NUMBER", "51981577120")
+
+RUTA_ASSETS = "/email-assets"
+
+# Campos disponibles en la plantilla (valores ya escapados para HTML)
+CAMPOS = {
+    "nombre_lead", "empresa", "cargo_lead", "email_lead", "telefono_lead",
+    "tipo_empresa", "numero_trabajadores", "rango_trabajadores", "severidad_maxima",
+    "total_incumplimientos", "monto_multa_soles", "reporte_url", "whatsapp_cta_link",
+}
+# Campos que completa el escenario de Make hoy: la plantilla local debe tenerlos todos
+CAMPOS_MAKE = {"nombre_lead", "empresa", "whatsapp_cta_link"}
+ALIAS_MAILCHIMP = {"MMERGE5": "nombre_lead", "FNAME": "nombre_lead", "EMAIL": "email_lead"}
+
+PLACEHOLDER = re.compile(r"\*\|([A-Z0-9_]+)\|\*|\{\{\s*(?:\d+\.)?([A-Za-z_]+)\s*\}\}")
+# Rutas relativas de imágenes en src="..." y url('...')
+IMAGEN = re.compile(r"""(?<=["'(])images/[^"')]+""")
+
+
+class PlantillaInvalida(ValueError):
+    """La plantilla tiene placeholders sin dato o le faltan campos de Make."""
+
+
+class PlantillaCompilada:
+    """Plantilla partida en trozos estáticos intercalados con nombres de campo."""
+
+    def __init__(self, partes: Tuple[str, ...], campos: Tuple[str, ...]):
+        self.partes = partes
+        self.campos = campos
+
+    def renderizar(self, valores: Dict[str, str]) -> str:
+        salida = [self.partes[0]]
+        for campo, parte in zip(self.campos, self.partes[1:]):
+            salida.append(valores.get(campo, ""))
+            salida.append(parte)
+        return "".join(salida)
+
+
+def _buscar_plantilla() -> Optional[Path]:
+    """EMAIL_TEMPLATE_PATH, o el index.html de primer nivel (no las exportaciones en subcarpetas)."""
+    if EMAIL_TEMPLATE_PATH:
+        candidatos = [Path(EMAIL_TEMPLATE_PATH)]
+    elif EMAIL_TEMPLATE_DIR:
+        candidatos = [Path(EMAIL_TEMPLATE_DIR) / "index.html"]
+    else:
+        candidatos = [
+            _DIRECTORIO_APP / "email design" / "index.html",  # Docker
+            _DIRECTORIO_APP.parent / "email design" / "index.html",  # Repositorio
+        ]
+    for plantilla in candidatos:
+        if plantilla.is_file():
+            return plantilla
+    return None
+
+
+def compilar_plantilla(ruta: Path, base_url: str = PUBLIC_BASE_URL) -> Tuple[PlantillaCompilada, Dict[str, Path]]:
+    """Compila la plantilla. Retorna (plantilla, {nombre con hash: archivo}) para servir los assets.
+
+    Lanza PlantillaInvalida si algún placeholder quedaría vacío o faltan campos de Make.
+    """
+    fuente = ruta.read_text(encoding="utf-8")
+    assets: Dict[str, Path] = {}
+    sin_url = set()
+
+    def resolver_imagen(coincidencia: re.Match) -> str:
+        archivo = ruta.parent / coincidencia.group(0)
+        if not archivo.is_file():
+            logging.warning(f"⚠️ Plantilla de correo: imagen no encontrada {archivo.name}")
+            return coincidencia.group(0)
+        if not base_url:
+            sin_url.add(archivo.name)
+            return coincidencia.group(0)
+        huella = hashlib.sha256(archivo.read_bytes()).hexdigest()[:12]
+        nombre = f"{archivo.stem}.{huella}{archivo.suffix}"
+        assets[nombre] = archivo
+        return f"{base_url}{RUTA_ASSETS}/{quote(nombre)}"
+
+    fuente = IMAGEN.sub(resolver_imagen, fuente)
+    if sin_url:
+        logging.warning(f"⚠️ Plantilla de correo: imágenes relativas sin PUBLIC_BASE_URL (no se verán): {sorted(sin_url)}")
+
+    partes, campos, desconocidos = [], [], set()
+    posicion = 0
+    for coincidencia in PLACEHOLDER.finditer(fuente):
+        mailchimp, make = coincidencia.groups()
+        campo = ALIAS_MAILCHIMP.get(mailchimp) if mailchimp else make
+        partes.append(fuente[posicion:coincidencia.start()])
+        posicion = coincidencia.end()
+        if campo not in CAMPOS:
+            desconocidos.add(coincidencia.group(0))
+        campos.append(campo)
+    partes.append(fuente[posicion:])
+    if desconocidos:
+        raise PlantillaInvalida(f"placeholders sin dato: {sorted(desconocidos)}")
+    faltantes = CAMPOS_MAKE - set(campos)
+    if faltantes:
+        raise PlantillaInvalida(f"faltan campos que completa Make: {sorted(faltantes)}")
+    return PlantillaCompilada(tuple(partes), tuple(campos)), assets
+
+
+def valores_lead(data: dict) -> Dict[str, str]:
+    """Valores de la plantilla a partir de un `data_to_insert` (escapados una sola vez)."""
+    resultado = data.get("resultado_completo_json") or {}
+    multa = resultado.get("multa", {})
+    diagnostico_id = data.get("diagnostico_id")
+    mensaje = f"Deseo validar el diagnóstico SST de {data.get('empresa') or ''}"
+    valores = {
+        "nombre_lead": data.get("nombre_lead"),
+        "empresa": data.get("empresa"),
+        "cargo_lead": data.get("cargo_lead"),
+        "email_lead": data.get("email_lead"),
+        "telefono_lead": data.get("telefono_lead"),
+        "tipo_empresa": data.get("tipo_empresa"),
+        "numero_trabajadores": data.get("numero_trabajadores"),
+        "rango_trabajadores": multa.get("rango_trabajadores"),
+        "severidad_maxima": data.get("severidad_maxima"),
+        "total_incumplimientos": data.get("total_incumplimientos"),
+        "monto_multa_soles": f"{multa.get('simbolo_moneda', 'S/')} {float(data.get('monto_multa_soles') or 0):,.2f}",
+        "reporte_url": (
+            f"{PUBLIC_BASE_URL}/api/diagnostico/{diagnostico_id}/report"
+            if PUBLIC_BASE_URL and diagnostico_id else ""
+        ),
+        "whatsapp_cta_link": f"https://wa.me/{WHATSAPP_NUMBER}?text={quote(mensaje)}",
+    }
+    return {campo: html.escape(str(valor)) if valor is not None else "" for campo, valor in valores.items()}
+
+
+# ==============================================================================
+# REMITENTES (intercambiables)
+# ==============================================================================
+
+class Remitente(Protocol):
+    def enviar(self, mensaje: EmailMessage) -> None: ...
+
+    def cerrar(self) -> None: ...
+
+
+class RemitenteSMTP:
+    """SMTP con una conexión persistente por worker (protegida por lock)."""
+
+    def __init__(self, host: str, puerto: int = 587, usuario: str = "", password: str = "",
+                 starttls: bool = True, ssl: bool = False, timeout: float = 30):
+        self.host = host
+        self.puerto = puerto
+        self.usuario = usuario
+        self.password = password
+        self.starttls = starttls
+        self.ssl = ssl
+        self.timeout = timeout
+        self._conexion: Optional[smtplib.SMTP] = None
+        self._lock = threading.Lock()
+
+    def _conectar(self) -> smtplib.SMTP:
+        clase = smtplib.SMTP_SSL if self.ssl else smtplib.SMTP
+        conexion = clase(self.host, self.puerto, timeout=self.timeout)
+        if self.starttls and not self.ssl:
+            conexion.starttls()
+        if self.usuario:
+            conexion.login(self.usuario, self.password)
+        return conexion
+
+    def enviar(self, mensaje: EmailMessage) -> None:
+        with self._lock:
+            for intento in range(2):
+                try:
+                    if self._conexion is None:
+                        self._conexion = self._conectar()
+                    self._conexion.send_message(mensaje)
+                    return
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # El servidor cerró la conexión ociosa: se reintenta una vez con una nueva
+                    self._conexion = None
+                    if intento:
+                        raise
+
+    def cerrar(self) -> None:
+        with self._lock:
+            if self._conexion is not None:
+                try:
+                    self._conexion.quit()
+                except smtplib.SMTPException:
+                    pass
+                self._conexion = None
+
+
+class RemitenteLog:
+    """Solo registra el envío (desarrollo / pruebas sin servidor SMTP)."""
+
+    def enviar(self, mensaje: EmailMessage) -> None:
+        logging.info(f"📧 [Correo simulado] Para: {mensaje['To']} | Asunto: {mensaje['Subject']}")
+
+    def cerrar(self) -> None:
+        pass
+
+
+def crear_remitente() -> Optional[Remitente]:
+    """SMTP si SMTP_HOST está configurado; EMAIL_SENDER=log para simular."""
+    if os.environ.get("EMAIL_SENDER") == "log":
+        return RemitenteLog()
+    host = os.environ.get("SMTP_HOST")
+    if not host:
+        return None
+    return RemitenteSMTP(
+        host=host,
+        puerto=int(os.environ.get("SMTP_PORT", "587")),
+        usuario=os.environ.get("SMTP_USER", ""),
+        password=os.environ.get("SMTP_PASSWORD", ""),
+        starttls=os.environ.get("SMTP_STARTTLS", "1") == "1",
+        ssl=os.environ.get("SMTP_SSL", "0") == "1",
+    )
+
+
+# ==============================================================================
+# SERVICIO
+# ==============================================================================
+
+class ServicioCorreo:
+    """Plantilla compilada + remitente. Uno por worker (creado en el lifespan)."""
+
+    def __init__(self, plantilla: PlantillaCompilada, assets: Dict[str, Path], remitente: Remitente,
+                 remitente_desde: str = EMAIL_FROM):
+        self.plantilla = plantilla
+        self.assets = assets
+        self.remitente = remitente
+        self.remitente_desde = remitente_desde
+
+    def construir(self, data: dict) -> EmailMessage:
+        valores = valores_lead(data)
+        mensaje = EmailMessage()
+        mensaje["Subject"] = f"Informe de Diagnóstico SST para {data.get('empresa') or ''}"
+        mensaje["From"] = self.remitente_desde
+        mensaje["To"] = data["email_lead"]
+        if EMAIL_COPIA:
+            mensaje["Bcc"] = EMAIL_COPIA
+        texto = (
+            f"Hola {data.get('nombre_lead') or ''},\n\n"
+            f"La evaluación de {data.get('empresa') or ''} ha finalizado: "
+            f"{data.get('total_incumplimientos') or 0} incumplimientos, "
+            f"severidad máxima {data.get('severidad_maxima') or '-'}.\n"
+        )
+        if valores["reporte_url"]:
+            texto += f"\nInforme detallado: {html.unescape(valores['reporte_url'])}\n"
+        mensaje.set_content(texto)
+        mensaje.add_alternative(self.plantilla.renderizar(valores), subtype="html")
+        return mensaje
+
+    def enviar_diagnostico(self, data: dict) -> bool:
+        """Tarea de background (sync: corre en el threadpool). Retorna si se envió."""
+        empresa = data.get("empresa")
+        try:
+            self.remitente.enviar(self.construir(data))
+            logging.info(f"📧 Correo de diagnóstico enviado para: {empresa}")
+            return True
+        except Exception as e:
+            logging.error(f"❌ No se pudo enviar el correo de diagnóstico para {empresa}: {e} - lo enviará Make")
+            return False
+
+    def cerrar(self) -> None:
+        self.remitente.cerrar()
+
+
+def crear_servicio_correo() -> Optional[ServicioCorreo]:
+    """Compila la plantilla y crea el remitente. None = correo local deshabilitado."""
+    remitente = crear_remitente()
+    if remitente is None:
+        logging.info("📧 SMTP_HOST no configurado - el correo del diagnóstico lo sigue enviando Make")
+        return None
+    ruta = _buscar_plantilla()
+    if ruta is None:
+        logging.error("❌ Plantilla de correo no encontrada (EMAIL_TEMPLATE_PATH / EMAIL_TEMPLATE_DIR) - correo local deshabilitado")
+        return None
+    try:
+        plantilla, assets = compilar_plantilla(ruta)
+    except PlantillaInvalida as e:
+        logging.error(f"❌ Plantilla de correo inválida ({ruta}): {e} - correo local deshabilitado")
+        return None
+    logging.info(f"📧 Plantilla de correo compilada: {ruta} ({len(plantilla.campos)} campos, {len(assets)} assets con hash)")
+    return ServicioCorreo(plantilla, assets, remitente)
@@ -0,0 +1,324 @@
+# eventos_particionados.py
+"""
+Tabla `events` particionada por mes en archivos SQLite separados.
+
+Cada pregunta vista escribe un evento, así que una sola tabla crece sin
+límite y borrar filas viejas (`DELETE ... WHERE created_at < ?`) toma locks
+de escritura largos y deja el archivo inflado. Aquí cada mes vive en su
+propio archivo (`eventos/events-YYYY-MM.db`) con el mismo esquema.
+
+Beneficios de rendimiento:
+- Retención = borrar archivos completos (instantáneo, sin locks ni fragmentación)
+- Las consultas adjuntan (ATTACH, solo lectura) únicamente las particiones del
+  rango pedido y las ven como una única vista `events`
+- La ingesta solo toca la partición del mes en curso; VACUUM de los meses
+  cerrados corre en background sobre otros archivos, sin bloquearla
+- Los eventos que aún estén en la tabla `events` de analytics.db (p. ej. los
+  de seed_sample_data.py) se migran por lotes en el mantenimiento, sin
+  duplicados aunque el proceso muera a mitad de un lote
+
+Ejemplo:
+    eventos.consultar(
+        "SELECT event_type, COUNT(*) FROM events WHERE created_at >= ? GROUP BY event_type",
+        ("2026-01-01",), desde=date(2026, 1, 1),
+    )
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+PREFIJO = "events-"
+EXTENSION = ".db"
+MAX_CONEXIONES_ESCRITURA = 2  # Por hilo: mes en curso y anterior
+MAX_PARTICIONES_LECTURA = 10  # Límite de ATTACH por conexión en el SQLite estándar
+INTERVALO_MANTENIMIENTO = 3600  # segundos entre ciclos
+LOTE_MIGRACION = 5000
+# Los eventos aceptan timestamps del cliente de hasta 24 h atrás: un mes se
+# considera cerrado (y se puede compactar) un día después de terminar
+GRACIA_CIERRE = timedelta(days=1)
+
+ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        event_type TEXT NOT NULL,
+        event_data TEXT,
+        created_at TEXT NOT NULL
+    )
+"""
+# Último id del legado copiado a cada partición, por ORIGEN: los ids solo crecen
+# dentro de un mismo analytics.db (AUTOINCREMENT), no entre bases recreadas. Se
+# actualiza en la misma transacción que la copia.
+ESQUEMA_MIGRACION = """
+    CREATE TABLE IF NOT EXISTS migracion_legado (
+        origen TEXT PRIMARY KEY,
+        ultimo_id INTEGER NOT NULL
+    )
+"""
+# Identidad de analytics.db: se crea con la primera migración y cambia si la base
+# se recrea (a diferencia de la ruta o el inodo, que se pueden reutilizar)
+ESQUEMA_ORIGEN = """
+    CREATE TABLE IF NOT EXISTS migracion_origen (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        origen TEXT NOT NULL
+    )
+"""
+
+
+def periodo_de(created_at: str) -> str:
+    """'2026-03-14T10:00:00' -> '2026-03'."""
+    return created_at[:7]
+
+
+def _primer_dia(periodo: str) -> date:
+    return date(int(periodo[:4]), int(periodo[5:7]), 1)
+
+
+def _mes_siguiente(dia: date) -> date:
+    return date(dia.year + dia.month // 12, dia.month % 12 + 1, 1)
+
+
+class EventosParticionados:
+    """Particiones mensuales de `events`, una conexión por hilo y partición."""
+
+    def __init__(self, directorio: Path):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+    def _ruta(self, periodo: str) -> Path:
+        return self.directorio / f"{PREFIJO}{periodo}{EXTENSION}"
+
+    def periodos(self) -> List[str]:
+        """Particiones existentes, de la más antigua a la más nueva."""
+        return sorted(
+            p.name[len(PREFIJO):-len(EXTENSION)]
+            for p in self.directorio.glob(f"{PREFIJO}*{EXTENSION}")
+        )
+
+    def periodos_en_rango(self, desde: Optional[date], hasta: Optional[date]) -> List[str]:
+        """Particiones que pueden tener eventos en [desde, hasta] (poda por nombre de archivo)."""
+        inicio = f"{desde:%Y-%m}" if desde else ""
+        fin = f"{hasta:%Y-%m}" if hasta else "9999-99"
+        return [p for p in self.periodos() if inicio <= p <= fin]
+
+    # --- ESCRITURA ---
+    def _conexion(self, periodo: str) -> sqlite3.Connection:
+        conexiones: Dict[str, sqlite3.Connection] = getattr(self._local, "conexiones", None)
+        if conexiones is None:
+            conexiones = self._local.conexiones = {}
+        conn = conexiones.get(periodo)
+        if conn is None:
+            conn = sqlite3.connect(self._ruta(periodo), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(ESQUEMA)
+                columnas = [fila[1] for fila in conn.execute("PRAGMA table_info(migracion_legado)")]
+                if columnas and "origen" not in columnas:
+                    conn.execute("DROP TABLE migracion_legado")  # Marca anterior, sin origen
+                conn.execute(ESQUEMA_MIGRACION)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_events_session ON events(session_id)")
+            # Solo se escribe en el mes en curso (y el anterior, por la gracia de 24 h):
+            # las conexiones a meses viejos se cierran para no retener archivos borrados
+            while len(conexiones) >= MAX_CONEXIONES_ESCRITURA:
+                conexiones.pop(min(conexiones)).close()
+            conexiones[periodo] = conn
+        return conn
+
+    def insertar(self, filas: Iterable[Tuple[str, str, Optional[str], str]]) -> int:
+        """Inserta (session_id, event_type, event_data, created_at), agrupando por mes."""
+        por_periodo = defaultdict(list)
+        for fila in filas:
+            por_periodo[periodo_de(fila[3])].append(fila)
+        for periodo, grupo in por_periodo.items():
+            conn = self._conexion(periodo)
+            with conn:
+                conn.executemany(
+                    "INSERT INTO events (session_id, event_type, event_data, created_at) VALUES (?, ?, ?, ?)",
+                    grupo,
+                )
+        return sum(len(grupo) for grupo in por_periodo.values())
+
+    # --- LECTURA ---
+    @contextmanager
+    def _lectura(self, periodos: Sequence[str]) -> Iterator[sqlite3.Connection]:
+        """Conexión con una vista temporal `events` (UNION ALL) sobre `periodos`.
+
+        SQLite empuja los filtros a cada rama, así que cada partición usa su
+        propio índice de created_at. Las particiones se adjuntan en solo
+        lectura: una que la retención borró en el medio se omite en vez de
+        recrearse vacía.
+        """
+        conn = sqlite3.connect("file::memory:", uri=True, check_same_thread=False)
+        try:
+            adjuntas = 0
+            for periodo in periodos:
+                try:
+                    conn.execute(f"ATTACH DATABASE ? AS p{adjuntas}", (f"{self._ruta(periodo).resolve().as_uri()}?mode=ro",))
+                except sqlite3.OperationalError:
+                    if self._ruta(periodo).exists():
+                        raise
+                    continue
+                adjuntas += 1
+            if adjuntas:
+                union = " UNION ALL ".join(f"SELECT * FROM p{i}.events" for i in range(adjuntas))
+                conn.execute(f"CREATE TEMP VIEW events AS {union}")
+            else:
+                conn.execute(ESQUEMA.replace("CREATE TABLE", "CREATE TEMP TABLE"))
+            yield conn
+        finally:
+            conn.close()
+
+    def consultar(self, sql: str, parametros: Sequence = (), desde: Optional[date] = None,
+                  hasta: Optional[date] = None) -> List[tuple]:
+        """Ejecuta `sql` sobre la vista `events` de las particiones de [desde, hasta] (bloqueante).
+
+        El SQLite estándar adjunta hasta 10 bases por conexión y la retención
+        por defecto guarda 13 meses: los rangos más largos se consultan por
+        tramos y se devuelven las filas de todos. Las agregaciones deben poder
+        sumarse entre tramos (p. ej. GROUP BY + COUNT).
+        """
+        periodos = self.periodos_en_rango(desde, hasta)
+        filas: List[tuple] = []
+        for inicio in range(0, max(len(periodos), 1), MAX_PARTICIONES_LECTURA):
+            with self._lectura(periodos[inicio:inicio + MAX_PARTICIONES_LECTURA]) as conn:
+                filas.extend(conn.execute(sql, parametros).fetchall())
+        return filas
+
+    # --- MANTENIMIENTO ---
+    def migrar_legado(self, ruta_principal: str, limite: int = LOTE_MIGRACION) -> int:
+        """Mueve un lote de eventos de la tabla `events` de analytics.db a las particiones.
+
+        Por lotes y por id para no tomar un lock de escritura largo sobre la
+        base principal. Retorna cuántos movió.
+
+        Con WAL, una transacción sobre varios archivos (ATTACH) no es atómica
+        entre ellos, así que cada partición guarda en la MISMA transacción de la
+        copia el último id del legado que ya recibió: si el proceso muere antes
+        del DELETE, el próximo ciclo omite esas filas en vez de duplicarlas.
+        La marca es por origen (ver ESQUEMA_ORIGEN): si analytics.db se recrea,
+        sus ids vuelven a empezar y no se confunden con los ya copiados.
+        """
+        conn = sqlite3.connect(ruta_principal, timeout=30)
+        try:
+            filas = conn.execute(
+                "SELECT id, session_id, event_type, event_data, created_at FROM events ORDER BY id LIMIT ?",
+                (limite,),
+            ).fetchall()
+            if not filas:
+                return 0
+            origen = self._origen(conn)
+            por_periodo = defaultdict(list)
+            for fila in filas:
+                por_periodo[periodo_de(fila[4])].append(fila)
+            for periodo, grupo in por_periodo.items():
+                particion = self._conexion(periodo)
+                with particion:
+                    marca = particion.execute(
+                        "SELECT ultimo_id FROM migracion_legado WHERE origen = ?", (origen,)
+                    ).fetchone()
+                    copiado = marca[0] if marca else 0
+                    particion.executemany(
+                        "INSERT INTO events (session_id, event_type, event_data, created_at) VALUES (?, ?, ?, ?)",
+                        (fila[1:] for fila in grupo if fila[0] > copiado),
+                    )
+                    particion.execute(
+                        "INSERT OR REPLACE INTO migracion_legado (origen, ultimo_id) VALUES (?, ?)",
+                        (origen, max(copiado, grupo[-1][0])),
+                    )
+            with conn:
+                conn.execute("DELETE FROM events WHERE id <= ?", (filas[-1][0],))
+            return len(filas)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _origen(conn: sqlite3.Connection) -> str:
+        """Identidad de analytics.db (se crea la primera vez que hay eventos que migrar)."""
+        with conn:
+            conn.execute(ESQUEMA_ORIGEN)
+            conn.execute("INSERT OR IGNORE INTO migracion_origen (id, origen) VALUES (1, lower(hex(randomblob(16))))")
+        return conn.execute("SELECT origen FROM migracion_origen WHERE id = 1").fetchone()[0]
+
+    def compactar_cerrados(self, hoy: date) -> List[str]:
+        """VACUUM una sola vez de cada mes cerrado (marca: PRAGMA user_version = 1)."""
+        compactados = []
+        for periodo in self.periodos():
+            if _mes_siguiente(_primer_dia(periodo)) + GRACIA_CIERRE > hoy:
+                continue
+            conn = sqlite3.connect(self._ruta(periodo), timeout=30)
+            try:
+                (version,) = conn.execute("PRAGMA user_version").fetchone()
+                if version >= 1:
+                    continue
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA optimize")
+                conn.execute("PRAGMA user_version = 1")
+                compactados.append(periodo)
+            finally:
+                conn.close()
+        return compactados
+
+    def aplicar_retencion(self, meses: int, hoy: date) -> List[str]:
+        """Borra las particiones anteriores a los últimos `meses` meses (incluye el actual)."""
+        limite = hoy.replace(day=1)
+        for _ in range(max(meses, MAX_CONEXIONES_ESCRITURA) - 1):  # Nunca los meses que reciben escrituras
+            limite = (limite - timedelta(days=1)).replace(day=1)
+        borrados = []
+        for periodo in self.periodos():
+            if periodo >= f"{limite:%Y-%m}":
+                break
+            for sufijo in ("", "-wal", "-shm"):
+                try:
+                    os.remove(f"{self._ruta(periodo)}{sufijo}")
+                except FileNotFoundError:
+                    pass
+            borrados.append(periodo)
+        return borrados
+
+    def mantenimiento(self, ruta_principal: str, retencion_meses: int) -> None:
+        """Migración del legado + VACUUM de meses cerrados + retención.
+
+        Solo un worker lo ejecuta a la vez (flock); los demás omiten el ciclo.
+        """
+        with open(self.directorio / ".lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            movidos = 0
+            while True:
+                lote = self.migrar_legado(ruta_principal)
+                movidos += lote
+                if lote < LOTE_MIGRACION:
+                    break
+            if movidos:
+                logging.info(f"🗂️ Eventos: {movidos} eventos migrados a particiones mensuales")
+            hoy = date.today()
+            for periodo in self.compactar_cerrados(hoy):
+                logging.info(f"🗂️ Eventos: partición {periodo} compactada (VACUUM)")
+            for periodo in self.aplicar_retencion(retencion_meses, hoy):
+                logging.info(f"🗂️ Eventos: partición {periodo} eliminada por retención")
+
+
+async def ciclo_mantenimiento(eventos: EventosParticionados, ruta_principal: str, retencion_meses: int,
+                              intervalo: float = INTERVALO_MANTENIMIENTO):
+    """Tarea de fondo del lifespan: mantenimiento de particiones en un hilo."""
+    while True:
+        try:
+            await run_in_threadpool(eventos.mantenimiento, ruta_principal, retencion_meses)
+        except Exception as e:
+            logging.error(f"❌ Error en mantenimiento de particiones de eventos: {e}")
+        await asyncio.sleep(intervalo)
@@ -0,0 +1,218 @@
+# geoip.py
+"""
+Resolución local IP -> país para las sesiones de analytics.
+
+Reemplaza la consulta HTTP externa (IP-API) por una tabla de rangos compacta,
+compilada una vez desde una base CSV estándar y abierta con mmap.
+
+Beneficios de rendimiento:
+- Cero llamadas de red: sin latencia, sin rate limits, sin fallos externos
+- mmap: todos los workers comparten las mismas páginas del page cache del SO
+- Búsqueda binaria O(log n) sobre registros de ancho fijo (big-endian, así
+  que comparar bytes equivale a comparar números)
+- LRU por worker delante de la búsqueda (las IPs de una sesión se repiten)
+- IPs privadas/loopback se descartan sin buscar
+
+Formatos CSV soportados (con o sin encabezado):
+- DB-IP / "ip-to-country-lite":  inicio,fin,código
+- IP2Location LITE DB1:          desde,hasta,código,nombre  (IPs como enteros)
+
+Compilar:
+    python geoip.py entrada.csv geoip.bin
+"""
+import csv
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+MAGIC = b"GEOIP1\x00\x00"
+CABECERA = struct.Struct(">8sIII")  # magic, n_v4, n_v6, tamaño JSON de países
+ANCHO_V4 = 4 + 4 + 2  # inicio, fin, índice de país
+ANCHO_V6 = 16 + 16 + 2
+# Proxies propios delante del backend. Default 0 (IP de la conexión): con 1 y
+# NADA delante, el cliente escribe la última entrada de X-Forwarded-For y elige
+# su IP. La imagen Docker (Railway, un proxy de borde) fija 1.
+PROXIES_CONFIABLES = int(os.environ.get("PROXIES_CONFIABLES", "0"))
+
+GEOIP_DB_PATH = os.environ.get("GEOIP_DB_PATH", "geoip.bin")
+TAMANO_LRU = 8192
+
+
+class _Inicios:
+    """Secuencia de solo lectura con las IPs de inicio (para bisect) sin copiar el mmap."""
+
+    def __init__(self, datos: mmap.mmap, offset: int, ancho_registro: int, ancho_clave: int, total: int):
+        self.datos = datos
+        self.offset = offset
+        self.ancho_registro = ancho_registro
+        self.ancho_clave = ancho_clave
+        self.total = total
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, indice: int) -> bytes:
+        inicio = self.offset + indice * self.ancho_registro
+        return self.datos[inicio:inicio + self.ancho_clave]
+
+
+class TablaGeoIP:
+    """Tabla de rangos IPv4/IPv6 -> país abierta con mmap."""
+
+    def __init__(self, ruta: Path):
+        with open(ruta, "rb") as f:
+            self._datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_v4, n_v6, tamano_paises = CABECERA.unpack_from(self._datos, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{ruta} no es una tabla GeoIP compilada")
+        offset_v4 = CABECERA.size
+        offset_v6 = offset_v4 + n_v4 * ANCHO_V4
+        offset_paises = offset_v6 + n_v6 * ANCHO_V6
+        self._v4 = _Inicios(self._datos, offset_v4, ANCHO_V4, 4, n_v4)
+        self._v6 = _Inicios(self._datos, offset_v6, ANCHO_V6, 16, n_v6)
+        self.paises: List[Tuple[str, str]] = [
+            tuple(p) for p in json.loads(self._datos[offset_paises:offset_paises + tamano_paises])
+        ]
+        self.rangos = n_v4 + n_v6
+
+    def buscar(self, ip: ipaddress._BaseAddress) -> Optional[Tuple[str, str]]:
+        """(nombre, código) del país o None si la IP no está en ningún rango."""
+        clave = ip.packed
+        tabla = self._v4 if ip.version == 4 else self._v6
+        indice = bisect_right(tabla, clave) - 1
+        if indice < 0:
+            return None
+        inicio = tabla.offset + indice * tabla.ancho_registro
+        fin = self._datos[inicio + tabla.ancho_clave:inicio + 2 * tabla.ancho_clave]
+        if clave > fin:
+            return None
+        (pais,) = struct.unpack_from(">H", self._datos, inicio + 2 * tabla.ancho_clave)
+        codigo, nombre = self.paises[pais]
+        return nombre, codigo
+
+
+# --- TABLA DEL WORKER (se abre una sola vez) ---
+_tabla: Optional[TablaGeoIP] = None
+if Path(GEOIP_DB_PATH).exists():
+    try:
+        _tabla = TablaGeoIP(Path(GEOIP_DB_PATH))
+        logging.info(f"🌎 Tabla GeoIP cargada: {_tabla.rangos} rangos desde {GEOIP_DB_PATH}")
+    except (OSError, ValueError) as e:
+        logging.error(f"❌ No se pudo abrir la tabla GeoIP {GEOIP_DB_PATH}: {e}")
+else:
+    logging.warning(f"⚠️ Tabla GeoIP no encontrada ({GEOIP_DB_PATH}) - sesiones sin país")
+
+if PROXIES_CONFIABLES > 0:
+    logging.info(f"🌐 IP del cliente desde X-Forwarded-For ({PROXIES_CONFIABLES} proxy(s) confiable(s) delante)")
+else:
+    logging.info("🌐 IP del cliente desde la conexión (PROXIES_CONFIABLES=0, sin proxy delante)")
+
+
+@lru_cache(maxsize=TAMANO_LRU)
+def resolver_pais(ip: str) -> Tuple[Optional[str], Optional[str]]:
+    """(country, country_code) para una IP; (None, None) si es privada o desconocida."""
+    if _tabla is None or not ip:
+        return None, None
+    try:
+        direccion = ipaddress.ip_address(ip)
+    except ValueError:
+        return None, None
+    if direccion.version == 6 and direccion.ipv4_mapped:
+        direccion = direccion.ipv4_mapped
+    if not direccion.is_global:
+        return None, None  # Privada, loopback, link-local...
+    return _tabla.buscar(direccion) or (None, None)
+
+
+def ip_desde_scope(scope, proxies_confiables: int = PROXIES_CONFIABLES) -> str:
+    """IP del cliente a partir del scope ASGI, NO falsificable con X-Forwarded-For.
+
+    Cada proxy agrega la IP que le habló al FINAL del encabezado; las entradas
+    de la izquierda las escribe el cliente. Con N proxies confiables delante
+    (Railway: 1), la IP real es la N-ésima desde la derecha. Si llegan varios
+    encabezados X-Forwarded-For se leen como una sola lista (RFC 7230 §3.2.2):
+    el cliente puede mandar uno propio y el proxy agregar otro después.
+    """
+    if proxies_confiables > 0:
+        entradas: List[str] = []
+        for nombre, valor in scope["headers"]:
+            if nombre == b"x-forwarded-for":
+                entradas.extend(valor.decode("latin-1").split(","))
+        if entradas:
+            return entradas[max(len(entradas) - proxies_confiables, 0)].strip()
+    cliente = scope.get("client")
+    return cliente[0] if cliente else ""
+
+
+def ip_cliente(request) -> str:
+    """IP del cliente de una request de Starlette (ver ip_desde_scope)."""
+    return ip_desde_scope(request.scope)
+
+
+# ==============================================================================
+# COMPILACIÓN DESDE CSV
+# ==============================================================================
+
+def _a_direccion(valor: str, version: Optional[int] = None) -> ipaddress._BaseAddress:
+    valor = valor.strip()
+    if valor.isdigit():
+        numero = int(valor)
+        # IP2Location usa enteros; > 2^32 solo puede ser IPv6
+        if version == 6 or numero > 0xFFFFFFFF:
+            return ipaddress.IPv6Address(numero)
+        return ipaddress.IPv4Address(numero)
+    return ipaddress.ip_address(valor)
+
+
+def compilar_csv(entrada: Path, salida: Path) -> int:
+    """Convierte un CSV de rangos en la tabla binaria. Retorna cuántos rangos escribió."""
+    rangos = {4: [], 6: []}
+    paises: Dict[str, int] = {}
+    lista_paises: List[Tuple[str, str]] = []
+    with open(entrada, newline="", encoding="utf-8") as f:
+        for fila in csv.reader(f):
+            if len(fila) < 3:
+                continue
+            try:
+                inicio = _a_direccion(fila[0])
+                fin = _a_direccion(fila[1], inicio.version)
+            except ValueError:
+                continue  # Encabezado o fila corrupta
+            codigo = fila[2].strip().upper()
+            if not codigo or codigo in ("-", "ZZ") or inicio.version != fin.version:
+                continue
+            nombre = fila[3].strip() if len(fila) > 3 and fila[3].strip() else codigo
+            if codigo not in paises:
+                paises[codigo] = len(lista_paises)
+                lista_paises.append((codigo, nombre))
+            rangos[inicio.version].append((inicio.packed, fin.packed, paises[codigo]))
+
+    for version in rangos:
+        rangos[version].sort()
+    paises_json = json.dumps(lista_paises, ensure_ascii=False).encode("utf-8")
+    temporal = salida.with_suffix(".tmp")
+    with open(temporal, "wb") as f:
+        f.write(CABECERA.pack(MAGIC, len(rangos[4]), len(rangos[6]), len(paises_json)))
+        for version in (4, 6):
+            for inicio, fin, pais in rangos[version]:
+                f.write(inicio + fin + struct.pack(">H", pais))
+        f.write(paises_json)
+    os.replace(temporal, salida)
+    return len(rangos[4]) + len(rangos[6])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 3:
+        print("Uso: python geoip.py entrada.csv geoip.bin")
+        sys.exit(1)
+    total = compilar_csv(Path(sys.argv[1]), Path(sys.argv[2]))
+    logging.info(f"🌎 Tabla GeoIP compilada: {total} rangos -> {sys.argv[2]}")
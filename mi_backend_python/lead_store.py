@@ -0,0 +1,325 @@
+# lead_store.py
+"""
+Almacén local y durable de leads/diagnósticos (SQLite).
+
+Cada `data_to_insert` que se envía a Make.com se guarda ANTES aquí, así que
+si un escenario de Make falla los leads se pueden re-exportar en bloque.
+
+Beneficios de rendimiento:
+- WAL + synchronous=NORMAL: inserciones de ~decenas de µs sin bloquear lectores
+- Índice (created_at, id): filtros por fecha y paginación por keyset sin OFFSET
+- Exportación con generador en lotes: memoria constante sin importar el volumen
+- Cursores opacos (created_at, id) para reanudar exportes interrumpidos
+"""
+import base64
+import csv
+import io
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from typing import Iterator, Optional, Sequence, Tuple
+
+COLUMNAS_EXPORTE = [
+    "diagnostico_id",
+    "created_at",
+    "nombre_lead",
+    "empresa",
+    "cargo_lead",
+    "email_lead",
+    "telefono_lead",
+    "numero_trabajadores",
+    "tipo_empresa",
+    "severidad_maxima",
+    "monto_multa_soles",
+    "total_incumplimientos",
+    "resultado_completo_json",
+    "catalogo_version",
+]
+
+TAMANO_LOTE = 500  # Filas por consulta durante la exportación
+
+# Columnas tipadas para analítica (archivo_columnar.py) y trazabilidad normativa.
+# Se agregan con ALTER TABLE si la base fue creada por una versión anterior.
+COLUMNAS_ANALITICAS = [
+    ("rango_trabajadores", "TEXT"),
+    ("mascara_respondidas", "INTEGER"),
+    ("mascara_no", "INTEGER"),
+    ("hallazgos_leves", "INTEGER"),
+    ("hallazgos_graves", "INTEGER"),
+    ("hallazgos_muy_graves", "INTEGER"),
+    ("catalogo_version", "TEXT"),
+    ("jurisdiccion", "TEXT"),
+]
+
+NUMERO_PREGUNTAS = 41  # q1..q41 -> bits 0..40
+
+
+def mascaras_respuestas(respuestas: dict) -> Tuple[int, int]:
+    """Codifica las respuestas como bitmasks: (preguntas respondidas, respuestas 'no').
+
+    La pregunta q{i} ocupa el bit i-1. Claves desconocidas se ignoran.
+    """
+    respondidas = 0
+    no = 0
+    for pregunta_id, respuesta in respuestas.items():
+        if not pregunta_id.startswith("q") or not pregunta_id[1:].isdigit():
+            continue
+        indice = int(pregunta_id[1:]) - 1
+        if 0 <= indice < NUMERO_PREGUNTAS:
+            respondidas |= 1 << indice
+            if str(respuesta).lower() == "no":
+                no |= 1 << indice
+    return respondidas, no
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no tiene el formato esperado."""
+
+
+def codificar_cursor(created_at: str, lead_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{lead_id}".encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        created_at, _, lead_id = base64.urlsafe_b64decode(cursor + relleno).decode().rpartition("|")
+        return created_at, int(lead_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise CursorInvalido("Cursor inválido") from e
+
+
+class LeadStore:
+    """Persistencia de leads en SQLite con una conexión por hilo."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._inicializar()
+        logging.info(f"🗄️ Almacén de leads listo en: {ruta}")
+
+    def _conectar(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.ruta, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._conectar()
+        return conn
+
+    def _inicializar(self) -> None:
+        conn = self._conectar()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leads (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    diagnostico_id TEXT NOT NULL UNIQUE,
+                    created_at TEXT NOT NULL,
+                    nombre_lead TEXT,
+                    empresa TEXT,
+                    cargo_lead TEXT,
+                    email_lead TEXT,
+                    telefono_lead TEXT,
+                    numero_trabajadores INTEGER,
+                    tipo_empresa TEXT,
+                    severidad_maxima TEXT,
+                    monto_multa_soles REAL,
+                    total_incumplimientos INTEGER,
+                    resultado_completo_json TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_created_at ON leads(created_at, id)")
+            existentes = {fila[1] for fila in conn.execute("PRAGMA table_info(leads)")}
+            for nombre, tipo in COLUMNAS_ANALITICAS:
+                if nombre not in existentes:
+                    try:
+                        conn.execute(f"ALTER TABLE leads ADD COLUMN {nombre} {tipo}")
+                    except sqlite3.OperationalError as e:
+                        # Otro worker pudo agregarla al mismo tiempo
+                        if "duplicate column" not in str(e):
+                            raise
+        conn.close()
+
+    # --- ESCRITURA ---
+    def guardar(self, data: dict, respuestas: Optional[dict] = None) -> str:
+        """Guarda un `data_to_insert` y retorna su diagnostico_id (UUID público).
+
+        `respuestas` (q1..q41) se guarda como bitmasks para la analítica.
+        """
+        diagnostico_id = data.get("diagnostico_id") or uuid.uuid4().hex
+        resultado = data.get("resultado_completo_json") or {}
+        resumen = resultado.get("diagnostico", {}).get("resumen_hallazgos", {})
+        mascara_respondidas, mascara_no = mascaras_respuestas(respuestas or {})
+        conn = self._conexion()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO leads (
+                    diagnostico_id, created_at, nombre_lead, empresa, cargo_lead,
+                    email_lead, telefono_lead, numero_trabajadores, tipo_empresa,
+                    severidad_maxima, monto_multa_soles, total_incumplimientos,
+                    resultado_completo_json, rango_trabajadores, mascara_respondidas,
+                    mascara_no, hallazgos_leves, hallazgos_graves, hallazgos_muy_graves,
+                    catalogo_version, jurisdiccion
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    diagnostico_id,
+                    data["created_at"],
+                    data.get("nombre_lead"),
+                    data.get("empresa"),
+                    data.get("cargo_lead"),
+                    data.get("email_lead"),
+                    data.get("telefono_lead"),
+                    data.get("numero_trabajadores"),
+                    data.get("tipo_empresa"),
+                    data.get("severidad_maxima"),
+                    data.get("monto_multa_soles"),
+                    data.get("total_incumplimientos"),
+                    json.dumps(resultado, ensure_ascii=False),
+                    resultado.get("multa", {}).get("rango_trabajadores"),
+                    mascara_respondidas,
+                    mascara_no,
+                    resumen.get("Leves", 0),
+                    resumen.get("Grave", 0),
+                    resumen.get("Muy Grave", 0),
+                    resultado.get("catalogo_version"),
+                    resultado.get("jurisdiccion", {}).get("codigo"),
+                ),
+            )
+        return diagnostico_id
+
+    # --- LECTURA PUNTUAL ---
+    def claves_reporte(self, diagnostico_id: str) -> Optional[tuple]:
+        """(catalogo_version, mascara_respondidas, mascara_no, tipo_empresa, rango_trabajadores, jurisdiccion)
+
+        Sin el JSON del resultado: basta para resolver la caché de informes.
+        """
+        return self._conexion().execute(
+            """
+            SELECT catalogo_version, mascara_respondidas, mascara_no, tipo_empresa, rango_trabajadores, jurisdiccion
+            FROM leads WHERE diagnostico_id = ?
+            """,
+            (diagnostico_id,),
+        ).fetchone()
+
+    def resultado(self, diagnostico_id: str) -> Optional[str]:
+        """resultado_completo_json (texto) de un diagnóstico."""
+        fila = self._conexion().execute(
+            "SELECT resultado_completo_json FROM leads WHERE diagnostico_id = ?", (diagnostico_id,)
+        ).fetchone()
+        return fila[0] if fila else None
+
+    def conversiones_desde(self, desde: str, despues_de_id: int,
+                           hasta_id: Optional[int] = None) -> Tuple[int, float, int]:
+        """Leads creados desde `desde` con id mayor al dado (lectura incremental por PK).
+
+        `hasta_id` acota la lectura a un cursor ya leído (snapshot consistente).
+        Retorna (cantidad, suma de multas, último id visto).
+        """
+        conn = self._conexion()
+        cantidad, suma, maximo = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(monto_multa_soles), 0), MAX(id) FROM leads "
+            "WHERE id > ? AND id <= ? AND created_at >= ?",
+            (despues_de_id, hasta_id if hasta_id is not None else 2**63 - 1, desde),
+        ).fetchone()
+        if maximo is None:
+            (maximo,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM leads").fetchone()
+        return cantidad, suma, max(maximo, despues_de_id)
+
+    # --- LECTURA EN STREAMING ---
+    def iterar(
+        self,
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limite: Optional[int] = None,
+        columnas: Sequence[str] = COLUMNAS_EXPORTE,
+    ) -> Iterator[list]:
+        """Genera lotes de filas `(id, created_at, *columnas)` ordenadas por (created_at, id).
+
+        `desde` es inclusivo y `hasta` exclusivo (ISO 8601). Cada consulta usa el
+        índice y continúa desde la última fila vista (keyset), así que nunca hay
+        más de TAMANO_LOTE filas en memoria ni se mantiene una transacción abierta.
+        """
+        ultimo = decodificar_cursor(cursor) if cursor else None
+        restantes = limite
+        conn = self._conectar()
+        try:
+            while restantes is None or restantes > 0:
+                condiciones, parametros = [], []
+                if desde:
+                    condiciones.append("created_at >= ?")
+                    parametros.append(desde)
+                if hasta:
+                    condiciones.append("created_at < ?")
+                    parametros.append(hasta)
+                if ultimo:
+                    condiciones.append("(created_at, id) > (?, ?)")
+                    parametros.extend(ultimo)
+                where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+                lote = TAMANO_LOTE if restantes is None else min(TAMANO_LOTE, restantes)
+                filas = conn.execute(
+                    f"SELECT id, created_at, {', '.join(columnas)} FROM leads {where} "
+                    f"ORDER BY created_at, id LIMIT ?",
+                    (*parametros, lote),
+                ).fetchall()
+                if not filas:
+                    return
+                yield filas
+                ultimo = (filas[-1][1], filas[-1][0])
+                if restantes is not None:
+                    restantes -= len(filas)
+                if len(filas) < lote:
+                    return
+        finally:
+            conn.close()
+
+    def dias_con_leads(self, desde: Optional[str] = None, hasta: Optional[str] = None) -> list:
+        """Fechas (YYYY-MM-DD) con al menos un lead en [desde, hasta)."""
+        condiciones, parametros = [], []
+        if desde:
+            condiciones.append("created_at >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("created_at < ?")
+            parametros.append(hasta)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        conn = self._conectar()
+        try:
+            filas = conn.execute(
+                f"SELECT DISTINCT substr(created_at, 1, 10) FROM leads {where} ORDER BY 1", parametros
+            ).fetchall()
+        finally:
+            conn.close()
+        return [fila[0] for fila in filas]
+
+    def exportar_ndjson(self, **filtros) -> Iterator[bytes]:
+        """Una línea JSON por lead; cada línea incluye el cursor para reanudar."""
+        for filas in self.iterar(**filtros):
+            lineas = []
+            for fila in filas:
+                registro = dict(zip(COLUMNAS_EXPORTE, fila[2:]))
+                registro["resultado_completo_json"] = json.loads(registro["resultado_completo_json"])
+                registro["cursor"] = codificar_cursor(fila[1], fila[0])
+                lineas.append(json.dumps(registro, ensure_ascii=False))
+            yield ("\n".join(lineas) + "\n").encode("utf-8")
+
+    def exportar_csv(self, **filtros) -> Iterator[bytes]:
+        """CSV con encabezado; la última columna es el cursor para reanudar."""
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(COLUMNAS_EXPORTE + ["cursor"])
+        for filas in self.iterar(**filtros):
+            for fila in filas:
+                escritor.writerow([*fila[2:], codificar_cursor(fila[1], fila[0])])
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,111 @@
+# limite_cuerpo.py
+"""
+Límite de tamaño del cuerpo de las requests, por ruta, aplicado en streaming.
+
+Sin este middleware, `await request.json()` / `request.body()` acumulan el
+cuerpo completo en memoria antes de que ningún endpoint pueda validarlo: un
+POST de varios MB a /api/diagnostico se lee, se parsea y se descarta entero.
+
+Reglas:
+- Cada ruta tiene un tope en bytes (el primer prefijo que coincide gana).
+- Si `Content-Length` ya supera el tope, se responde 413 sin leer el cuerpo
+  y sin llegar al endpoint (ni ocupar un cupo del planificador de prioridades).
+- Si no hay `Content-Length` (chunked) o miente, los bytes se cuentan a
+  medida que llegan y la lectura se corta con 413 en el primer chunk que
+  excede el tope: nunca se acumula más de tope + un chunk.
+
+Beneficios de rendimiento:
+- El costo de memoria y de parseo por request queda acotado por ruta
+- El rechazo es O(1) y no pasa por el router ni por Pydantic
+"""
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from starlette.exceptions import HTTPException
+
+METODOS_CON_CUERPO = {"POST", "PUT", "PATCH", "DELETE"}
+LIMITE_POR_DEFECTO = 64 * 1024
+DETALLE = "Cuerpo de la request demasiado grande"
+
+
+class LimiteCuerpoMiddleware:
+    """Middleware ASGI que rechaza con 413 los cuerpos que superan el tope de su ruta."""
+
+    def __init__(self, app, limites: List[Tuple[str, int]], limite_por_defecto: int = LIMITE_POR_DEFECTO):
+        self.app = app
+        self.limites = limites  # (prefijo, bytes); más específicos primero
+        self.limite_por_defecto = limite_por_defecto
+
+    def limite(self, ruta: str) -> int:
+        for prefijo, maximo in self.limites:
+            if ruta.startswith(prefijo):
+                return maximo
+        return self.limite_por_defecto
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METODOS_CON_CUERPO:
+            await self.app(scope, receive, send)
+            return
+
+        maximo = self.limite(scope["path"])
+        declarado = _content_length(scope)
+        if declarado is not None and declarado > maximo:
+            logging.info(f"📏 Cuerpo rechazado por Content-Length ({declarado} > {maximo} bytes): {scope['path']}")
+            await self._rechazar(send)
+            return
+
+        recibidos = 0
+
+        async def receive_con_limite():
+            nonlocal recibidos
+            message = await receive()
+            if message["type"] == "http.request":
+                recibidos += len(message.get("body", b""))
+                if recibidos > maximo:
+                    logging.info(f"📏 Cuerpo cortado en streaming (> {maximo} bytes): {scope['path']}")
+                    # FastAPI y Starlette propagan HTTPException desde la lectura del cuerpo
+                    raise HTTPException(status_code=413, detail=DETALLE)
+            return message
+
+        await self.app(scope, receive_con_limite, send)
+
+    @staticmethod
+    async def _rechazar(send) -> None:
+        cuerpo = f'{{"detail":"{DETALLE}"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(cuerpo)).encode()),
+                (b"connection", b"close"),  # El resto del cuerpo no se va a leer
+            ],
+        })
+        await send({"type": "http.response.body", "body": cuerpo})
+
+
+def _content_length(scope) -> Optional[int]:
+    for nombre, valor in scope["headers"]:
+        if nombre == b"content-length":
+            try:
+                return int(valor)
+            except ValueError:
+                return None
+    return None
+
+
+def crear_limites_por_defecto(max_bytes_lote_analytics: int) -> List[Tuple[str, int]]:
+    """Topes por ruta, ajustables por variables de entorno.
+
+    El formulario completo (41 respuestas + datos del lead) pesa ~2 KB.
+    """
+    diagnostico = int(os.environ.get("LIMITE_CUERPO_DIAGNOSTICO", str(16 * 1024)))
+    analytics = int(os.environ.get("LIMITE_CUERPO_ANALYTICS", str(8 * 1024)))
+    limites = [
+        ("/api/diagnostico", diagnostico),
+        ("/api/analytics/events/batch", max_bytes_lote_analytics),
+        ("/api/analytics", analytics),
+    ]
+    logging.info(f"📏 Límites de cuerpo: diagnóstico={diagnostico} B, analytics={analytics} B, lotes={max_bytes_lote_analytics} B")
+    return limites
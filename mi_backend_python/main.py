@@ -1,30 +1,42 @@
 # main.py
+import asyncio
+import json
 import logging
 import os
+import re
 from contextlib import asynccontextmanager
-from datetime import datetime
-from typing import Dict
+from datetime import date, datetime, timedelta
+from typing import Annotated, Dict, Literal, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-import pandas as pd
-from constants import (
-    BASE_DE_DATOS_INFRACCIONES,
-    PREGUNTAS_EXENTAS_MYPE,
-    TABLA_MULTAS_GENERAL,
-    TABLA_MULTAS_MICRO,
-    TABLA_MULTAS_PEQUENA,
-    VALOR_UIT,
-)
+import catalogo
+from catalogo import SEVERIDADES, CatalogoInvalido, catalogo_activo, vigilar_catalogo
 import httpx
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, Request, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, ValidationError
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
 from pathlib import Path
+from static_frontend import StaticFrontend
+from prioridad_rutas import PriorityLimiterMiddleware, crear_planificador_por_defecto
+from limite_cuerpo import LimiteCuerpoMiddleware, crear_limites_por_defecto
+from limite_tasa import LimiteTasaMiddleware, crear_limitador_por_defecto
+from auth import verificar_admin
+from lead_store import NUMERO_PREGUNTAS, CursorInvalido, LeadStore, decodificar_cursor
+from archivo_columnar import ciclo_compactacion
+from analytics import MAX_BYTES_LOTE, router as analytics_router
+from analytics_store import AnalyticsStore
+from geoip import ip_cliente, resolver_pais
+from eventos_particionados import ciclo_mantenimiento
+from registro_logs import MonitorLogs, ciclo_sincronizacion
+from analytics_en_vivo import FeedAnalytics, ciclo_feed
+from reportes import FORMATOS, PDF_DISPONIBLE, GeneradorReportes, ciclo_limpieza, clave_reporte
+from correo import ServicioCorreo, crear_servicio_correo
+from perfilador import HZ_POR_DEFECTO, MAX_HZ, MAX_SEGUNDOS, PerfilEnCurso, formatear, perfilar, perfilar_todos, vigilar_solicitudes
 
 # --- CONFIGURACIÓN DEL LOGGING ---
 # Esto configurará el logger para que los mensajes se muestren en la salida
@@ -41,25 +53,35 @@ if not MAKE_WEBHOOK_URL:
 else:
     logging.info(f"MAKE_WEBHOOK_URL loaded: {MAKE_WEBHOOK_URL[:10]}...")
 
+# --- ALMACÉN LOCAL DE LEADS ---
+# En Railway/Docker apuntar LEADS_DB_PATH a un volumen persistente
+LEADS_DB_PATH = os.environ.get("LEADS_DB_PATH", "leads.db")
+# Archivos Arrow diarios para analítica offline (ver archivo_columnar.py)
+ARCHIVO_DIR = Path(os.environ.get("ARCHIVO_DIR", "archivo"))
+
+# --- BASE DE DATOS DE ANALYTICS (misma que puebla seed_sample_data.py) ---
+ANALYTICS_DB_PATH = os.environ.get("ANALYTICS_DB_PATH", "analytics.db")
+# Eventos particionados por mes (ver eventos_particionados.py)
+EVENTOS_DIR = Path(os.environ.get("EVENTOS_DIR", "eventos"))
+EVENTOS_RETENCION_MESES = int(os.environ.get("EVENTOS_RETENCION_MESES", "13"))
+
 # --- PEGA AQUÍ TODA TU LÓGICA DE CÁLCULO DE PYTHON ---
 # --- PEGA AQUÍ TODA TU LÓGICA DE CÁLCULO DE PYTHON ---
-# Los datos estáticos han sido movidos a constants.py
-def calcular_multa_sunafil(datos_formulario):
-    tipo_empresa = datos_formulario.get("tipo_empresa", "no_mype")
+# Los datos normativos (UIT, tablas, infracciones) viven en catalogo_sst.json
+# y se acceden vía catalogo.py (recargable en caliente, versionado)
+def calcular_multa_sunafil(datos_formulario, codigo_jurisdiccion=None):
+    # Snapshot único: aunque el catálogo se recargue a mitad del cálculo,
+    # todo el diagnóstico usa la misma versión normativa
+    normativa = catalogo_activo()
+    jurisdiccion = normativa.jurisdiccion(codigo_jurisdiccion)
     numero_trabajadores = int(datos_formulario.get("numero_trabajadores", 0))
-    respuestas = datos_formulario.get("respuestas", {})
-    hallazgos = {'Leves': 0, 'Grave': 0, 'Muy Grave': 0}
-    lista_hallazgos_detallada = []
-    
-    # Contar infracciones por severidad
-    for pregunta_id, respuesta in respuestas.items():
-        if respuesta.lower() == 'no':
-            if (tipo_empresa in ['micro', 'pequena']) and pregunta_id in PREGUNTAS_EXENTAS_MYPE:
-                continue
-            infraccion = BASE_DE_DATOS_INFRACCIONES.get(pregunta_id)
-            if infraccion:
-                hallazgos[infraccion['severidad']] += 1
-                lista_hallazgos_detallada.append(infraccion)
+    # Motor genérico sobre las tablas compiladas de la jurisdicción (ver catalogo.py)
+    evaluacion = jurisdiccion.evaluar(
+        datos_formulario.get("tipo_empresa", "no_mype"),
+        numero_trabajadores,
+        datos_formulario.get("respuestas", {}),
+    )
+    hallazgos = dict(zip(SEVERIDADES, evaluacion.conteos))
     
     # Determinar severidad máxima (para el diagnóstico)
     severidad_maxima = 'Ninguna'
@@ -67,68 +89,23 @@ def calcular_multa_sunafil(datos_formulario):
     elif hallazgos['Grave'] > 0: severidad_maxima = 'Grave'
     elif hallazgos['Leves'] > 0: severidad_maxima = 'Leves'
     
-    # NUEVO: Calcular multas ACUMULATIVAS
-    monto_multa = 0
-    if numero_trabajadores > 0 and sum(hallazgos.values()) > 0:
-        if tipo_empresa == 'micro':
-            if numero_trabajadores <= 9: columna = str(numero_trabajadores)
-            else: columna = '10 y más'
-            # Obtener multa unitaria por cada severidad
-            multa_leve = TABLA_MULTAS_MICRO.loc['Leves', columna]
-            multa_grave = TABLA_MULTAS_MICRO.loc['Grave', columna]
-            multa_muy_grave = TABLA_MULTAS_MICRO.loc['Muy Grave', columna]
-        elif tipo_empresa == 'pequena':
-            if numero_trabajadores <= 5: columna = '1 a 5'
-            elif numero_trabajadores <= 10: columna = '6 a 10'
-            elif numero_trabajadores <= 20: columna = '11 a 20'
-            elif numero_trabajadores <= 30: columna = '21 a 30'
-            elif numero_trabajadores <= 40: columna = '31 a 40'
-            elif numero_trabajadores <= 50: columna = '41 a 50'
-            elif numero_trabajadores <= 60: columna = '51 a 60'
-            elif numero_trabajadores <= 70: columna = '61 a 70'
-            elif numero_trabajadores <= 99: columna = '71 a 99'
-            else: columna = '100 y más'
-            # Obtener multa unitaria por cada severidad
-            multa_leve = TABLA_MULTAS_PEQUENA.loc['Leves', columna]
-            multa_grave = TABLA_MULTAS_PEQUENA.loc['Grave', columna]
-            multa_muy_grave = TABLA_MULTAS_PEQUENA.loc['Muy Grave', columna]
-        else: # No MYPE
-            if numero_trabajadores <= 10: rango = '1-10'
-            elif numero_trabajadores <= 25: rango = '11-25'
-            elif numero_trabajadores <= 50: rango = '26-50'
-            elif numero_trabajadores <= 100: rango = '51-100'
-            elif numero_trabajadores <= 200: rango = '101-200'
-            elif numero_trabajadores <= 300: rango = '201-300'
-            elif numero_trabajadores <= 400: rango = '301-400'
-            elif numero_trabajadores <= 500: rango = '401-500'
-            elif numero_trabajadores <= 600: rango = '501-600'
-            elif numero_trabajadores <= 700: rango = '601-700'
-            elif numero_trabajadores <= 800: rango = '701-800'
-            elif numero_trabajadores <= 900: rango = '801-900'
-            else: rango = '901-a-mas'
-            # Obtener multa unitaria por cada severidad
-            multa_leve = TABLA_MULTAS_GENERAL.loc[rango, 'Leve']
-            multa_grave = TABLA_MULTAS_GENERAL.loc[rango, 'Grave']
-            multa_muy_grave = TABLA_MULTAS_GENERAL.loc[rango, 'Muy Grave']
-        
-        # Sumar multas acumulativamente
-        monto_multa = (
-            hallazgos['Leves'] * multa_leve +
-            hallazgos['Grave'] * multa_grave +
-            hallazgos['Muy Grave'] * multa_muy_grave
-        )
+    # Multas ACUMULATIVAS: hallazgos por severidad × multa unitaria del rango
+    if evaluacion.monto:
+        multa_leve, multa_grave, multa_muy_grave = evaluacion.multas_unitarias
         
         # LOG de depuración
         logging.info(f"=== CÁLCULO MULTA ACUMULATIVA ===")
-        logging.info(f"Tipo empresa: {tipo_empresa}, Trabajadores: {numero_trabajadores}")
+        logging.info(f"Jurisdicción: {jurisdiccion.codigo}, Tipo empresa: {evaluacion.clase}, Trabajadores: {numero_trabajadores}")
         logging.info(f"Hallazgos: Leves={hallazgos['Leves']}, Grave={hallazgos['Grave']}, Muy Grave={hallazgos['Muy Grave']}")
         logging.info(f"Multas unitarias: Leve={multa_leve}, Grave={multa_grave}, Muy Grave={multa_muy_grave}")
-        logging.info(f"MONTO TOTAL ACUMULATIVO: {monto_multa}")
+        logging.info(f"MONTO TOTAL ACUMULATIVO: {evaluacion.monto} (catálogo {normativa.version})")
     
     return {
-        "lead": {"nombre": datos_formulario.get("nombre"), "empresa": datos_formulario.get("empresa"), "cargo": datos_formulario.get("cargo"), "numero_trabajadores": numero_trabajadores, "tipo_empresa": tipo_empresa.replace('_', ' ').title()},
-        "diagnostico": {"severidad_maxima": severidad_maxima, "total_incumplimientos": sum(hallazgos.values()), "resumen_hallazgos": hallazgos, "detalle_hallazgos": lista_hallazgos_detallada},
-        "multa": {"monto_final_soles": float(monto_multa)}
+        "lead": {"nombre": datos_formulario.get("nombre"), "empresa": datos_formulario.get("empresa"), "cargo": datos_formulario.get("cargo"), "numero_trabajadores": numero_trabajadores, "tipo_empresa": datos_formulario.get("tipo_empresa", "no_mype").replace('_', ' ').title()},
+        "diagnostico": {"severidad_maxima": severidad_maxima, "total_incumplimientos": sum(hallazgos.values()), "resumen_hallazgos": hallazgos, "detalle_hallazgos": evaluacion.detalle},
+        "multa": {"monto_final_soles": float(evaluacion.monto), "rango_trabajadores": evaluacion.rango, "clase_empresa": evaluacion.clase, "moneda": jurisdiccion.moneda, "simbolo_moneda": jurisdiccion.simbolo_moneda},
+        "jurisdiccion": {"codigo": jurisdiccion.codigo, "nombre": jurisdiccion.nombre, "nota_legal": jurisdiccion.nota_legal},
+        "catalogo_version": normativa.version
     }
 # --- FIN DE TU LÓGICA ---
 
@@ -147,12 +124,70 @@ async def lifespan(app: FastAPI):
         limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
     )
     logging.info("Cliente HTTP compartido inicializado")
+    app.state.lead_store = LeadStore(LEADS_DB_PATH)
+    # Informes descargables: caché en disco + pool de procesos (se crea al primer uso)
+    app.state.reportes = GeneradorReportes()
+    tarea_reportes = asyncio.create_task(ciclo_limpieza(app.state.reportes))
+    # Correo del diagnóstico: plantilla compilada una vez por worker (None = lo envía Make)
+    app.state.correo = crear_servicio_correo()
+    app.state.analytics_store = AnalyticsStore(ANALYTICS_DB_PATH, EVENTOS_DIR)
+    # Migración del legado, VACUUM de meses cerrados y retención por archivo
+    tarea_eventos = asyncio.create_task(
+        ciclo_mantenimiento(app.state.analytics_store.eventos, ANALYTICS_DB_PATH, EVENTOS_RETENCION_MESES)
+    )
+    # Logs del sistema: buffer en memoria + escritura por lotes a system_logs
+    app.state.monitor_logs = MonitorLogs(app.state.analytics_store)
+    await run_in_threadpool(app.state.monitor_logs.cargar_inicial)
+    app.state.monitor_logs.instalar()
+    tarea_logs = asyncio.create_task(ciclo_sincronizacion(app.state.monitor_logs))
+    # Feed en vivo del dashboard (SSE): deltas de todos los workers, uno por segundo
+    app.state.feed_analytics = FeedAnalytics(app.state.analytics_store, app.state.lead_store, app.state.monitor_logs)
+    tarea_feed = asyncio.create_task(ciclo_feed(app.state.feed_analytics))
+    # Compactación periódica de días cerrados al archivo columnar
+    tarea_compactacion = asyncio.create_task(ciclo_compactacion(app.state.lead_store, ARCHIVO_DIR))
+    # Recarga en caliente del catálogo normativo cuando cambia el archivo
+    tarea_catalogo = asyncio.create_task(vigilar_catalogo())
+    # Solicitudes de /debug/profile?workers=todos hechas a otro worker
+    tarea_perfiles = asyncio.create_task(vigilar_solicitudes())
     yield
+    tarea_perfiles.cancel()
+    tarea_catalogo.cancel()
+    tarea_compactacion.cancel()
+    tarea_feed.cancel()
+    app.state.feed_analytics.canal.cerrar()
+    tarea_logs.cancel()
+    tarea_eventos.cancel()
+    app.state.monitor_logs.desinstalar()
+    await run_in_threadpool(app.state.monitor_logs.sincronizar)  # Lo que quedó pendiente
+    tarea_reportes.cancel()
+    app.state.reportes.cerrar()
+    if app.state.correo:
+        app.state.correo.cerrar()
     await app.state.http_client.aclose()
     logging.info("Cliente HTTP compartido cerrado")
 
 app = FastAPI(lifespan=lifespan)
 
+# --- AISLAMIENTO POR PRIORIDAD DE RUTAS ---
+# Estático, analytics y /api/diagnostico comparten el event loop del worker.
+# El planificador reserva capacidad para los diagnósticos y descarta (429/503)
+# la ingesta de analytics bajo sobrecarga. Se registra ANTES que CORS para que
+# CORS quede por fuera y las respuestas 429/503 lleven sus encabezados.
+planificador_prioridades = crear_planificador_por_defecto()
+app.add_middleware(PriorityLimiterMiddleware, planificador=planificador_prioridades)
+
+# --- LÍMITE DE TASA POR IP Y POR SESIÓN (compartido entre workers, ver limite_tasa.py) ---
+# Por fuera del planificador: un cliente que excede su presupuesto recibe 429
+# sin ocupar cupo. Los endpoints de analytics aplican además el límite por sesión.
+app.state.limitador = crear_limitador_por_defecto()
+if app.state.limitador is not None:
+    app.add_middleware(LimiteTasaMiddleware, limitador=app.state.limitador)
+
+# --- LÍMITE DE TAMAÑO DEL CUERPO POR RUTA ---
+# Por fuera del planificador: un cuerpo excesivo se rechaza (413) sin ocupar
+# cupo ni leerse completo. Por dentro de CORS para que el 413 lleve sus encabezados.
+app.add_middleware(LimiteCuerpoMiddleware, limites=crear_limites_por_defecto(MAX_BYTES_LOTE))
+
 # Permitir la comunicación con tu app de React (CORS)
 # Configuración dinámica: lee ALLOWED_ORIGINS del entorno (separado por comas)
 ALLOWED_ORIGINS = os.environ.get(
@@ -168,8 +203,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # El frontend (otro origen) puede leer cuándo reintentar tras un 429
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
+# --- ANALYTICS: sesiones, eventos (individuales y en lote) y heartbeats ---
+app.include_router(analytics_router)
+
+PreguntaId = Literal[tuple(f"q{i}" for i in range(1, NUMERO_PREGUNTAS + 1))]
+Respuesta = Annotated[str, Field(max_length=8)]  # 'si' / 'no' (se compara sin mayúsculas)
+
+
 class DatosFormulario(BaseModel):
     """Modelo de datos del formulario SST con protección contra inyección de campos."""
     model_config = {"extra": "forbid"}
@@ -181,7 +225,10 @@ class DatosFormulario(BaseModel):
     cargo: str
     numero_trabajadores: int
     tipo_empresa: str
-    respuestas: Dict[str, str]
+    # Solo q1..q41 y valores cortos: el costo de validar y guardar queda acotado
+    respuestas: Dict[PreguntaId, Respuesta] = Field(max_length=NUMERO_PREGUNTAS)
+    # Código ISO del país cuyas reglas aplicar; si falta, se usa el país de la IP (GeoIP)
+    jurisdiccion: Optional[str] = Field(None, min_length=2, max_length=2)
 
 
 # --- HEALTH CHECK ENDPOINT ---
@@ -189,7 +236,17 @@ class DatosFormulario(BaseModel):
 # verificar que la aplicación está funcionando antes de enviar tráfico
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "catalogo_version": catalogo_activo().version,
+    }
+
+
+# Profundidad de colas, requests en curso y descartes por clase de ruta (por worker)
+@app.get("/health/prioridades", dependencies=[Depends(verificar_admin)])
+async def health_prioridades():
+    return planificador_prioridades.estadisticas()
 
 
 # --- CONFIGURACIÓN DE AUTENTICACIÓN DE WEBHOOK ---
@@ -339,18 +396,41 @@ async def enviar_a_make_background(
             else:
                 logging.error(f"❌ [Background] Error de red definitivo para {empresa}: {e}")
 
+async def entregar_diagnostico(
+    data: dict,
+    correo: Optional[ServicioCorreo],
+    http_client: httpx.AsyncClient,
+    empresa: str
+):
+    """Correo local y luego Make.com, en ese orden.
+
+    `email_local` le indica al escenario de Make que omita su módulo de correo,
+    así que se fija con el resultado REAL del envío: si el SMTP falla, Make
+    envía el correo como antes.
+    """
+    data['email_local'] = False
+    if correo is not None:
+        data['email_local'] = await run_in_threadpool(correo.enviar_diagnostico, data)
+    if MAKE_WEBHOOK_URL:
+        await enviar_a_make_background(data, http_client, empresa)
+
+
 @app.post("/api/diagnostico")
 async def ejecutar_diagnostico(request: Request, background_tasks: BackgroundTasks):
     try:
-        json_data = await request.json()
-        datos = DatosFormulario.model_validate(json_data)
+        # Parseo + validación en Rust sobre el cuerpo ya acotado por LimiteCuerpoMiddleware
+        datos = DatosFormulario.model_validate_json(await request.body())
     except ValidationError as e:
         # Usamos logging para registrar el error de validación
-        logging.error(f"Error de validación de Pydantic: {e.errors()}")
-        return JSONResponse(status_code=422, content={"detail": e.errors()})
+        errores = e.errors(include_url=False, include_input=False)
+        logging.error(f"Error de validación de Pydantic: {errores}")
+        return JSONResponse(status_code=422, content={"detail": errores})
 
     datos_dict = datos.model_dump()
-    resultado = calcular_multa_sunafil(datos_dict)
+    # Jurisdicción: la elegida en el formulario, si no la del país de la IP; si el
+    # catálogo no tiene reglas para ese país, se aplica la jurisdicción por defecto
+    codigo_jurisdiccion = datos.jurisdiccion or resolver_pais(ip_cliente(request))[1]
+    resultado = calcular_multa_sunafil(datos_dict, codigo_jurisdiccion)
 
     data_to_insert = {
         'nombre_lead': resultado['lead']['nombre'],
@@ -366,24 +446,38 @@ async def ejecutar_diagnostico(request: Request, background_tasks: BackgroundTas
         'telefono_lead': datos.telefono,
         'created_at': datetime.now().isoformat()
     }
+
+    # 🗄️ PERSISTENCIA LOCAL: se guarda antes de encolar el webhook, así el lead
+    # se puede re-exportar (/api/leads/export) aunque el escenario de Make falle
+    diagnostico_id = None
+    try:
+        diagnostico_id = await run_in_threadpool(
+            request.app.state.lead_store.guardar, data_to_insert, datos.respuestas
+        )
+        data_to_insert['diagnostico_id'] = diagnostico_id
+    except Exception as e:
+        logging.error(f"❌ No se pudo guardar el lead localmente para {resultado['lead']['empresa']}: {e}")
     
     # LOG de depuración
     logging.info(f"=== DIAGNÓSTICO PROCESADO ===")
     logging.info(f"Empresa: {resultado['lead']['empresa']}")
     logging.info(f"Multa calculada: S/ {data_to_insert['monto_multa_soles']:.2f}")
     
-    # ✨ ENVÍO ASÍNCRONO: El usuario NO espera a Make.com
+    # ✨ ENVÍO ASÍNCRONO: El usuario NO espera ni el correo ni a Make.com
     # La tarea se ejecuta en background después de enviar la respuesta
+    correo = request.app.state.correo if datos.email else None
     webhook_status = "🟢 activo" if MAKE_WEBHOOK_URL else "🔴 no configurado"
     auth_status = "🔐 autenticado" if MAKE_AUTH_TOKEN else "⚠️ sin autenticación"
-    
-    if MAKE_WEBHOOK_URL:
+
+    if correo or MAKE_WEBHOOK_URL:
         background_tasks.add_task(
-            enviar_a_make_background,
+            entregar_diagnostico,
             data_to_insert,
+            correo,
             request.app.state.http_client,
             resultado['lead']['empresa']
         )
+    if MAKE_WEBHOOK_URL:
         logging.info(
             f"📤 Tarea ENCOLADA exitosamente para: {resultado['lead']['empresa']} | "
             f"Webhook: {webhook_status} | Auth: {auth_status}"
@@ -398,6 +492,7 @@ async def ejecutar_diagnostico(request: Request, background_tasks: BackgroundTas
     return {
         "status": "success", 
         "message": "Diagnóstico recibido y procesado.",
+        "diagnostico_id": diagnostico_id,
         "diagnostico": {
             "severidad_maxima": resultado['diagnostico']['severidad_maxima'],
             "total_incumplimientos": resultado['diagnostico']['total_incumplimientos'],
@@ -406,6 +501,157 @@ async def ejecutar_diagnostico(request: Request, background_tasks: BackgroundTas
     }
 
 
+# --- INFORME DESCARGABLE DEL DIAGNÓSTICO ---
+# Sin datos personales y sin autenticación: el diagnostico_id (UUID) es el
+# enlace para compartir. El contenido de un id nunca cambia, así que se puede
+# cachear también en el navegador/CDN.
+@app.get("/api/diagnostico/{diagnostico_id}/report")
+async def descargar_informe(diagnostico_id: str, request: Request, formato: str = "html"):
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=422, detail=f"Formato debe ser uno de: {', '.join(FORMATOS)}")
+    if formato == "pdf" and not PDF_DISPONIBLE:
+        raise HTTPException(status_code=501, detail="Informe PDF no disponible en este servidor")
+    if not re.fullmatch(r"[0-9a-f]{32}", diagnostico_id):
+        raise HTTPException(status_code=404, detail="Diagnóstico no encontrado")
+
+    store = request.app.state.lead_store
+    claves = await run_in_threadpool(store.claves_reporte, diagnostico_id)
+    if claves is None:
+        raise HTTPException(status_code=404, detail="Diagnóstico no encontrado")
+    resultado_json = None
+    if claves[2] is None:  # Lead anterior a las máscaras: la clave usa el resultado
+        resultado_json = await run_in_threadpool(store.resultado, diagnostico_id)
+    clave = clave_reporte(*claves, resultado_json=resultado_json)
+
+    encabezados = {
+        "ETag": f'"{clave[:32]}-{formato}"',
+        "Cache-Control": "public, max-age=86400",
+    }
+    if request.headers.get("if-none-match") == encabezados["ETag"]:
+        return Response(status_code=304, headers=encabezados)
+
+    def cargar_resultado() -> dict:
+        return json.loads(resultado_json or store.resultado(diagnostico_id))
+
+    # Se lee ya (informes de KB): un FileResponse abriría el archivo después de
+    # responder los encabezados, cuando el barrido de caché ya pudo borrarlo
+    contenido = await request.app.state.reportes.leer(clave, formato, cargar_resultado)
+    encabezados["Content-Disposition"] = f'inline; filename="diagnostico-sst-{diagnostico_id[:8]}.{formato}"'
+    return Response(contenido, media_type=FORMATOS[formato], headers=encabezados)
+
+
+# --- IMÁGENES DEL CORREO (nombres con hash de contenido: caché inmutable) ---
+@app.get("/email-assets/{nombre}")
+async def imagen_correo(nombre: str, request: Request):
+    correo = request.app.state.correo
+    archivo = correo.assets.get(nombre) if correo else None
+    if archivo is None:
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    return FileResponse(archivo, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+# --- RECARGA DEL CATÁLOGO NORMATIVO ---
+# Recarga inmediata en el worker que atiende la request; el resto de workers
+# la toma por su watcher en a lo sumo CATALOGO_INTERVALO segundos.
+@app.post("/api/admin/catalogo/recargar", dependencies=[Depends(verificar_admin)])
+async def recargar_catalogo():
+    anterior = catalogo_activo().version
+    try:
+        nuevo = await run_in_threadpool(catalogo.recargar)
+    except (OSError, CatalogoInvalido) as e:
+        logging.error(f"❌ Recarga de catálogo rechazada: {e}")
+        raise HTTPException(status_code=422, detail=f"Catálogo inválido, se mantiene {anterior}: {e}")
+    return {"status": "success", "version_anterior": anterior, "version": nuevo.version}
+
+
+# --- PERFILADOR BAJO DEMANDA (ver perfilador.py) ---
+@app.get("/debug/profile", dependencies=[Depends(verificar_admin)])
+async def perfil_bajo_demanda(
+    seconds: float = Query(10, gt=0, le=MAX_SEGUNDOS),
+    hz: int = Query(HZ_POR_DEFECTO, ge=1, le=MAX_HZ),
+    workers: str = Query("este", pattern="^(este|todos)$"),
+    ociosos: bool = False,
+):
+    """Muestrea las pilas durante `seconds` y las devuelve en formato collapsed.
+
+    `workers=todos` perfila todos los workers de gunicorn del contenedor en el
+    mismo intervalo (cada pila lleva el prefijo `worker-<pid>`).
+    """
+    logging.info(f"🔬 Perfil solicitado: {seconds}s a {hz} Hz (workers={workers})")
+    if workers == "todos":
+        salida, respondieron, faltantes = await perfilar_todos(seconds, hz, ociosos)
+        if not respondieron:
+            raise HTTPException(status_code=409, detail="Ningún worker pudo perfilar (¿perfil en curso?)")
+        encabezados = {"X-Profile-Workers": str(len(respondieron))}
+        if faltantes:
+            encabezados["X-Profile-Workers-Faltantes"] = ",".join(map(str, faltantes))
+        return PlainTextResponse(salida, headers=encabezados)
+    try:
+        conteos, muestras = await perfilar(seconds, hz, ociosos)
+    except PerfilEnCurso as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        formatear(conteos),
+        headers={"X-Profile-Samples": str(muestras), "X-Profile-Workers": "1"},
+    )
+
+
+# --- EXPORTACIÓN DE LEADS (backfill de CRM) ---
+def _normalizar_rango(desde: Optional[str], hasta: Optional[str]):
+    """Convierte fechas ISO en límites [desde, hasta) comparables con created_at.
+
+    Una fecha sin hora en `hasta` incluye el día completo.
+    """
+    try:
+        if desde:
+            desde = datetime.fromisoformat(desde).isoformat()
+        if hasta:
+            if len(hasta) == 10:
+                hasta = (date.fromisoformat(hasta) + timedelta(days=1)).isoformat()
+            else:
+                hasta = datetime.fromisoformat(hasta).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Fechas deben estar en formato ISO 8601 (YYYY-MM-DD)")
+    return desde, hasta
+
+
+@app.get("/api/leads/export", dependencies=[Depends(verificar_admin)])
+async def exportar_leads(
+    request: Request,
+    formato: str = "ndjson",
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+):
+    """Exporta leads en streaming (NDJSON o CSV) con memoria constante.
+
+    Para reanudar un exporte interrumpido, enviar en `cursor` el valor de la
+    columna/campo `cursor` de la última fila recibida.
+    """
+    if formato not in ("ndjson", "csv"):
+        raise HTTPException(status_code=422, detail="formato debe ser 'ndjson' o 'csv'")
+    if limite is not None and limite <= 0:
+        raise HTTPException(status_code=422, detail="limite debe ser mayor a 0")
+    if cursor:
+        try:
+            decodificar_cursor(cursor)
+        except CursorInvalido as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    desde, hasta = _normalizar_rango(desde, hasta)
+
+    store: LeadStore = request.app.state.lead_store
+    filtros = {"desde": desde, "hasta": hasta, "cursor": cursor, "limite": limite}
+    logging.info(f"📦 Exportando leads ({formato}): desde={desde} hasta={hasta} cursor={'sí' if cursor else 'no'}")
+    if formato == "csv":
+        return StreamingResponse(
+            store.exportar_csv(**filtros),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="leads.csv"'},
+        )
+    return StreamingResponse(store.exportar_ndjson(**filtros), media_type="application/x-ndjson")
+
+
 # ==============================================================================
 # SERVIR ARCHIVOS ESTÁTICOS DEL FRONTEND (Solo en producción/Docker)
 # ==============================================================================
@@ -417,21 +663,11 @@ async def ejecutar_diagnostico(request: Request, background_tasks: BackgroundTas
 STATIC_DIR = Path(__file__).parent / "static"
 
 if STATIC_DIR.exists():
-    # Montar archivos estáticos en la raíz
-    # html=True permite servir index.html automáticamente
-    app.mount("/", StaticFiles(directory=str(STATIC_DIR), html=True), name="static")
+    # Montar el frontend en la raíz con StaticFrontend (ver static_frontend.py):
+    # index.html en memoria, variantes .br/.gz, caché inmutable para /assets,
+    # respuestas 304 y fallback SPA para que React Router maneje las rutas.
+    # Las rutas /api no encontradas siguen devolviendo 404 en JSON.
+    app.mount("/", StaticFrontend(STATIC_DIR), name="static")
     logging.info(f"📁 Frontend estático montado desde: {STATIC_DIR}")
-    
-    # Manejador para SPA: cualquier ruta no encontrada sirve index.html
-    # Esto permite que React Router maneje las rutas del frontend
-    @app.exception_handler(404)
-    async def spa_fallback(request: Request, exc):
-        # Solo aplicar fallback si no es una ruta de API
-        if not request.url.path.startswith("/api"):
-            index_path = STATIC_DIR / "index.html"
-            if index_path.exists():
-                return FileResponse(str(index_path))
-        # Si es una ruta de API o index.html no existe, retornar 404 normal
-        return JSONResponse(status_code=404, content={"detail": "Not found"})
 else:
-    logging.info("⚠️ Carpeta 'static' no encontrada - modo desarrollo (frontend separado)")
\ No newline at end of file
+    logging.info("⚠️ Carpeta 'static' no encontrada - modo desarrollo (frontend separado)")
@@ -0,0 +1,241 @@
+# prioridad_rutas.py
+"""
+Aislamiento por prioridad de rutas dentro de un mismo worker.
+
+El contenedor es "todo en uno": el mismo event loop atiende el frontend
+estático, la ingesta de analytics (un evento por pregunta vista) y el
+endpoint crítico /api/diagnostico. Este middleware ASGI asigna cada request
+a una clase de ruta con su propio límite de concurrencia y su propia cola.
+
+Reglas:
+- Existe una capacidad global de requests en curso por worker.
+- Una parte de esa capacidad queda reservada para la clase crítica
+  (/api/diagnostico): el resto de clases no puede ocuparla.
+- Cuando se libera un cupo, las colas se atienden en orden de prioridad.
+- Si la cola de una clase está llena o la espera supera su timeout, la
+  request se descarta (429 para analytics, 503 para el resto).
+- El cupo se libera al terminar de enviar la respuesta, NO al terminar las
+  BackgroundTasks (el webhook de Make puede tardar minutos en reintentos).
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+
+class ClaseRuta:
+    """Configuración y contadores de una clase de ruta."""
+
+    def __init__(
+        self,
+        nombre: str,
+        prioridad: int,
+        limite: int,
+        max_cola: int,
+        espera_max: float,
+        codigo_rechazo: int = 503,
+        usa_reserva: bool = False,
+    ):
+        self.nombre = nombre
+        self.prioridad = prioridad  # 0 = más prioritaria
+        self.limite = limite  # Máximo de requests en curso de esta clase
+        self.max_cola = max_cola  # Máximo de requests esperando cupo
+        self.espera_max = espera_max  # Segundos máximos en cola antes de descartar
+        self.codigo_rechazo = codigo_rechazo
+        self.usa_reserva = usa_reserva  # Puede ocupar la capacidad reservada
+        # Estado en tiempo de ejecución
+        self.en_curso = 0
+        self.en_cola = 0
+        self.cola: Deque[asyncio.Future] = deque()
+        self.atendidas = 0
+        self.descartadas = 0
+
+    def estadisticas(self) -> dict:
+        return {
+            "prioridad": self.prioridad,
+            "limite": self.limite,
+            "en_curso": self.en_curso,
+            "en_cola": self.en_cola,
+            "max_cola": self.max_cola,
+            "atendidas": self.atendidas,
+            "descartadas": self.descartadas,
+        }
+
+
+class RequestDescartada(Exception):
+    """La request no obtuvo cupo (cola llena o espera agotada)."""
+
+    def __init__(self, clase: ClaseRuta, motivo: str):
+        super().__init__(motivo)
+        self.clase = clase
+        self.motivo = motivo
+
+
+class PlanificadorPrioridades:
+    """Reparte la capacidad del worker entre clases de ruta por prioridad.
+
+    No necesita locks: todo ocurre en el event loop del worker.
+    """
+
+    def __init__(self, clases: List[ClaseRuta], capacidad: int, reserva_critica: int):
+        self.clases: Dict[str, ClaseRuta] = {c.nombre: c for c in clases}
+        self.orden = sorted(clases, key=lambda c: c.prioridad)
+        self.capacidad = capacidad
+        self.reserva_critica = reserva_critica
+        self.en_curso_total = 0
+
+    def _puede_iniciar(self, clase: ClaseRuta) -> bool:
+        techo = self.capacidad if clase.usa_reserva else self.capacidad - self.reserva_critica
+        return clase.en_curso < clase.limite and self.en_curso_total < techo
+
+    def _ocupar(self, clase: ClaseRuta) -> None:
+        clase.en_curso += 1
+        clase.atendidas += 1
+        self.en_curso_total += 1
+
+    async def adquirir(self, clase: ClaseRuta) -> None:
+        # Camino rápido O(1). Si alguien espera en una cola (propia o más prioritaria)
+        # es porque no hay cupo para él, y el techo de esta clase nunca es mayor.
+        if self._puede_iniciar(clase):
+            self._ocupar(clase)
+            return
+
+        if clase.en_cola >= clase.max_cola:
+            clase.descartadas += 1
+            raise RequestDescartada(clase, "cola llena")
+
+        turno = asyncio.get_running_loop().create_future()
+        clase.cola.append(turno)
+        clase.en_cola += 1
+        try:
+            await asyncio.wait_for(turno, timeout=clase.espera_max)
+        except asyncio.TimeoutError:
+            if turno.done() and not turno.cancelled():
+                return  # El cupo llegó justo al vencer el timeout: ya está ocupado
+            clase.en_cola -= 1
+            clase.descartadas += 1
+            raise RequestDescartada(clase, "espera agotada")
+        except asyncio.CancelledError:
+            if turno.done() and not turno.cancelled():
+                self.liberar(clase)
+            else:
+                clase.en_cola -= 1
+            raise
+
+    def liberar(self, clase: ClaseRuta) -> None:
+        clase.en_curso -= 1
+        self.en_curso_total -= 1
+        self._despachar()
+
+    def _despachar(self) -> None:
+        """Entrega cupos libres a las colas, de mayor a menor prioridad."""
+        for clase in self.orden:
+            while clase.cola and self._puede_iniciar(clase):
+                turno = clase.cola.popleft()
+                if turno.done():
+                    continue  # Expiró o fue cancelado mientras esperaba
+                clase.en_cola -= 1
+                self._ocupar(clase)
+                turno.set_result(None)
+            if clase.cola and self.en_curso_total >= self.capacidad - self.reserva_critica:
+                # Sin capacidad compartida: las clases de menor prioridad tampoco pueden iniciar
+                break
+
+    def estadisticas(self) -> dict:
+        return {
+            "capacidad": self.capacidad,
+            "reserva_critica": self.reserva_critica,
+            "en_curso_total": self.en_curso_total,
+            "clases": {c.nombre: c.estadisticas() for c in self.orden},
+        }
+
+
+def clasificar_ruta(scope) -> Optional[str]:
+    """Asigna la clase de ruta. None = sin planificación (health checks)."""
+    ruta = scope["path"]
+    if ruta.startswith("/health"):
+        return None  # Railway/Cloud Run deben ver el worker vivo incluso bajo carga
+    if ruta.startswith("/debug"):
+        return None  # Un perfil ocupa su slot durante segundos: se perfila justo bajo carga
+    if ruta == "/api/diagnostico":
+        return "diagnostico"  # Solo el envío del formulario usa la reserva (no los informes)
+    if ruta == "/api/analytics/stream":
+        return None  # Conexión SSE de larga duración: ocuparía un cupo de analytics para siempre
+    if ruta.startswith("/api/analytics"):
+        return "analytics"
+    if ruta.startswith("/api"):
+        return "api"
+    return "estatico"
+
+
+def crear_planificador_por_defecto() -> PlanificadorPrioridades:
+    """Construye el planificador con valores ajustables por variables de entorno."""
+    capacidad = int(os.environ.get("PRIORIDAD_CAPACIDAD", "48"))
+    reserva = int(os.environ.get("PRIORIDAD_RESERVA_DIAGNOSTICO", "16"))
+    clases = [
+        ClaseRuta("diagnostico", prioridad=0, limite=capacidad, max_cola=200, espera_max=10.0, usa_reserva=True),
+        ClaseRuta("api", prioridad=1, limite=16, max_cola=100, espera_max=5.0),
+        ClaseRuta("estatico", prioridad=2, limite=16, max_cola=200, espera_max=5.0),
+        ClaseRuta("analytics", prioridad=3, limite=8, max_cola=32, espera_max=0.5, codigo_rechazo=429),
+    ]
+    logging.info(f"🚦 Planificador de prioridades: capacidad={capacidad}, reserva diagnóstico={reserva}")
+    return PlanificadorPrioridades(clases, capacidad=capacidad, reserva_critica=reserva)
+
+
+class PriorityLimiterMiddleware:
+    """Middleware ASGI que aplica el PlanificadorPrioridades a cada request HTTP."""
+
+    def __init__(self, app, planificador: PlanificadorPrioridades, clasificador=clasificar_ruta):
+        self.app = app
+        self.planificador = planificador
+        self.clasificador = clasificador
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        nombre = self.clasificador(scope)
+        if nombre is None:
+            await self.app(scope, receive, send)
+            return
+
+        clase = self.planificador.clases[nombre]
+        try:
+            await self.planificador.adquirir(clase)
+        except RequestDescartada as e:
+            # INFO: descartar es el comportamiento esperado bajo carga; no se persiste
+            logging.info(f"🚦 Request descartada ({clase.nombre}, {e.motivo}): {scope['path']}")
+            await self._rechazar(send, clase)
+            return
+
+        liberado = False
+
+        async def send_con_liberacion(message):
+            nonlocal liberado
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not liberado:
+                # La respuesta ya salió: las BackgroundTasks no deben retener el cupo
+                liberado = True
+                self.planificador.liberar(clase)
+
+        try:
+            await self.app(scope, receive, send_con_liberacion)
+        finally:
+            if not liberado:
+                liberado = True
+                self.planificador.liberar(clase)
+
+    @staticmethod
+    async def _rechazar(send, clase: ClaseRuta) -> None:
+        cuerpo = b'{"detail":"Servidor ocupado, intente nuevamente"}'
+        await send({
+            "type": "http.response.start",
+            "status": clase.codigo_rechazo,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(cuerpo)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": cuerpo})
@@ -0,0 +1,289 @@
+# registro_logs.py
+"""
+Logs del sistema y estado de salud servidos desde memoria.
+
+Un `logging.Handler` encola cada registro WARNING o superior (lo que usan la
+vista de logs y el estado de salud; los INFO solo van a stdout) sin tocar disco;
+una tarea de fondo los inserta en `system_logs` por lotes y, en el mismo
+ciclo, lee los logs nuevos de TODOS los workers (id > último visto) para
+alimentar buffers circulares por nivel y contadores de ventana deslizante.
+
+Beneficios de rendimiento:
+- Loguear no bloquea: emit() solo hace un append a una deque
+- Un INSERT por lote (executemany) en lugar de uno por línea de log
+- /api/analytics/logs responde en O(limit) desde los buffers (sin SQLite)
+- /api/analytics/health responde en O(1): contadores por cubetas de un minuto
+  y conteo incremental de sesiones del día
+- La sincronización lee por PK solo las filas nuevas, así cada worker ve los
+  logs de los demás con a lo sumo `INTERVALO_SINCRONIZACION` de retraso
+"""
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from analytics_store import AnalyticsStore
+
+LOGS_POR_NIVEL = int(os.environ.get("LOGS_BUFFER_POR_NIVEL", "500"))
+MAX_PENDIENTES = 10_000  # Si la base no responde, se descartan los más antiguos
+INTERVALO_SINCRONIZACION = 2.0  # segundos
+LOTE_SINCRONIZACION = 1000
+
+# Cada buffer agrupa niveles: el dashboard pide level=ERROR y espera ver también CRITICAL
+GRUPOS_NIVEL = {
+    "ERROR": ("ERROR", "CRITICAL"),
+    "WARNING": ("WARNING",),
+    "INFO": ("INFO",),
+}
+GRUPO_DE_NIVEL = {nivel: grupo for grupo, niveles in GRUPOS_NIVEL.items() for nivel in niveles}
+
+# Umbrales del estado de salud (errores en las últimas 24 h)
+UMBRAL_WARNING = 1
+UMBRAL_CRITICO = 10
+
+NIVEL_PERSISTIDO = logging.WARNING  # INFO en cada request sería escritura a SQLite en el camino caliente
+FORMATO_TIMESTAMP = "%Y-%m-%d %H:%M:%S"  # UTC; el dashboard le agrega " UTC" (AnalyticsStore migra las filas viejas)
+COLUMNAS = ("id", "timestamp", "level", "message", "module", "traceback")
+
+
+class ContadorVentana:
+    """Conteo en una ventana deslizante con cubetas de `resolucion` segundos.
+
+    sumar() y total() son O(1) amortizado: al avanzar el tiempo solo se
+    vacían las cubetas que salieron de la ventana.
+    """
+
+    def __init__(self, ventana: float, resolucion: float = 60):
+        self.resolucion = resolucion
+        self.cubetas = [0] * int(ventana // resolucion)
+        self.suma = 0
+        self.actual: Optional[int] = None  # Índice absoluto de la cubeta más reciente
+
+    def _avanzar(self, cubeta: int) -> None:
+        if self.actual is None:
+            self.actual = cubeta
+            return
+        pasos = min(cubeta - self.actual, len(self.cubetas))
+        for i in range(self.actual + 1, self.actual + 1 + pasos):
+            posicion = i % len(self.cubetas)
+            self.suma -= self.cubetas[posicion]
+            self.cubetas[posicion] = 0
+        self.actual = max(self.actual, cubeta)
+
+    def sumar(self, momento: float, cantidad: int = 1) -> None:
+        cubeta = int(momento // self.resolucion)
+        self._avanzar(cubeta)
+        if cubeta <= self.actual - len(self.cubetas):
+            return  # Fuera de la ventana
+        self.cubetas[cubeta % len(self.cubetas)] += cantidad
+        self.suma += cantidad
+
+    def total(self, ahora: float) -> int:
+        self._avanzar(int(ahora // self.resolucion))
+        return self.suma
+
+
+def _epoch(timestamp: str) -> float:
+    try:
+        momento = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return 0.0
+    if momento.tzinfo is None:
+        momento = momento.replace(tzinfo=timezone.utc)
+    return momento.timestamp()
+
+
+class ManejadorBuffer(logging.Handler):
+    """Handler que solo encola; la escritura a SQLite la hace MonitorLogs."""
+
+    def __init__(self, pendientes: deque, nivel: int = NIVEL_PERSISTIDO):
+        super().__init__(nivel)
+        self.pendientes = pendientes
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            traceback = None
+            if record.exc_info:
+                traceback = logging.Formatter().formatException(record.exc_info)
+            self.pendientes.append((
+                datetime.fromtimestamp(record.created, timezone.utc).strftime(FORMATO_TIMESTAMP),
+                record.levelname,
+                record.getMessage(),
+                record.module if record.name == "root" else record.name,
+                traceback,
+            ))
+        except Exception:
+            self.handleError(record)
+
+
+class MonitorLogs:
+    """Buffers circulares por nivel, contadores de salud y sincronización con system_logs."""
+
+    def __init__(self, store: AnalyticsStore, tamano: int = LOGS_POR_NIVEL):
+        self.store = store
+        self.tamano = tamano
+        self.pendientes: deque = deque(maxlen=MAX_PENDIENTES)
+        self.manejador = ManejadorBuffer(self.pendientes)
+        self.buffers: Dict[str, deque] = {grupo: deque(maxlen=tamano) for grupo in GRUPOS_NIVEL}
+        self.errores_24h = ContadorVentana(24 * 3600)
+        self.errores_1h = ContadorVentana(3600)
+        self.warnings_24h = ContadorVentana(24 * 3600)
+        self.ultimo_id = 0
+        self.dia_sesiones = ""
+        self.sesiones_hoy = 0
+        self.ultimo_rowid_sesiones = 0
+        self._lock = threading.Lock()  # La sincronización corre en un hilo; las lecturas en el event loop
+        self._fallo_reportado = False
+
+    # --- INGESTA ---
+    def _registrar(self, filas: List[tuple]) -> None:
+        """Agrega filas de system_logs (orden ascendente de id) a buffers y contadores."""
+        with self._lock:
+            for fila in filas:
+                grupo = GRUPO_DE_NIVEL.get(fila[2])
+                if grupo is None:
+                    continue  # DEBUG u otros niveles no se muestran
+                self.buffers[grupo].append(fila)
+                if grupo == "ERROR":
+                    momento = _epoch(fila[1])
+                    self.errores_24h.sumar(momento)
+                    self.errores_1h.sumar(momento)
+                elif grupo == "WARNING":
+                    self.warnings_24h.sumar(_epoch(fila[1]))
+            if filas:
+                self.ultimo_id = max(self.ultimo_id, filas[-1][0])
+
+    def cargar_inicial(self) -> None:
+        """Precarga los buffers y contadores con lo que ya está en system_logs."""
+        ultimo_id = self.store.ultimo_id_log()
+        filas = []
+        for niveles in GRUPOS_NIVEL.values():
+            filas.extend(self.store.ultimos_logs(niveles, self.tamano))
+        filas.sort(key=lambda f: f[0])
+        with self._lock:
+            for fila in filas:
+                if fila[0] <= ultimo_id:  # Lo posterior llega por sincronizar()
+                    self.buffers[GRUPO_DE_NIVEL[fila[2]]].append(fila)
+            hace_24h = (datetime.now(timezone.utc) - timedelta(hours=24)).strftime(FORMATO_TIMESTAMP)
+            for timestamp, nivel in self.store.niveles_desde(hace_24h):
+                momento = _epoch(timestamp)
+                if GRUPO_DE_NIVEL[nivel] == "ERROR":
+                    self.errores_24h.sumar(momento)
+                    self.errores_1h.sumar(momento)
+                else:
+                    self.warnings_24h.sumar(momento)
+            self.ultimo_id = ultimo_id
+        self._actualizar_sesiones()
+
+    def _actualizar_sesiones(self) -> None:
+        hoy = date.today().isoformat()
+        if hoy != self.dia_sesiones:  # Cambio de día: se recuenta desde cero
+            self.dia_sesiones, self.sesiones_hoy, self.ultimo_rowid_sesiones = hoy, 0, 0
+        nuevas, self.ultimo_rowid_sesiones = self.store.contar_sesiones_desde(hoy, self.ultimo_rowid_sesiones)
+        self.sesiones_hoy += nuevas
+
+    def sincronizar(self) -> None:
+        """Escribe los logs pendientes de este worker y lee los nuevos de todos."""
+        lote = []
+        while self.pendientes:
+            try:
+                lote.append(self.pendientes.popleft())
+            except IndexError:
+                break
+        try:
+            if lote:
+                self.store.insertar_logs(lote)
+        except Exception as e:
+            # Se reintentan en el próximo ciclo (la deque acotada evita crecer sin límite)
+            self.pendientes.extendleft(reversed(lote))
+            self._reportar_fallo(e)
+            return
+        try:
+            while True:
+                filas = self.store.logs_despues_de(self.ultimo_id, LOTE_SINCRONIZACION)
+                self._registrar(filas)
+                if len(filas) < LOTE_SINCRONIZACION:
+                    break
+            self._actualizar_sesiones()
+            self._fallo_reportado = False
+        except Exception as e:
+            self._reportar_fallo(e)
+
+    def _reportar_fallo(self, error: Exception) -> None:
+        if not self._fallo_reportado:
+            self._fallo_reportado = True
+            logging.error(f"❌ No se pudieron sincronizar los logs del sistema: {error}")
+
+    # --- CONSULTAS (O(limit) / O(1)) ---
+    def ultimos(self, limite: int, nivel: Optional[str] = None) -> List[dict]:
+        """Los `limite` logs más recientes, del más nuevo al más antiguo."""
+        limite = max(0, min(limite, self.tamano))
+        with self._lock:
+            if nivel:
+                grupo = GRUPO_DE_NIVEL.get(nivel.upper())
+                if grupo is None:
+                    return []
+                filas = list(islice(reversed(self.buffers[grupo]), limite))
+            else:
+                # Cada buffer está ordenado por id: merge de k listas tomando solo `limite`
+                fuentes = [reversed(buffer) for buffer in self.buffers.values()]
+                filas = list(islice(heapq.merge(*fuentes, key=lambda f: f[0], reverse=True), limite))
+        return [dict(zip(COLUMNAS, fila)) for fila in filas]
+
+    def errores_despues_de(self, ultimo_id: int, limite: int) -> Tuple[List[dict], int]:
+        """ERROR/CRITICAL con id > ultimo_id ya sincronizados, del más antiguo al más nuevo (a lo sumo `limite`).
+
+        Retorna también el último id sincronizado, leído bajo el mismo lock: es el
+        cursor para la próxima llamada (sin saltear ni repetir errores).
+        """
+        with self._lock:
+            filas = []
+            for fila in reversed(self.buffers["ERROR"]):
+                if fila[0] <= ultimo_id or len(filas) == limite:
+                    break
+                filas.append(fila)
+            cursor = max(ultimo_id, self.ultimo_id)
+        return [dict(zip(COLUMNAS, fila)) for fila in reversed(filas)], cursor
+
+    def salud(self) -> dict:
+        ahora = time.time()
+        with self._lock:
+            errores_24h = self.errores_24h.total(ahora)
+            errores_1h = self.errores_1h.total(ahora)
+            warnings_24h = self.warnings_24h.total(ahora)
+        if errores_24h >= UMBRAL_CRITICO:
+            estado = "critical"
+        elif errores_24h >= UMBRAL_WARNING:
+            estado = "warning"
+        else:
+            estado = "healthy"
+        return {
+            "status": estado,
+            "errors_24h": errores_24h,
+            "errors_1h": errores_1h,
+            "warnings_24h": warnings_24h,
+            "sessions_today": self.sesiones_hoy,
+            "timestamp": datetime.now(timezone.utc).strftime(FORMATO_TIMESTAMP),
+        }
+
+    # --- CICLO DE VIDA ---
+    def instalar(self) -> None:
+        logging.getLogger().addHandler(self.manejador)
+
+    def desinstalar(self) -> None:
+        logging.getLogger().removeHandler(self.manejador)
+
+
+async def ciclo_sincronizacion(monitor: MonitorLogs, intervalo: float = INTERVALO_SINCRONIZACION):
+    """Tarea de fondo del lifespan: sincroniza los logs con SQLite en un hilo."""
+    while True:
+        await asyncio.sleep(intervalo)
+        await run_in_threadpool(monitor.sincronizar)
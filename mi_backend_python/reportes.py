@@ -0,0 +1,279 @@
+# reportes.py
+"""
+Informe descargable del diagnóstico (HTML o PDF).
+
+El informe se genera a partir del resultado guardado en el LeadStore (incluye
+`detalle_hallazgos`, que antes solo llegaba a Make) y NO contiene datos
+personales: depende únicamente de la versión del catálogo, las máscaras de
+respuestas, el tipo de empresa y el rango de trabajadores. Por eso se puede
+cachear en disco por el hash de esos valores y compartir el enlace.
+
+Beneficios de rendimiento:
+- El render corre en un pool de procesos: nunca bloquea el event loop ni
+  compite por el GIL con las requests del worker
+- Caché en disco por contenido: diagnósticos idénticos comparten archivo, y
+  las descargas repetidas se sirven directo desde disco (ETag/304)
+- Requests simultáneas por el mismo informe esperan UN solo render, que
+  termina aunque el cliente que lo inició se desconecte
+- Caché acotada: un barrido periódico borra los informes con más de
+  REPORTES_TTL_DIAS y, si el directorio supera REPORTES_MAX_MB, los más
+  antiguos primero (un informe borrado simplemente se vuelve a generar)
+- El pool se crea recién con el primer informe (spawn, sin heredar hilos)
+
+El PDF requiere `weasyprint` (opcional); sin él solo se ofrece HTML.
+"""
+import asyncio
+import hashlib
+import time
+import html
+import importlib.util
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+REPORTES_DIR = Path(os.environ.get("REPORTES_DIR", "reportes"))
+REPORTES_PROCESOS = int(os.environ.get("REPORTES_PROCESOS", "2"))
+REPORTES_TTL_DIAS = float(os.environ.get("REPORTES_TTL_DIAS", "30"))
+REPORTES_MAX_MB = float(os.environ.get("REPORTES_MAX_MB", "500"))
+INTERVALO_LIMPIEZA = 3600  # segundos
+INTENTOS_LECTURA = 3  # Renders si el barrido borra el informe justo antes de leerlo
+VERSION_PLANTILLA = "1"  # Subirla invalida la caché cuando cambia el diseño
+
+PDF_DISPONIBLE = importlib.util.find_spec("weasyprint") is not None
+FORMATOS = {"html": "text/html; charset=utf-8", "pdf": "application/pdf"}
+
+# Resultados guardados antes de las jurisdicciones (todos de Perú) no traen la nota.
+# No se importa de catalogo.py: los procesos del pool no deben cargar el catálogo.
+NOTA_LEGAL_POR_DEFECTO = (
+    "Estimación referencial según el Reglamento de la Ley General de Inspección del Trabajo "
+    "(D.S. 019-2006-TR). No constituye una resolución de SUNAFIL."
+)
+
+COLORES_SEVERIDAD = {"Muy Grave": "#b91c1c", "Grave": "#c2410c", "Leves": "#a16207"}
+
+
+def clave_reporte(catalogo_version: Optional[str], mascara_respondidas: Optional[int], mascara_no: Optional[int],
+                  tipo_empresa: Optional[str], rango_trabajadores: Optional[str], jurisdiccion: Optional[str] = None,
+                  resultado_json: Optional[str] = None) -> str:
+    """Hash de las entradas que determinan el informe.
+
+    Los leads guardados antes de las máscaras de respuestas usan el hash del
+    resultado completo.
+    """
+    if mascara_no is None:
+        partes = [VERSION_PLANTILLA, "resultado", resultado_json or ""]
+    else:
+        partes = [VERSION_PLANTILLA, catalogo_version or "", str(mascara_respondidas or 0), str(mascara_no),
+                  (tipo_empresa or "").lower(), rango_trabajadores or ""]
+        if jurisdiccion and jurisdiccion != "PE":  # Las claves de los informes de Perú no cambian
+            partes.append(jurisdiccion)
+    return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()
+
+
+# ==============================================================================
+# RENDER (corre en los procesos del pool: solo recibe datos planos)
+# ==============================================================================
+
+def _monto(monto: float, simbolo: str) -> str:
+    return f"{simbolo} {monto:,.2f}"
+
+
+def renderizar_html(resultado: dict) -> str:
+    lead = resultado.get("lead", {})
+    diagnostico = resultado.get("diagnostico", {})
+    multa = resultado.get("multa", {})
+    resumen = diagnostico.get("resumen_hallazgos", {})
+    jurisdiccion = resultado.get("jurisdiccion") or {"nota_legal": NOTA_LEGAL_POR_DEFECTO}
+    e = html.escape
+
+    filas = []
+    for hallazgo in diagnostico.get("detalle_hallazgos", []):
+        severidad = hallazgo.get("severidad", "")
+        filas.append(
+            f"<tr><td>{e(hallazgo.get('articulo', ''))}</td>"
+            f"<td style=\"color:{COLORES_SEVERIDAD.get(severidad, '#334155')};font-weight:600\">{e(severidad)}</td>"
+            f"<td>{e(hallazgo.get('descripcion', ''))}</td></tr>"
+        )
+    tabla = (
+        "<table><thead><tr><th>Artículo</th><th>Severidad</th><th>Descripción</th></tr></thead>"
+        f"<tbody>{''.join(filas)}</tbody></table>"
+        if filas else "<p>No se identificaron incumplimientos.</p>"
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Informe de Diagnóstico SST</title>
+<style>
+body {{ font-family: Helvetica, Arial, sans-serif; color: #0f172a; max-width: 860px; margin: 32px auto; padding: 0 16px; }}
+h1 {{ color: #0056b4; font-size: 24px; margin-bottom: 4px; }}
+.meta {{ color: #64748b; font-size: 13px; margin-bottom: 24px; }}
+.resumen {{ display: flex; gap: 12px; flex-wrap: wrap; margin-bottom: 24px; }}
+.dato {{ border: 1px solid #e2e8f0; border-radius: 8px; padding: 12px 16px; min-width: 140px; }}
+.dato b {{ display: block; font-size: 20px; }}
+table {{ width: 100%; border-collapse: collapse; font-size: 14px; }}
+th, td {{ text-align: left; padding: 8px; border-bottom: 1px solid #e2e8f0; vertical-align: top; }}
+th {{ background: #f1f5f9; }}
+.nota {{ color: #64748b; font-size: 12px; margin-top: 24px; }}
+</style>
+</head>
+<body>
+<h1>Informe de Diagnóstico SST</h1>
+<div class="meta">
+Tipo de empresa: {e(str(lead.get("tipo_empresa", "")))} &middot;
+Rango de trabajadores: {e(str(multa.get("rango_trabajadores") or "-"))} &middot;
+Catálogo normativo: {e(str(resultado.get("catalogo_version", "-")))}
+</div>
+<div class="resumen">
+<div class="dato">Severidad máxima<b>{e(str(diagnostico.get("severidad_maxima", "-")))}</b></div>
+<div class="dato">Incumplimientos<b>{int(diagnostico.get("total_incumplimientos", 0))}</b></div>
+<div class="dato">Muy graves / graves / leves<b>{int(resumen.get("Muy Grave", 0))} / {int(resumen.get("Grave", 0))} / {int(resumen.get("Leves", 0))}</b></div>
+<div class="dato">Multa potencial<b>{e(_monto(float(multa.get("monto_final_soles", 0)), multa.get("simbolo_moneda", "S/")))}</b></div>
+</div>
+<h2>Detalle de hallazgos</h2>
+{tabla}
+<p class="nota">{e(jurisdiccion.get("nota_legal", ""))}</p>
+</body>
+</html>
+"""
+
+
+def renderizar(resultado: dict, formato: str, destino: str) -> str:
+    """Escribe el informe en `destino` de forma atómica (se ejecuta en el pool)."""
+    documento = renderizar_html(resultado)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    if formato == "pdf":
+        import weasyprint  # Solo en los procesos del pool
+        weasyprint.HTML(string=documento).write_pdf(temporal)
+    else:
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(documento)
+    os.replace(temporal, destino)
+    return destino
+
+
+# ==============================================================================
+# GENERADOR (uno por worker)
+# ==============================================================================
+
+class GeneradorReportes:
+    """Caché en disco + pool de procesos + coalescencia de renders concurrentes."""
+
+    def __init__(self, directorio: Path = REPORTES_DIR, procesos: int = REPORTES_PROCESOS):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.procesos = procesos
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._en_curso: Dict[Path, asyncio.Task] = {}
+
+    def ruta(self, clave: str, formato: str) -> Path:
+        return self.directorio / f"{clave}.{formato}"
+
+    def _pool_procesos(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: el worker tiene hilos (threadpool, SQLite) que fork no copia de forma segura
+            self._pool = ProcessPoolExecutor(self.procesos, mp_context=multiprocessing.get_context("spawn"))
+            logging.info(f"🧾 Pool de informes iniciado con {self.procesos} procesos")
+        return self._pool
+
+    async def obtener(self, clave: str, formato: str, cargar_resultado: Callable[[], dict]) -> Path:
+        """Ruta del informe en caché; lo genera si no existe.
+
+        `cargar_resultado` (bloqueante) solo se llama en un cache miss.
+        """
+        destino = self.ruta(clave, formato)
+        if destino.exists():
+            return destino
+        tarea = self._en_curso.get(destino)
+        if tarea is None:
+            # Tarea propia: si el cliente que la inició se desconecta, el render sigue
+            # para las demás requests que la esperan (y queda en caché)
+            tarea = self._en_curso[destino] = asyncio.create_task(
+                self._generar(clave, formato, destino, cargar_resultado)
+            )
+            tarea.add_done_callback(lambda t: self._terminado(destino, t))
+        return await asyncio.shield(tarea)
+
+    async def leer(self, clave: str, formato: str, cargar_resultado: Callable[[], dict]) -> bytes:
+        """Contenido del informe (ver `obtener`).
+
+        El barrido de otro worker puede borrar el archivo entre `obtener` y la
+        lectura; en ese caso se vuelve a generar en lugar de responder 500.
+        """
+        for _ in range(INTENTOS_LECTURA):
+            destino = await self.obtener(clave, formato, cargar_resultado)
+            try:
+                return await asyncio.to_thread(destino.read_bytes)
+            except FileNotFoundError:
+                logging.info(f"🧾 Informe borrado por el barrido antes de leerlo, se regenera ({clave[:12]})")
+        raise FileNotFoundError(f"Informe {clave[:12]}.{formato} borrado {INTENTOS_LECTURA} veces seguidas")
+
+    async def _generar(self, clave: str, formato: str, destino: Path, cargar_resultado: Callable[[], dict]) -> Path:
+        loop = asyncio.get_running_loop()
+        inicio = datetime.now()
+        resultado = await loop.run_in_executor(None, cargar_resultado)
+        await loop.run_in_executor(self._pool_procesos(), renderizar, resultado, formato, str(destino))
+        logging.info(f"🧾 Informe {formato} generado en {(datetime.now() - inicio).total_seconds():.2f}s ({clave[:12]})")
+        return destino
+
+    def _terminado(self, destino: Path, tarea: asyncio.Task) -> None:
+        del self._en_curso[destino]
+        if not tarea.cancelled():
+            tarea.exception()  # Marcada como consumida si todos los que esperaban se desconectaron
+
+    def limpiar(self, ttl_dias: float = REPORTES_TTL_DIAS, max_mb: float = REPORTES_MAX_MB) -> Tuple[int, int]:
+        """Borra informes vencidos y, sobre el tope de tamaño, los más antiguos (bloqueante).
+
+        Retorna (archivos borrados, bytes restantes). Varios workers pueden
+        barrer a la vez: un archivo que ya no existe simplemente se omite.
+        """
+        vencimiento = time.time() - ttl_dias * 86400
+        archivos = []
+        borrados = 0
+        for archivo in self.directorio.iterdir():
+            if archivo.suffix.lstrip(".") not in FORMATOS:
+                continue  # Temporales de un render en curso
+            try:
+                stat = archivo.stat()
+                if stat.st_mtime < vencimiento:
+                    archivo.unlink()
+                    borrados += 1
+                else:
+                    archivos.append((stat.st_mtime, stat.st_size, archivo))
+            except OSError:
+                pass
+        total = sum(tamano for _, tamano, _ in archivos)
+        tope = max_mb * 1024 * 1024
+        if total > tope:
+            archivos.sort()
+            for _, tamano, archivo in archivos:
+                if total <= tope * 0.9:  # Margen para no barrer en cada ciclo
+                    break
+                try:
+                    archivo.unlink()
+                    borrados += 1
+                except OSError:
+                    pass
+                total -= tamano
+        return borrados, total
+
+    def cerrar(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def ciclo_limpieza(generador: GeneradorReportes, intervalo: float = INTERVALO_LIMPIEZA):
+    """Tarea de fondo del lifespan: mantiene acotada la caché de informes."""
+    while True:
+        try:
+            borrados, restantes = await asyncio.to_thread(generador.limpiar)
+            if borrados:
+                logging.info(f"🧾 Caché de informes: {borrados} archivos borrados ({restantes / 1048576:.1f} MB restantes)")
+        except Exception as e:
+            logging.error(f"❌ Error limpiando la caché de informes: {e}")
+        await asyncio.sleep(intervalo)
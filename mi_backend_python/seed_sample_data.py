@@ -5,7 +5,7 @@ Esto permite visualizar el dashboard como se vería en producción.
 import sqlite3
 import uuid
 import random
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 # Configuración
 ANALYTICS_DB_PATH = "analytics.db"
@@ -214,7 +214,7 @@ def main():
         cursor.execute('''
             INSERT INTO system_logs (timestamp, level, message, module)
             VALUES (?, ?, ?, ?)
-        ''', (log_time.isoformat(), level, message, module))
+        ''', (log_time.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'), level, message, module))
     
     # Errores RECIENTES (últimas 24 horas) para activar WARNING/CRITICAL
     # NOTA: Comentado para que el dashboard muestre HEALTHY por defecto
@@ -236,7 +236,7 @@ def main():
         cursor.execute('''
             INSERT INTO system_logs (timestamp, level, message, module)
             VALUES (?, ?, ?, ?)
-        ''', (log_time.isoformat(), level, message, module))
+        ''', (log_time.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'), level, message, module))
     
     print(f"   ✓ {len(historical_logs)} logs históricos + {len(recent_errors)} errores recientes")
     """
@@ -0,0 +1,302 @@
+# static_frontend.py
+"""
+Servidor optimizado para el build estático del frontend (Vite).
+
+Reemplaza a `StaticFiles` + el fallback SPA que reconstruía un `FileResponse`
+de index.html en cada 404. Al iniciar, el worker escanea la carpeta una sola
+vez y construye una tabla en memoria con metadatos de cada archivo.
+
+Beneficios de rendimiento:
+- index.html (y archivos pequeños) se sirven directamente desde memoria
+- Variantes precomprimidas .br/.gz elegidas según Accept-Encoding
+- Cache-Control inmutable de 1 año para los assets con hash de Vite
+- Respuestas 304 para peticiones condicionales (ETag / If-Modified-Since)
+- Archivos grandes vía sendfile (extensión ASGI zerocopysend) cuando el
+  servidor la soporta; si no, streaming por bloques sin cargarlos en RAM
+"""
+import gzip
+import logging
+import mimetypes
+import os
+import sys
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import FileResponse, JSONResponse, Response
+
+try:
+    import brotli  # Opcional: solo necesario para generar variantes .br
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# --- CONFIGURACIÓN ---
+MAX_BYTES_EN_MEMORIA = 64 * 1024  # Archivos <= 64 KiB se sirven desde RAM
+MIN_BYTES_COMPRESION = 1024  # No vale la pena comprimir archivos diminutos
+EXTENSIONES_COMPRIMIBLES = {".html", ".js", ".css", ".svg", ".json", ".txt", ".xml", ".map", ".webmanifest"}
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"  # Assets con hash de Vite
+CACHE_CORTO = "public, max-age=3600"  # favicon, og-image, robots.txt...
+CACHE_SIN_CACHE = "no-cache"  # index.html: siempre revalidar para ver nuevos deploys
+
+# Orden de preferencia: brotli comprime mejor que gzip
+CODIFICACIONES = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass
+class Variante:
+    """Una representación concreta de un archivo (identidad, br o gzip)."""
+    ruta: Path
+    tamano: int
+    etag: str
+    contenido: Optional[bytes] = None  # Solo si cabe en memoria
+
+
+@dataclass
+class ArchivoEstatico:
+    """Metadatos precalculados de un archivo del build."""
+    media_type: str
+    cache_control: str
+    last_modified: str
+    mtime: float
+    variantes: Dict[str, Variante] = field(default_factory=dict)  # "identity" | "br" | "gzip"
+
+
+@lru_cache(maxsize=256)
+def _codificaciones_aceptadas(accept_encoding: str) -> Tuple[str, ...]:
+    """Parsea Accept-Encoding respetando q=0. Cacheado: hay pocos valores distintos."""
+    aceptadas = []
+    for parte in accept_encoding.lower().split(","):
+        partes = parte.strip().split(";")
+        nombre = partes[0].strip()
+        q = 1.0
+        for parametro in partes[1:]:
+            parametro = parametro.strip()
+            if parametro.startswith("q="):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        if nombre and q > 0:
+            aceptadas.append(nombre)
+    return tuple(aceptadas)
+
+
+def _etag_coincide(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == etag:
+            return True
+    return False
+
+
+class StaticFrontend:
+    """Aplicación ASGI que sirve el build de Vite con fallback SPA."""
+
+    def __init__(self, directorio: Path, index: str = "index.html"):
+        self.directorio = Path(directorio).resolve()
+        self.archivos: Dict[str, ArchivoEstatico] = {}
+        self._escanear()
+        self.index = self.archivos.get("/" + index)
+        if self.index is None:
+            logging.warning(f"⚠️ {index} no encontrado en {self.directorio} - sin fallback SPA")
+        en_memoria = sum(
+            1 for a in self.archivos.values() for v in a.variantes.values() if v.contenido is not None
+        )
+        logging.info(
+            f"📁 Frontend estático indexado: {len(self.archivos)} archivos "
+            f"({en_memoria} variantes en memoria)"
+        )
+
+    # --- INDEXADO INICIAL ---
+    def _escanear(self) -> None:
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                ruta = Path(raiz) / nombre
+                if ruta.suffix in (".br", ".gz") or nombre.startswith("."):
+                    continue  # Las variantes se asocian a su archivo original
+                url = "/" + ruta.relative_to(self.directorio).as_posix()
+                self.archivos[url] = self._describir(url, ruta)
+
+    def _describir(self, url: str, ruta: Path) -> ArchivoEstatico:
+        stat = ruta.stat()
+        media_type = mimetypes.guess_type(ruta.name)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "image/svg+xml"):
+            media_type += "; charset=utf-8"
+
+        if url.startswith("/assets/"):
+            cache_control = CACHE_INMUTABLE
+        elif ruta.suffix == ".html":
+            cache_control = CACHE_SIN_CACHE
+        else:
+            cache_control = CACHE_CORTO
+
+        archivo = ArchivoEstatico(
+            media_type=media_type,
+            cache_control=cache_control,
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            mtime=int(stat.st_mtime),
+        )
+        archivo.variantes["identity"] = self._variante(ruta, stat.st_size, stat.st_mtime, "")
+        for codificacion, sufijo in CODIFICACIONES:
+            comprimido = ruta.with_name(ruta.name + sufijo)
+            if comprimido.is_file():
+                c_stat = comprimido.stat()
+                archivo.variantes[codificacion] = self._variante(
+                    comprimido, c_stat.st_size, stat.st_mtime, "-" + codificacion
+                )
+        return archivo
+
+    @staticmethod
+    def _variante(ruta: Path, tamano: int, mtime: float, sufijo_etag: str) -> Variante:
+        etag = f'"{int(mtime):x}-{tamano:x}{sufijo_etag}"'
+        contenido = ruta.read_bytes() if tamano <= MAX_BYTES_EN_MEMORIA else None
+        return Variante(ruta=ruta, tamano=tamano, etag=etag, contenido=contenido)
+
+    # --- ATENCIÓN DE PETICIONES ---
+    async def __call__(self, scope, receive, send) -> None:
+        assert scope["type"] == "http"
+        metodo = scope["method"]
+        ruta = scope["path"]
+
+        archivo = self.archivos.get(ruta)
+        if archivo is None and ruta.endswith("/"):
+            archivo = self.archivos.get(ruta + "index.html")
+        if archivo is None:
+            # Las rutas de API nunca caen en el fallback SPA
+            if ruta.startswith("/api") or self.index is None:
+                await JSONResponse(status_code=404, content={"detail": "Not found"})(scope, receive, send)
+                return
+            archivo = self.index  # React Router maneja la ruta en el cliente
+
+        if metodo not in ("GET", "HEAD"):
+            await Response(status_code=405, headers={"Allow": "GET, HEAD"})(scope, receive, send)
+            return
+
+        headers = {}
+        for nombre, valor in scope["headers"]:
+            if nombre in (b"accept-encoding", b"if-none-match", b"if-modified-since"):
+                headers[nombre] = valor.decode("latin-1")
+
+        codificacion, variante = self._elegir_variante(archivo, headers.get(b"accept-encoding", ""))
+        respuesta_headers = {
+            "cache-control": archivo.cache_control,
+            "etag": variante.etag,
+            "last-modified": archivo.last_modified,
+        }
+        if len(archivo.variantes) > 1:
+            respuesta_headers["vary"] = "Accept-Encoding"
+        if codificacion != "identity":
+            respuesta_headers["content-encoding"] = codificacion
+
+        if self._no_modificado(headers, variante.etag, archivo.mtime):
+            await Response(status_code=304, headers=respuesta_headers)(scope, receive, send)
+            return
+
+        if variante.contenido is not None:
+            cuerpo = b"" if metodo == "HEAD" else variante.contenido
+            respuesta_headers["content-length"] = str(variante.tamano)
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": self._codificar_headers(respuesta_headers, archivo.media_type),
+            })
+            await send({"type": "http.response.body", "body": cuerpo})
+            return
+
+        if metodo == "GET" and "http.response.zerocopysend" in scope.get("extensions", {}):
+            await self._enviar_sendfile(send, variante, respuesta_headers, archivo.media_type)
+            return
+
+        # Fallback: FileResponse hace streaming por bloques (y usa pathsend si existe)
+        await FileResponse(
+            variante.ruta,
+            media_type=archivo.media_type,
+            headers=respuesta_headers,
+            stat_result=os.stat(variante.ruta),
+        )(scope, receive, send)
+
+    @staticmethod
+    def _elegir_variante(archivo: ArchivoEstatico, accept_encoding: str) -> Tuple[str, Variante]:
+        if accept_encoding and len(archivo.variantes) > 1:
+            aceptadas = _codificaciones_aceptadas(accept_encoding)
+            for codificacion, _ in CODIFICACIONES:
+                if codificacion in archivo.variantes and (codificacion in aceptadas or "*" in aceptadas):
+                    return codificacion, archivo.variantes[codificacion]
+        return "identity", archivo.variantes["identity"]
+
+    @staticmethod
+    def _no_modificado(headers: Dict[bytes, str], etag: str, mtime: float) -> bool:
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match is not None:
+            # Si llega If-None-Match, If-Modified-Since se ignora (RFC 9110 §13.2.2)
+            return _etag_coincide(if_none_match, etag)
+        if_modified_since = headers.get(b"if-modified-since")
+        if if_modified_since:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _codificar_headers(headers: Dict[str, str], media_type: str):
+        codificados = [(b"content-type", media_type.encode("latin-1"))]
+        codificados.extend((k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items())
+        return codificados
+
+    async def _enviar_sendfile(self, send, variante: Variante, headers: Dict[str, str], media_type: str) -> None:
+        """Entrega el archivo con sendfile(2) sin copiarlo al espacio de usuario."""
+        headers["content-length"] = str(variante.tamano)
+        with open(variante.ruta, "rb") as f:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": self._codificar_headers(headers, media_type),
+            })
+            await send({"type": "http.response.zerocopysend", "file": f.fileno(), "count": variante.tamano})
+
+
+# ==============================================================================
+# PRECOMPRESIÓN EN TIEMPO DE BUILD
+# ==============================================================================
+# Se ejecuta una sola vez durante el build de Docker:
+#     python static_frontend.py ./static
+# Genera archivo.js.gz y archivo.js.br (si brotli está instalado) junto a cada
+# archivo comprimible, para no gastar CPU de los workers comprimiendo en caliente.
+# ==============================================================================
+
+def precomprimir(directorio: Path) -> int:
+    """Genera variantes .gz/.br para los archivos comprimibles. Retorna cuántas creó."""
+    creadas = 0
+    for raiz, _, nombres in os.walk(directorio):
+        for nombre in nombres:
+            ruta = Path(raiz) / nombre
+            if ruta.suffix not in EXTENSIONES_COMPRIMIBLES or ruta.stat().st_size < MIN_BYTES_COMPRESION:
+                continue
+            datos = ruta.read_bytes()
+            variantes = {".gz": gzip.compress(datos, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variantes[".br"] = brotli.compress(datos, quality=11)
+            for sufijo, comprimido in variantes.items():
+                if len(comprimido) >= len(datos):
+                    continue  # Sin ganancia: servir el original
+                destino = ruta.with_name(nombre + sufijo)
+                destino.write_bytes(comprimido)
+                os.utime(destino, (ruta.stat().st_atime, ruta.stat().st_mtime))
+                creadas += 1
+    return creadas
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    objetivo = Path(sys.argv[1] if len(sys.argv) > 1 else "static")
+    if brotli is None:
+        logging.warning("⚠️ Módulo brotli no instalado - solo se generarán variantes .gz")
+    logging.info(f"🗜️ Variantes precomprimidas generadas: {precomprimir(objetivo)}")
@@ -0,0 +1,88 @@
+# tests/conftest.py
+"""
+Configuración compartida de las pruebas del backend.
+
+Varios módulos leen su configuración del entorno al importarse (rutas de las
+bases, credenciales, archivo del límite de tasa), así que las variables se
+fijan aquí, ANTES de que cualquier prueba importe el backend. Todo lo que se
+escribe en disco queda en un directorio temporal que se borra al terminar.
+
+Ejecutar desde mi_backend_python/:
+    python -m pytest -q
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+DIRECTORIO_PRUEBAS = Path(tempfile.mkdtemp(prefix="pruebas-backend-"))
+atexit.register(shutil.rmtree, DIRECTORIO_PRUEBAS, ignore_errors=True)
+
+USUARIO_DASHBOARD = "panel"
+CLAVE_DASHBOARD = "clave-panel"
+TOKEN_ADMIN = "token-admin"
+
+os.environ.update({
+    "LEADS_DB_PATH": str(DIRECTORIO_PRUEBAS / "leads.db"),
+    "ANALYTICS_DB_PATH": str(DIRECTORIO_PRUEBAS / "analytics.db"),
+    "EVENTOS_DIR": str(DIRECTORIO_PRUEBAS / "eventos"),
+    "ARCHIVO_DIR": str(DIRECTORIO_PRUEBAS / "archivo"),
+    "REPORTES_DIR": str(DIRECTORIO_PRUEBAS / "reportes"),
+    "REPORTES_PROCESOS": "1",
+    "CATALOGO_HISTORIAL_DIR": str(DIRECTORIO_PRUEBAS / "catalogos_historial"),
+    "PERFIL_DIR": str(DIRECTORIO_PRUEBAS / "perfiles"),
+    "GEOIP_DB_PATH": str(DIRECTORIO_PRUEBAS / "geoip.bin"),  # No existe: sesiones sin país
+    "RATE_LIMIT_ARCHIVO": str(DIRECTORIO_PRUEBAS / "limite-tasa.bin"),
+    # La app compartida no limita: test_limite_tasa.py arma su propio limitador
+    "RATE_LIMIT_HABILITADO": "0",
+    "PROXIES_CONFIABLES": "0",
+    "DASHBOARD_USER": USUARIO_DASHBOARD,
+    "DASHBOARD_PASSWORD": CLAVE_DASHBOARD,
+    "ADMIN_API_TOKEN": TOKEN_ADMIN,
+})
+# Sin SMTP ni Make: nada sale de la máquina durante las pruebas
+for variable in ("SMTP_HOST", "MAKE_WEBHOOK_URL", "MAKE_AUTH_TOKEN", "PUBLIC_BASE_URL"):
+    os.environ.pop(variable, None)
+
+FORMULARIO = {
+    "nombre": "Ana",
+    "email": "ana@example.com",
+    "telefono": "999888777",
+    "empresa": "Constructora Andina",
+    "cargo": "Gerente",
+    "numero_trabajadores": 10,
+    "tipo_empresa": "micro",
+    "respuestas": {"q1": "no", "q36": "no"},
+}
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    """TestClient de la app completa (con lifespan) compartido por la sesión."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def auth_dashboard():
+    import base64
+
+    credenciales = base64.b64encode(f"{USUARIO_DASHBOARD}:{CLAVE_DASHBOARD}".encode()).decode()
+    return {"Authorization": f"Basic {credenciales}"}
+
+
+@pytest.fixture
+def auth_admin():
+    return {"Authorization": f"Bearer {TOKEN_ADMIN}"}
@@ -0,0 +1,123 @@
+# tests/test_analytics_en_vivo.py
+import asyncio
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from analytics import stream_en_vivo
+from analytics_en_vivo import MAX_COLA, CanalEnVivo, DemasiadosSuscriptores, FeedAnalytics, evento_sse
+from analytics_store import AnalyticsStore
+from lead_store import LeadStore
+from registro_logs import FORMATO_TIMESTAMP, MonitorLogs
+
+
+@pytest.fixture
+def feed(tmp_path):
+    analytics_store = AnalyticsStore(str(tmp_path / "analytics.db"), tmp_path / "eventos")
+    lead_store = LeadStore(str(tmp_path / "leads.db"))
+    return FeedAnalytics(analytics_store, lead_store, MonitorLogs(analytics_store))
+
+
+def _sesion(feed):
+    return feed.analytics_store.crear_sesion(None, "pytest", "desktop", None)
+
+
+def _lead(feed, monto):
+    feed.lead_store.guardar({
+        "created_at": datetime.now().isoformat(),
+        "empresa": "Andina",
+        "monto_multa_soles": monto,
+        "resultado_completo_json": {},
+    })
+
+
+def _error(feed, mensaje):
+    feed.analytics_store.insertar_logs([(datetime.now(timezone.utc).strftime(FORMATO_TIMESTAMP), "ERROR", mensaje, "main", None)])
+    feed.monitor_logs.sincronizar()
+
+
+def _datos(mensaje: bytes) -> dict:
+    return json.loads(mensaje.decode().split("data: ", 1)[1])
+
+
+def test_deltas_incrementales(feed):
+    _sesion(feed)  # Anterior a la primera llamada: no es un delta
+    assert feed.delta() == (1, None)
+    assert feed.delta() == (2, None)  # Nada cambió: no se publica nada
+
+    _sesion(feed)
+    _sesion(feed)
+    _lead(feed, 1000.0)
+    _lead(feed, 407.5)
+    secuencia, cambios = feed.delta()
+    assert secuencia == 3
+    assert cambios == {"new_sessions": 2, "conversions": 2, "conversion_amount": 1407.5, "active_users": 3}
+
+    _error(feed, "SMTP caído")
+    _, cambios = feed.delta()
+    assert [error["message"] for error in cambios["errors"]] == ["SMTP caído"]
+    assert (cambios["errors_24h"], cambios["status"]) == (1, "warning")
+    assert feed.delta()[1] is None  # Los valores absolutos solo viajan cuando cambian
+
+
+def test_snapshot_consistente_con_los_deltas(feed):
+    _sesion(feed)
+    feed.delta()  # Fija los cursores
+    _sesion(feed)  # Llega después del último delta...
+    secuencia, instantanea = feed.instantanea()
+    assert (secuencia, instantanea["sessions_today"]) == (1, 1)  # ...así que va en el próximo delta, no aquí
+    assert feed.delta()[1]["new_sessions"] == 1
+
+
+def test_sin_clientes_se_olvidan_los_cursores(feed):
+    feed.delta()
+    _sesion(feed)
+    feed.reiniciar()
+    assert feed.delta()[1] is None  # Se vuelve a empezar "desde ahora"
+
+
+def test_canal_desconecta_clientes_lentos():
+    canal = CanalEnVivo(max_suscriptores=2)
+    lento, rapido = canal.suscribir(), canal.suscribir()
+    with pytest.raises(DemasiadosSuscriptores):
+        canal.suscribir()
+    for secuencia in range(1, MAX_COLA + 1):
+        canal.publicar(b"delta", secuencia)
+        rapido.get_nowait()
+    canal.publicar(b"uno mas", MAX_COLA + 1)
+    assert lento.qsize() == 1 and lento.get_nowait() is None  # Fin del stream: reconecta con snapshot
+    assert canal.suscriptores == {rapido}
+    assert rapido.get_nowait() == (MAX_COLA + 1, b"uno mas")
+
+
+def test_stream_descarta_deltas_incluidos_en_el_snapshot(feed):
+    async def escenario():
+        feed.delta()
+        feed.delta()
+        app = SimpleNamespace(state=SimpleNamespace(feed_analytics=feed))
+        respuesta = await stream_en_vivo(Request({"type": "http", "app": app, "headers": []}))
+        cuerpo = respuesta.body_iterator
+        primero = await cuerpo.__anext__()
+        assert primero.startswith(b"retry: ")
+        assert b"event: snapshot" in primero
+
+        # Deltas encolados mientras se calculaba el snapshot (secuencia <= 2) y uno posterior
+        feed.canal.publicar(evento_sse("delta", {"new_sessions": 5}), 2)
+        feed.canal.publicar(b": ping\n\n")
+        feed.canal.publicar(evento_sse("delta", {"new_sessions": 1}), 3)
+        assert await cuerpo.__anext__() == b": ping\n\n"
+        assert _datos(await cuerpo.__anext__()) == {"new_sessions": 1}
+
+        feed.canal.cerrar()
+        with pytest.raises(StopAsyncIteration):
+            await cuerpo.__anext__()
+        assert not feed.canal.suscriptores
+
+    asyncio.run(escenario())
+
+
+def test_stream_requiere_dashboard(cliente):
+    assert cliente.get("/api/analytics/stream").status_code == 401
@@ -0,0 +1,82 @@
+# tests/test_analytics_lote.py
+import gzip
+import json
+import time
+
+import pytest
+
+from analytics import MAX_BYTES_DESCOMPRIMIDOS, MAX_BYTES_LOTE, MAX_EVENT_DATA, MAX_EVENTOS_LOTE
+
+LOTE = "/api/analytics/events/batch"
+
+
+@pytest.fixture
+def sesion(cliente):
+    return cliente.post("/api/analytics/session", json={"device_info": "desktop"}).json()["session_id"]
+
+
+def _eventos(cliente, session_id):
+    return cliente.app.state.analytics_store.eventos.consultar(
+        "SELECT event_type, event_data, created_at FROM events WHERE session_id = ? ORDER BY created_at, event_type",
+        (session_id,),
+    )
+
+
+def _lote(session_id, eventos):
+    return json.dumps({"session_id": session_id, "events": eventos}).encode()
+
+
+def test_lote_gzip_como_text_plain(cliente, sesion):
+    """sendBeacon envía text/plain (sin preflight CORS) y el cliente puede comprimir."""
+    ts = int(time.time() * 1000) - 60_000
+    cuerpo = gzip.compress(_lote(sesion, [
+        {"event_type": "form_start", "ts": ts},
+        {"event_type": "question_q1", "event_data": {"respuesta": "no"}},
+    ]))
+    respuesta = cliente.post(LOTE, content=cuerpo, headers={"Content-Type": "text/plain", "Content-Encoding": "gzip"})
+    assert respuesta.status_code == 202
+    assert respuesta.json()["insertados"] == 2
+
+    (tipo, datos, creado), (tipo2, datos2, _) = _eventos(cliente, sesion)
+    assert (tipo, datos) == ("form_start", None)
+    assert abs(time.mktime(time.strptime(creado[:19], "%Y-%m-%dT%H:%M:%S")) * 1000 - ts) < 1000  # Hora del cliente
+    assert (tipo2, json.loads(datos2)) == ("question_q1", {"respuesta": "no"})
+
+
+def test_gzip_sin_content_encoding_se_detecta_por_magic_bytes(cliente, sesion):
+    cuerpo = gzip.compress(_lote(sesion, [{"event_type": "heartbeat_like"}]))
+    assert cliente.post(LOTE, content=cuerpo, headers={"Content-Type": "text/plain"}).status_code == 202
+
+
+def test_lote_invalido_no_inserta_nada(cliente, sesion):
+    eventos = [{"event_type": "form_start"}, {"event_type": ""}]
+    assert cliente.post(LOTE, content=_lote(sesion, eventos)).status_code == 422
+    assert _eventos(cliente, sesion) == []
+
+
+@pytest.mark.parametrize("event_data", [
+    "x" * (MAX_EVENT_DATA + 1),
+    {"texto": "x" * MAX_EVENT_DATA},  # El tope aplica al JSON serializado
+])
+def test_event_data_demasiado_grande(cliente, sesion, event_data):
+    cuerpo = _lote(sesion, [{"event_type": "form_start", "event_data": event_data}])
+    assert cliente.post(LOTE, content=cuerpo).status_code == 422
+    individual = {"session_id": sesion, "event_type": "form_start", "event_data": "x" * (MAX_EVENT_DATA + 1)}
+    assert cliente.post("/api/analytics/event", json=individual).status_code == 422
+
+
+def test_limites_del_lote(cliente, sesion):
+    demasiados = [{"event_type": "e"}] * (MAX_EVENTOS_LOTE + 1)
+    assert cliente.post(LOTE, content=_lote(sesion, demasiados)).status_code == 422
+
+    assert cliente.post(LOTE, content=b" " * (MAX_BYTES_LOTE + 1)).status_code == 413
+
+    # Gzip bomb: cabe comprimido pero excede el tope descomprimido
+    bomba = gzip.compress(b" " * (MAX_BYTES_DESCOMPRIMIDOS + 1))
+    assert len(bomba) < MAX_BYTES_LOTE
+    assert cliente.post(LOTE, content=bomba, headers={"Content-Encoding": "gzip"}).status_code == 413
+    assert cliente.post(LOTE, content=b"\x1f\x8bnope", headers={"Content-Encoding": "gzip"}).status_code == 400
+
+
+def test_sesion_inexistente(cliente):
+    assert cliente.post(LOTE, content=_lote("no-existe", [{"event_type": "e"}])).status_code == 404
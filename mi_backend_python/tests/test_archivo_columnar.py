@@ -0,0 +1,102 @@
+# tests/test_archivo_columnar.py
+import fcntl
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import archivo_columnar
+from archivo_columnar import agregar, cargar, compactar, compactar_dia, preguntas_mas_incumplidas
+from lead_store import LeadStore
+
+HOY = date.today()
+DIAS = [(HOY - timedelta(days=d)).isoformat() for d in (5, 4, 2)]
+
+
+def _lead(dia: str, hora: int, tipo: str, monto: float) -> dict:
+    return {
+        "created_at": f"{dia}T{hora:02d}:00:00",
+        "nombre_lead": "No se archiva",
+        "email_lead": "privado@example.com",
+        "numero_trabajadores": 10,
+        "tipo_empresa": tipo,
+        "severidad_maxima": "Grave",
+        "monto_multa_soles": monto,
+        "total_incumplimientos": 1,
+        "resultado_completo_json": {"diagnostico": {"resumen_hallazgos": {"Grave": 1}}, "catalogo_version": "2026.1"},
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LeadStore(str(tmp_path / "leads.db"))
+    for dia in DIAS:
+        store.guardar(_lead(dia, 9, "Micro", 100.0), {"q1": "no", "q2": "no"})
+        store.guardar(_lead(dia, 10, "No Mype", 300.0), {"q1": "no", "q3": "si"})
+    store.guardar(_lead(HOY.isoformat(), 8, "Micro", 999.0), {"q1": "no"})  # Día abierto: no se archiva
+    return store
+
+
+def test_compacta_solo_dias_cerrados(store, tmp_path):
+    directorio = tmp_path / "archivo"
+    assert compactar(store, directorio) == 3
+    assert sorted(p.name for p in directorio.glob("*.arrow")) == [f"diagnosticos-{dia}.arrow" for dia in DIAS]
+    assert compactar(store, directorio) == 0  # Idempotente
+
+    tabla = cargar(directorio)
+    assert tabla.num_rows == 6
+    assert "email_lead" not in tabla.column_names and "nombre_lead" not in tabla.column_names
+    assert set(tabla["tipo_empresa"].to_pylist()) == {"micro", "no_mype"}
+    assert tabla["created_at"].type == pa.timestamp("us")
+
+
+def test_rellena_dias_faltantes(store, tmp_path):
+    directorio = tmp_path / "archivo"
+    compactar(store, directorio)
+    (directorio / f"diagnosticos-{DIAS[0]}.arrow").unlink()  # Hueco ANTES del último día archivado
+    assert compactar(store, directorio) == 1
+    assert (directorio / f"diagnosticos-{DIAS[0]}.arrow").exists()
+
+
+def test_falla_a_mitad_no_deja_temporales(store, tmp_path, monkeypatch):
+    directorio = tmp_path / "archivo"
+    directorio.mkdir()
+
+    def iterar_roto(**filtros):
+        yield [(1, f"{DIAS[0]}T09:00:00", *([None] * len(archivo_columnar.COLUMNAS_ORIGEN)))]
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(store, "iterar", iterar_roto)
+    with pytest.raises(OSError, match="disco lleno"):
+        compactar_dia(store, directorio, DIAS[0])
+    assert list(directorio.iterdir()) == []
+
+
+def test_un_solo_worker_compacta(store, tmp_path):
+    directorio = tmp_path / "archivo"
+    directorio.mkdir()
+    with open(directorio / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert compactar(store, directorio) == 0
+    assert compactar(store, directorio) == 3
+
+
+def test_consultas_por_rango(store, tmp_path):
+    directorio = tmp_path / "archivo"
+    compactar(store, directorio)
+    desde = date.fromisoformat(DIAS[1])
+    assert cargar(directorio, desde=desde).num_rows == 4
+    assert cargar(directorio, hasta=desde - timedelta(days=1)).num_rows == 2
+
+    promedio = agregar(directorio, ["tipo_empresa"], [("monto_multa_soles", "mean"), ("id", "count")])
+    filas = {fila["tipo_empresa"]: fila for fila in promedio.to_pylist()}
+    assert filas["micro"]["monto_multa_soles_mean"] == 100.0
+    assert filas["no_mype"]["id_count"] == 3
+
+    incumplidas = preguntas_mas_incumplidas(directorio, agrupar_por=None, top=2)
+    assert incumplidas["todos"] == [("q1", 6), ("q2", 3)]
+
+
+def test_directorio_vacio():
+    assert cargar(datetime.now().strftime("/tmp/no-existe-%f")).num_rows == 0
@@ -0,0 +1,174 @@
+# tests/test_catalogo.py
+import copy
+import functools
+import json
+
+import pytest
+
+import catalogo
+from catalogo import CatalogoInvalido, compilar, recargar
+
+CATALOGO = {
+    "version": "prueba-1",
+    "jurisdiccion_por_defecto": "PE",
+    "jurisdicciones": {
+        "PE": {
+            "nombre": "Perú",
+            "moneda": "PEN",
+            "simbolo_moneda": "S/",
+            "valor_referencia": 100,
+            "clasificacion": {"clases": ["micro", "no_mype"], "por_defecto": "no_mype"},
+            "exenciones": [{"clases": ["micro"], "preguntas": ["q3"]}],
+            "tablas_multas": {
+                "micro": {"unidad": "moneda", "rangos": [
+                    {"etiqueta": "1-10", "hasta": 10, "multas": {"Leves": 10, "Grave": 20, "Muy Grave": 30}},
+                    {"etiqueta": "11+", "hasta": None, "multas": {"Leves": 15, "Grave": 25, "Muy Grave": 35}},
+                ]},
+                "no_mype": {"unidad": "referencia", "rangos": [
+                    {"etiqueta": "1-10", "hasta": 10, "multas": {"Leves": 0.5, "Grave": 1, "Muy Grave": 2}},
+                    {"etiqueta": "11-5000", "hasta": 5000, "multas": {"Leves": 1, "Grave": 2, "Muy Grave": 4}},
+                    {"etiqueta": "5001+", "hasta": None, "multas": {"Leves": 2, "Grave": 4, "Muy Grave": 8}},
+                ]},
+            },
+            "infracciones": {
+                "q1": {"severidad": "Grave", "articulo": "Art. 1"},
+                "q2": {"severidad": "Leves", "articulo": "Art. 2"},
+                "q3": {"severidad": "Muy Grave", "articulo": "Art. 3"},
+            },
+        },
+        "CL": {
+            "nombre": "Chile",
+            "moneda": "CLP",
+            "clasificacion": {
+                "clases": ["pequena", "grande"],
+                "por_defecto": "grande",
+                "por_trabajadores": [{"hasta": 49, "clase": "pequena"}, {"hasta": None, "clase": "grande"}],
+            },
+            "tablas_multas": {
+                clase: {"pesos_severidad": {"Leves": 1, "Grave": 2, "Muy Grave": 3},
+                        "rangos": [{"etiqueta": "todos", "hasta": None, "base": base}]}
+                for clase, base in (("pequena", 1000), ("grande", 5000))
+            },
+            "infracciones": {"q1": {"severidad": "Grave", "articulo": "Ley 16.744"}},
+        },
+    },
+}
+
+
+@pytest.fixture
+def restaurar_activo(monkeypatch):
+    """recargar() cambia el catálogo global del worker: se devuelve al terminar."""
+    monkeypatch.setattr(catalogo, "_activo", catalogo._activo)
+    monkeypatch.setattr(catalogo, "_mtime_activo", catalogo._mtime_activo)
+
+
+def _escribir(ruta, datos):
+    ruta.write_text(json.dumps(datos), encoding="utf-8")
+    return ruta
+
+
+def test_motor_compilado_con_exenciones_y_unidad_de_referencia():
+    pe = compilar(CATALOGO).jurisdiccion("pe")
+    respuestas = {"q1": "NO", "q2": "no", "q3": "no", "q99": "no", "q4": "si"}
+
+    micro = pe.evaluar("micro", 5, respuestas)
+    assert micro.conteos == (1, 1, 0)  # q3 exenta para micro; q99 no es infracción
+    assert [i["articulo"] for i in micro.detalle] == ["Art. 1", "Art. 2"]
+    assert (micro.rango, micro.monto) == ("1-10", 30.0)
+
+    no_mype = pe.evaluar("no_mype", 11, respuestas)
+    assert no_mype.conteos == (1, 1, 1)
+    assert no_mype.multas_unitarias == (100.0, 200.0, 400.0)  # Multiplicadas por valor_referencia al compilar
+    assert no_mype.monto == 700.0
+
+    sin_trabajadores = pe.evaluar("micro", 0, respuestas)
+    assert (sin_trabajadores.rango, sin_trabajadores.monto) == (None, 0.0)
+
+
+def test_rangos_por_encima_de_la_tabla_directa():
+    pe = compilar(CATALOGO).jurisdiccion("PE")
+    assert pe.evaluar("no_mype", catalogo.MAX_TABLA_DIRECTA, {}).rango == "11-5000"
+    assert pe.evaluar("no_mype", 5000, {}).rango == "11-5000"
+    assert pe.evaluar("no_mype", 5001, {}).rango == "5001+"
+
+
+def test_clasificacion_exacta_como_antes_del_catalogo():
+    pe = compilar(CATALOGO).jurisdiccion("PE")
+    assert pe.clases[pe.clasificar("micro", 5)] == "micro"
+    assert pe.clases[pe.clasificar("Micro", 5)] == "no_mype"  # Sin normalizar mayúsculas
+    assert pe.clases[pe.clasificar(None, 5)] == "no_mype"
+
+
+def test_otra_jurisdiccion_sin_codigo_nuevo():
+    normativa = compilar(CATALOGO)
+    cl = normativa.jurisdiccion("CL")
+    assert cl.clases[cl.clasificar(None, 49)] == "pequena"
+    assert cl.clases[cl.clasificar(None, 50)] == "grande"
+    assert cl.evaluar(None, 10, {"q1": "no"}).monto == 2000.0  # base 1000 × peso Grave
+    assert normativa.jurisdiccion("AR") is normativa.jurisdiccion("PE")  # Desconocida: la por defecto
+
+
+def test_formato_legado_del_historial():
+    legado = {
+        "version": "2025.9",
+        "valor_uit": 100,
+        "preguntas_exentas_mype": ["q1"],
+        "tablas_multas": CATALOGO["jurisdicciones"]["PE"]["tablas_multas"],
+        "infracciones": CATALOGO["jurisdicciones"]["PE"]["infracciones"],
+    }
+    pe = compilar(legado).jurisdiccion()
+    assert pe.evaluar("micro", 5, {"q1": "no"}).conteos == (0, 0, 0)
+    assert pe.evaluar("no_mype", 5, {"q1": "no"}).monto == 100.0
+
+
+@pytest.mark.parametrize("romper", [
+    lambda d: d["jurisdicciones"]["PE"]["tablas_multas"]["micro"]["rangos"].reverse(),
+    lambda d: d["jurisdicciones"]["PE"]["tablas_multas"].pop("micro"),
+    lambda d: d["jurisdicciones"]["PE"]["infracciones"]["q1"].update(severidad="Moderada"),
+    lambda d: d["jurisdicciones"]["PE"].pop("valor_referencia"),
+    lambda d: d["jurisdicciones"]["PE"]["clasificacion"].update(por_defecto="mediana"),
+    lambda d: d.update(jurisdiccion_por_defecto="BR"),
+    lambda d: d["jurisdicciones"]["PE"].pop("infracciones"),
+])
+def test_catalogos_invalidos(romper):
+    datos = copy.deepcopy(CATALOGO)
+    romper(datos)
+    with pytest.raises(CatalogoInvalido):
+        compilar(datos)
+
+
+def test_recarga_en_caliente(tmp_path, restaurar_activo):
+    anterior = catalogo.catalogo_activo()
+    ruta = _escribir(tmp_path / "catalogo.json", CATALOGO)
+    nuevo = recargar(ruta)
+    assert catalogo.catalogo_activo() is nuevo and nuevo.version == "prueba-1"
+    assert anterior.version != nuevo.version  # El snapshot previo sigue intacto para quien lo tenga
+    assert (catalogo.CATALOGO_HISTORIAL_DIR / "catalogo-prueba-1.json").exists()
+
+    roto = _escribir(tmp_path / "roto.json", {"version": "prueba-2"})
+    with pytest.raises(CatalogoInvalido):
+        recargar(roto)
+    assert catalogo.catalogo_activo() is nuevo
+
+
+def test_misma_version_con_otro_contenido_se_rechaza(tmp_path, restaurar_activo):
+    datos = copy.deepcopy(CATALOGO)
+    datos["version"] = "prueba-historial"
+    recargar(_escribir(tmp_path / "v1.json", datos))
+
+    datos["jurisdicciones"]["PE"]["valor_referencia"] = 200  # Cambia la normativa sin subir la versión
+    with pytest.raises(CatalogoInvalido, match="subir 'version'"):
+        recargar(_escribir(tmp_path / "v2.json", datos))
+    assert catalogo.catalogo_activo().jurisdiccion().evaluar("no_mype", 5, {"q1": "no"}).monto == 100.0
+
+
+def test_endpoint_recarga_requiere_admin_y_rechaza_invalidos(cliente, auth_admin, auth_dashboard, tmp_path,
+                                                             monkeypatch, restaurar_activo):
+    ruta = _escribir(tmp_path / "roto.json", {"version": "x"})
+    monkeypatch.setattr(catalogo, "recargar", functools.partial(recargar, ruta))
+    assert cliente.post("/api/admin/catalogo/recargar", headers=auth_dashboard).status_code == 401
+    vigente = catalogo.catalogo_activo().version
+    respuesta = cliente.post("/api/admin/catalogo/recargar", headers=auth_admin)
+    assert respuesta.status_code == 422
+    assert vigente in respuesta.json()["detail"]
+    assert catalogo.catalogo_activo().version == vigente
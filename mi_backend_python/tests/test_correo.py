@@ -0,0 +1,130 @@
+# tests/test_correo.py
+import asyncio
+from pathlib import Path
+
+import pytest
+
+import main
+from correo import PlantillaInvalida, ServicioCorreo, compilar_plantilla, crear_servicio_correo
+
+PLANTILLA = """<html><body style="background:url('images/fondo.png')">
+<img src="images/logo.png"><img src="https://cdn.example.com/externo.png">
+<p>Hola *|MMERGE5|*, el diagnóstico de {{36.empresa}} está listo.</p>
+<p>Multa: {{ monto_multa_soles }}</p><a href="{{40.whatsapp_cta_link}}">WhatsApp</a>
+</body></html>"""
+
+DATA = {
+    "nombre_lead": "Ana <admin>",
+    "empresa": "Andina & Cía",
+    "email_lead": "ana@example.com",
+    "monto_multa_soles": 2407.5,
+    "total_incumplimientos": 2,
+    "severidad_maxima": "Grave",
+    "resultado_completo_json": {"multa": {"simbolo_moneda": "S/"}},
+}
+
+
+class RemitenteMemoria:
+    """Remitente de prueba: guarda los mensajes o falla como un SMTP caído."""
+
+    def __init__(self, falla: bool = False):
+        self.falla = falla
+        self.enviados = []
+
+    def enviar(self, mensaje):
+        if self.falla:
+            raise ConnectionRefusedError("SMTP caído")
+        self.enviados.append(mensaje)
+
+    def cerrar(self):
+        pass
+
+
+@pytest.fixture
+def plantilla(tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "logo.png").write_bytes(b"\x89PNG logo")
+    (tmp_path / "images" / "fondo.png").write_bytes(b"\x89PNG fondo")
+    ruta = tmp_path / "index.html"
+    ruta.write_text(PLANTILLA, encoding="utf-8")
+    return ruta
+
+
+def test_compila_y_enlaza_imagenes_con_hash(plantilla):
+    compilada, assets = compilar_plantilla(plantilla, base_url="https://api.example.com")
+    assert compilada.campos == ("nombre_lead", "empresa", "monto_multa_soles", "whatsapp_cta_link")
+    assert sorted(archivo.name for archivo in assets.values()) == ["fondo.png", "logo.png"]
+    html = compilada.renderizar({"nombre_lead": "Ana"})
+    for nombre in assets:
+        assert f"https://api.example.com/email-assets/{nombre}" in html
+    assert "https://cdn.example.com/externo.png" in html  # Las absolutas no se tocan
+    assert "images/" not in html
+
+
+def test_sin_base_url_las_imagenes_quedan_relativas(plantilla):
+    compilada, assets = compilar_plantilla(plantilla, base_url="")
+    assert assets == {}
+    assert 'src="images/logo.png"' in compilada.renderizar({})
+
+
+@pytest.mark.parametrize("fuente, motivo", [
+    (PLANTILLA.replace("{{ monto_multa_soles }}", "{{ 12.descuento }}"), "sin dato"),
+    (PLANTILLA.replace("*|MMERGE5|*", "*|LNAME|*"), "sin dato"),
+    (PLANTILLA.replace("{{40.whatsapp_cta_link}}", "#"), "Make"),
+])
+def test_plantillas_invalidas(tmp_path, fuente, motivo):
+    ruta = tmp_path / "index.html"
+    ruta.write_text(fuente, encoding="utf-8")
+    with pytest.raises(PlantillaInvalida, match=motivo):
+        compilar_plantilla(ruta, base_url="")
+
+
+def test_plantilla_del_repositorio_compila():
+    ruta = Path(__file__).resolve().parents[2] / "email design" / "index.html"
+    compilada, _ = compilar_plantilla(ruta, base_url="https://api.example.com")
+    assert {"nombre_lead", "empresa", "whatsapp_cta_link"} <= set(compilada.campos)
+
+
+def test_correo_escapa_los_valores(plantilla):
+    remitente = RemitenteMemoria()
+    servicio = ServicioCorreo(*compilar_plantilla(plantilla, base_url=""), remitente, remitente_desde="SST <sst@example.com>")
+    assert servicio.enviar_diagnostico(DATA) is True
+    (mensaje,) = remitente.enviados
+    assert mensaje["To"] == "ana@example.com"
+    assert mensaje["Subject"] == "Informe de Diagnóstico SST para Andina & Cía"
+    html = mensaje.get_body(("html",)).get_content()
+    assert "Ana &lt;admin&gt;" in html and "Andina &amp; Cía" in html
+    assert "S/ 2,407.50" in html
+    assert "https://wa.me/" in html
+    assert "2 incumplimientos" in mensaje.get_body(("plain",)).get_content()
+
+
+def test_sin_smtp_no_hay_correo_local():
+    assert crear_servicio_correo() is None  # conftest quita SMTP_HOST
+
+
+@pytest.mark.parametrize("falla, esperado", [(False, True), (True, False)])
+def test_email_local_refleja_el_envio_real(plantilla, monkeypatch, falla, esperado):
+    """Make omite su módulo de correo solo si el correo local salió de verdad."""
+    servicio = ServicioCorreo(*compilar_plantilla(plantilla, base_url=""), RemitenteMemoria(falla=falla))
+    recibido_por_make = {}
+
+    async def make(data, http_client, empresa):
+        recibido_por_make.update(data)
+
+    monkeypatch.setattr(main, "MAKE_WEBHOOK_URL", "https://hook.example.com/x")
+    monkeypatch.setattr(main, "enviar_a_make_background", make)
+    asyncio.run(main.entregar_diagnostico(dict(DATA), servicio, None, DATA["empresa"]))
+    assert recibido_por_make["email_local"] is esperado
+
+
+def test_sin_correo_local_make_lo_envia(monkeypatch):
+    recibido_por_make = {}
+
+    async def make(data, http_client, empresa):
+        recibido_por_make.update(data)
+
+    monkeypatch.setattr(main, "MAKE_WEBHOOK_URL", "https://hook.example.com/x")
+    monkeypatch.setattr(main, "enviar_a_make_background", make)
+    asyncio.run(main.entregar_diagnostico(dict(DATA), None, None, DATA["empresa"]))
+    assert recibido_por_make["email_local"] is False
@@ -0,0 +1,135 @@
+# tests/test_eventos_particionados.py
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+
+from analytics_store import AnalyticsStore
+from eventos_particionados import MAX_PARTICIONES_LECTURA, EventosParticionados
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalyticsStore(str(tmp_path / "analytics.db"), tmp_path / "eventos")
+
+
+def _legado(ruta, filas):
+    """Eventos en la tabla `events` de analytics.db (como los deja seed_sample_data.py)."""
+    conn = sqlite3.connect(ruta)
+    with conn:
+        conn.executemany(
+            "INSERT INTO events (id, session_id, event_type, event_data, created_at) VALUES (?, ?, ?, ?, ?)", filas
+        )
+    conn.close()
+
+
+def _contar(eventos, **rango):
+    return eventos.consultar("SELECT COUNT(*) FROM events", **rango)[0][0]
+
+
+def test_inserta_cada_evento_en_la_particion_de_su_mes(store, tmp_path):
+    sesion = store.crear_sesion(None, "pytest", "desktop", None)
+    filas = [("form_start", None, "2026-01-31T23:59:00"), ("form_start", None, "2026-02-01T00:00:00"),
+             ("form_submit", '{"x": 1}', "2026-02-10T10:00:00")]
+    assert store.insertar_eventos(sesion, filas) == 3
+    assert store.insertar_eventos("no-existe", filas) == -1
+    eventos = store.eventos
+    assert eventos.periodos() == ["2026-01", "2026-02"]
+    assert _contar(eventos, desde=date(2026, 2, 1)) == 2
+    assert eventos.periodos_en_rango(date(2026, 2, 5), date(2026, 2, 6)) == ["2026-02"]
+    assert eventos.consultar("SELECT COUNT(*) FROM events", desde=date(2030, 1, 1)) == [(0,)]  # Sin particiones
+
+
+def test_consulta_mas_particiones_que_el_limite_de_attach(tmp_path):
+    eventos = EventosParticionados(tmp_path / "eventos")
+    meses = [f"{2024 + m // 12}-{m % 12 + 1:02d}" for m in range(MAX_PARTICIONES_LECTURA + 3)]
+    eventos.insertar((f"s{i % 2}", "form_start", None, f"{mes}-15T10:00:00") for i, mes in enumerate(meses))
+    filas = eventos.consultar("SELECT session_id, COUNT(*) FROM events GROUP BY session_id")
+    # Un tramo por cada 10 particiones: las agregaciones llegan parciales y se suman
+    assert len(filas) == 4
+    assert sum(cantidad for _, cantidad in filas) == len(meses)
+
+
+def test_lectura_no_recrea_particiones_borradas(tmp_path, monkeypatch):
+    eventos = EventosParticionados(tmp_path / "eventos")
+    eventos.insertar([("s", "e", None, "2025-01-10T00:00:00"), ("s", "e", None, "2025-02-10T00:00:00")])
+    periodos = eventos.periodos()
+    os.remove(eventos._ruta("2025-01"))  # La retención la borró después de listar
+    monkeypatch.setattr(eventos, "periodos_en_rango", lambda desde, hasta: periodos)
+    assert _contar(eventos) == 1
+    assert not eventos._ruta("2025-01").exists()
+
+
+def test_migracion_del_legado_sin_duplicados(store, tmp_path):
+    ruta = str(tmp_path / "analytics.db")
+    filas = [(i, "s", "legacy", None, f"2025-0{1 + i % 2}-05T10:00:00") for i in range(1, 6)]
+    _legado(ruta, filas)
+    assert store.eventos.migrar_legado(ruta, limite=3) == 3
+    assert store.eventos.migrar_legado(ruta) == 2
+    assert store.eventos.migrar_legado(ruta) == 0
+    assert _contar(store.eventos) == 5
+
+    # El proceso murió después de copiar y antes del DELETE: las filas siguen en el legado
+    _legado(ruta, filas[3:])
+    assert store.eventos.migrar_legado(ruta) == 2
+    assert _contar(store.eventos) == 5
+
+
+def test_migracion_tras_recrear_analytics_db(store, tmp_path):
+    ruta = str(tmp_path / "analytics.db")
+    _legado(ruta, [(i, "s", "legacy", None, "2025-01-05T10:00:00") for i in (1, 2, 3)])
+    store.eventos.migrar_legado(ruta)
+
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    nuevo = AnalyticsStore(ruta, tmp_path / "eventos")
+    # Los ids vuelven a empezar en 1: no deben confundirse con los ya copiados
+    _legado(ruta, [(i, "s", "legacy", None, "2025-01-06T10:00:00") for i in (1, 2)])
+    assert nuevo.eventos.migrar_legado(ruta) == 2
+    assert _contar(nuevo.eventos) == 5
+
+
+def test_marca_de_migracion_anterior_se_reemplaza(tmp_path):
+    directorio = tmp_path / "eventos"
+    directorio.mkdir()
+    conn = sqlite3.connect(directorio / "events-2025-01.db")
+    conn.execute("CREATE TABLE migracion_legado (id INTEGER PRIMARY KEY CHECK (id = 1), ultimo_id INTEGER NOT NULL)")
+    conn.execute("INSERT INTO migracion_legado VALUES (1, 999)")
+    conn.commit()
+    conn.close()
+
+    eventos = EventosParticionados(directorio)
+    conn = eventos._conexion("2025-01")
+    assert [fila[1] for fila in conn.execute("PRAGMA table_info(migracion_legado)")] == ["origen", "ultimo_id"]
+
+
+def test_retencion_y_compactacion(tmp_path):
+    eventos = EventosParticionados(tmp_path / "eventos")
+    eventos.insertar(("s", "e", None, f"2025-{mes:02d}-10T00:00:00") for mes in range(1, 7))
+    assert eventos.compactar_cerrados(date(2025, 6, 1)) == ["2025-01", "2025-02", "2025-03", "2025-04"]
+    assert eventos.compactar_cerrados(date(2025, 6, 1)) == []  # Una sola vez por mes
+    assert eventos.aplicar_retencion(3, date(2025, 6, 20)) == ["2025-01", "2025-02", "2025-03"]
+    assert eventos.periodos() == ["2025-04", "2025-05", "2025-06"]
+    assert eventos.aplicar_retencion(0, date(2025, 6, 20)) == ["2025-04"]  # Nunca el mes anterior ni el actual
+
+
+def test_endpoint_embudo(cliente, auth_dashboard):
+    store = cliente.app.state.analytics_store
+    for i in range(12):
+        sesion = store.crear_sesion(None, "pytest", "desktop", None)
+        tipos = ["form_start", "question_viewed_q7"] + (["question_answered_q7", "form_submit"] if i < 3 else [])
+        store.insertar_eventos(sesion, [(tipo, None, "2018-05-10T10:00:00") for tipo in tipos])
+        store.insertar_eventos(sesion, [("form_start", None, "2018-05-11T10:00:00")])  # Misma sesión: cuenta una vez
+
+    parametros = {"start_date": "2018-05-01", "end_date": "2018-05-31"}
+    assert cliente.get("/api/analytics/funnel", params=parametros).status_code == 401
+    datos = cliente.get("/api/analytics/funnel", params=parametros, headers=auth_dashboard).json()
+    assert datos["funnel"] == {"form_starts": 12, "form_submits": 3, "questionnaire_starts": 0, "confirmations": 0}
+    assert datos["question_dropoff"]["q7"] == {"viewed": 12, "answered": 3, "dropoff_rate": 75.0}
+    assert datos["killer_question"] == {"question_id": "q7", "dropoff_rate": 75.0, "viewed": 12, "abandoned": 9}
+
+    for invalidos in ({"start_date": "2018-05-31", "end_date": "2018-05-01"},
+                      {"start_date": "2016-01-01", "end_date": "2018-05-01"}):
+        assert cliente.get("/api/analytics/funnel", params=invalidos, headers=auth_dashboard).status_code == 422
@@ -0,0 +1,91 @@
+# tests/test_geoip.py
+import ipaddress
+
+import pytest
+
+import geoip
+from geoip import TablaGeoIP, compilar_csv, ip_desde_scope
+
+CSV = """ip_start,ip_end,country
+1.0.0.0,1.0.0.255,AU
+8.8.8.0,8.8.8.255,US
+190.232.0.0,190.239.255.255,PE
+200.0.0.0,200.0.0.255,ZZ
+2001:4860::,2001:4860:ffff:ffff:ffff:ffff:ffff:ffff,US
+esto,no,es una fila
+"""
+# IP2Location LITE: enteros y nombre del país en la cuarta columna
+CSV_ENTEROS = '"3202875392","3203399679","PE","Peru"\n'
+
+
+def _scope(*xff, cliente="10.0.0.7"):
+    return {"headers": [(b"x-forwarded-for", valor.encode()) for valor in xff], "client": (cliente, 50000)}
+
+
+@pytest.fixture
+def tabla(tmp_path):
+    (tmp_path / "rangos.csv").write_text(CSV, encoding="utf-8")
+    assert compilar_csv(tmp_path / "rangos.csv", tmp_path / "geoip.bin") == 4  # Sin ZZ, encabezado ni basura
+    return TablaGeoIP(tmp_path / "geoip.bin")
+
+
+def test_xff_falsificado_no_cambia_la_ip():
+    # El cliente inventa entradas a la izquierda; el proxy confiable agrega la real al final
+    assert ip_desde_scope(_scope("1.2.3.4, 5.6.7.8, 190.232.1.1"), 1) == "190.232.1.1"
+    assert ip_desde_scope(_scope("1.2.3.4, 190.232.1.1, 10.1.1.1"), 2) == "190.232.1.1"
+
+
+def test_varios_encabezados_xff_son_una_sola_lista():
+    # El cliente manda su propio encabezado y el proxy agrega otro después
+    assert ip_desde_scope(_scope("1.2.3.4", "190.232.1.1"), 1) == "190.232.1.1"
+    assert ip_desde_scope(_scope("1.2.3.4", "190.232.1.1, 10.1.1.1"), 2) == "190.232.1.1"
+
+
+def test_sin_proxies_confiables_usa_la_conexion():
+    assert ip_desde_scope(_scope("1.2.3.4"), 0) == "10.0.0.7"
+    assert ip_desde_scope(_scope(), 1) == "10.0.0.7"  # Sin XFF: la conexión
+    assert ip_desde_scope(_scope("190.232.1.1"), 3) == "190.232.1.1"  # Menos entradas que proxies
+    assert ip_desde_scope({"headers": [], "client": None}, 0) == ""
+
+
+def test_por_defecto_no_confia_en_xff():
+    assert geoip.PROXIES_CONFIABLES == 0  # conftest no lo cambia; el default del módulo también es 0
+    assert ip_desde_scope(_scope("1.2.3.4")) == "10.0.0.7"
+
+
+@pytest.mark.parametrize("ip, esperado", [
+    ("1.0.0.0", ("AU", "AU")),
+    ("8.8.8.8", ("US", "US")),
+    ("190.235.10.10", ("PE", "PE")),
+    ("190.240.0.0", None),
+    ("9.9.9.9", None),
+    ("0.0.0.1", None),
+    ("200.0.0.1", None),
+    ("2001:4860:4860::8888", ("US", "US")),
+    ("2001:db8::1", None),
+])
+def test_busqueda_en_la_tabla(tabla, ip, esperado):
+    assert tabla.buscar(ipaddress.ip_address(ip)) == esperado
+
+
+def test_formato_ip2location(tmp_path):
+    (tmp_path / "lite.csv").write_text(CSV_ENTEROS, encoding="utf-8")
+    compilar_csv(tmp_path / "lite.csv", tmp_path / "geoip.bin")
+    assert TablaGeoIP(tmp_path / "geoip.bin").buscar(ipaddress.ip_address("190.239.0.1")) == ("Peru", "PE")
+
+
+def test_archivo_que_no_es_tabla(tmp_path):
+    (tmp_path / "otro.bin").write_bytes(b"\x00" * 64)
+    with pytest.raises(ValueError):
+        TablaGeoIP(tmp_path / "otro.bin")
+
+
+def test_resolver_pais_descarta_privadas(tabla, monkeypatch):
+    monkeypatch.setattr(geoip, "_tabla", tabla)
+    geoip.resolver_pais.cache_clear()
+    try:
+        assert geoip.resolver_pais("::ffff:190.232.1.1") == ("PE", "PE")  # IPv4 mapeada
+        assert geoip.resolver_pais("192.168.1.10") == (None, None)
+        assert geoip.resolver_pais("no-es-ip") == (None, None)
+    finally:
+        geoip.resolver_pais.cache_clear()
@@ -0,0 +1,118 @@
+# tests/test_lead_store.py
+import csv
+import io
+import json
+
+import pytest
+
+import lead_store
+from lead_store import CursorInvalido, LeadStore, codificar_cursor, decodificar_cursor, mascaras_respuestas
+
+
+def _lead(indice: int, created_at: str) -> dict:
+    return {
+        "created_at": created_at,
+        "nombre_lead": f"Lead {indice}",
+        "empresa": f"Empresa {indice}",
+        "email_lead": f"lead{indice}@example.com",
+        "numero_trabajadores": 10,
+        "tipo_empresa": "Micro",
+        "severidad_maxima": "Grave",
+        "monto_multa_soles": 100.0 + indice,
+        "total_incumplimientos": 1,
+        "resultado_completo_json": {"diagnostico": {"resumen_hallazgos": {"Grave": 1}}, "catalogo_version": "2026.1"},
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(lead_store, "TAMANO_LOTE", 3)  # Varios lotes con pocas filas
+    store = LeadStore(str(tmp_path / "leads.db"))
+    # Varios leads con el mismo created_at: el desempate por id debe mantener el orden
+    for indice in range(10):
+        store.guardar(_lead(indice, f"2026-02-0{1 + indice // 4}T10:00:00"), {"q1": "no", "q2": "si"})
+    return store
+
+
+def _empresas(lineas):
+    return [json.loads(linea)["empresa"] for linea in lineas]
+
+
+def test_mascaras_respuestas():
+    assert mascaras_respuestas({"q1": "NO", "q3": "si", "q41": "no", "x": "no", "q99": "no"}) == (
+        (1 << 0) | (1 << 2) | (1 << 40),
+        (1 << 0) | (1 << 40),
+    )
+
+
+def test_cursor_ida_y_vuelta():
+    cursor = codificar_cursor("2026-02-01T10:00:00", 42)
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == ("2026-02-01T10:00:00", 42)
+    for invalido in ("%%%", codificar_cursor("2026-02-01", 1)[:-3] + "!!", "c2lu"):
+        with pytest.raises(CursorInvalido):
+            decodificar_cursor(invalido)
+
+
+def test_iterar_en_lotes_ordenados(store):
+    lotes = list(store.iterar(columnas=["empresa"]))
+    assert [len(lote) for lote in lotes] == [3, 3, 3, 1]
+    assert [fila[2] for lote in lotes for fila in lote] == [f"Empresa {i}" for i in range(10)]
+
+
+def test_reanudar_exporte_desde_el_cursor(store):
+    primeras = b"".join(store.exportar_ndjson(limite=4)).decode().splitlines()
+    assert _empresas(primeras) == [f"Empresa {i}" for i in range(4)]
+
+    cursor = json.loads(primeras[-1])["cursor"]
+    resto = b"".join(store.exportar_ndjson(cursor=cursor)).decode().splitlines()
+    # Sin duplicados ni huecos, aunque el corte cae entre filas con el mismo created_at
+    assert _empresas(resto) == [f"Empresa {i}" for i in range(4, 10)]
+
+
+def test_filtros_de_fecha(store):
+    lineas = b"".join(store.exportar_ndjson(desde="2026-02-02", hasta="2026-02-03")).decode().splitlines()
+    assert _empresas(lineas) == [f"Empresa {i}" for i in range(4, 8)]
+    assert store.dias_con_leads(hasta="2026-02-03") == ["2026-02-01", "2026-02-02"]
+
+
+def test_exporte_csv_con_cursor_por_fila(store):
+    texto = b"".join(store.exportar_csv(limite=5)).decode()
+    filas = list(csv.reader(io.StringIO(texto)))
+    assert filas[0] == lead_store.COLUMNAS_EXPORTE + ["cursor"]
+    assert len(filas) == 6
+    resto = b"".join(store.exportar_csv(cursor=filas[-1][-1])).decode()
+    assert len(list(csv.reader(io.StringIO(resto)))) == 1 + 5
+
+
+def test_endpoint_exporte_requiere_token_admin(cliente, auth_dashboard):
+    assert cliente.get("/api/leads/export").status_code == 401
+    # Las credenciales del dashboard viajan en el bundle público: no alcanzan
+    assert cliente.get("/api/leads/export", headers=auth_dashboard).status_code == 401
+
+
+def test_endpoint_exporte_reanudable(cliente, auth_admin):
+    store = cliente.app.state.lead_store
+    for indice in range(5):
+        store.guardar(_lead(indice, f"2019-03-15T0{indice}:00:00"))
+
+    parametros = {"desde": "2019-03-15", "hasta": "2019-03-15", "limite": 2}
+    primera = cliente.get("/api/leads/export", params=parametros, headers=auth_admin)
+    assert primera.status_code == 200
+    assert primera.headers["content-type"] == "application/x-ndjson"
+    lineas = primera.text.splitlines()
+    assert _empresas(lineas) == ["Empresa 0", "Empresa 1"]
+
+    parametros = {"desde": "2019-03-15", "hasta": "2019-03-15", "cursor": json.loads(lineas[-1])["cursor"]}
+    segunda = cliente.get("/api/leads/export", params=parametros, headers=auth_admin)
+    assert _empresas(segunda.text.splitlines()) == ["Empresa 2", "Empresa 3", "Empresa 4"]
+
+
+@pytest.mark.parametrize("parametros", [
+    {"cursor": "%%%"},
+    {"formato": "xml"},
+    {"limite": 0},
+    {"desde": "15/03/2019"},
+])
+def test_endpoint_exporte_valida_parametros(cliente, auth_admin, parametros):
+    assert cliente.get("/api/leads/export", params=parametros, headers=auth_admin).status_code == 422
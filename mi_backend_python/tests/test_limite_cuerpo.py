@@ -0,0 +1,88 @@
+# tests/test_limite_cuerpo.py
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from conftest import FORMULARIO
+from limite_cuerpo import LimiteCuerpoMiddleware
+
+CHUNK = 1024
+
+
+async def eco(request):
+    return JSONResponse({"bytes": len(await request.body())})
+
+
+def crear_app():
+    app = Starlette(routes=[Route("/chico", eco, methods=["POST"]), Route("/grande", eco, methods=["POST", "GET"])])
+    return LimiteCuerpoMiddleware(app, limites=[("/grande", 10 * CHUNK)], limite_por_defecto=2 * CHUNK)
+
+
+@pytest.fixture
+def cliente_limitado():
+    return TestClient(crear_app())
+
+
+def _chunks(cantidad):
+    for _ in range(cantidad):
+        yield b"x" * CHUNK
+
+
+def test_limite_por_ruta(cliente_limitado):
+    assert cliente_limitado.post("/chico", content=b"x" * 2 * CHUNK).json() == {"bytes": 2 * CHUNK}
+    assert cliente_limitado.post("/chico", content=b"x" * (2 * CHUNK + 1)).status_code == 413
+    assert cliente_limitado.post("/grande", content=b"x" * 5 * CHUNK).status_code == 200
+    assert cliente_limitado.get("/grande").status_code == 200  # Sin cuerpo: no se limita
+
+
+def test_413_por_content_length_sin_llegar_al_endpoint(cliente_limitado):
+    respuesta = cliente_limitado.post("/chico", content=b"x" * 4 * CHUNK)
+    assert respuesta.status_code == 413
+    assert respuesta.headers["connection"] == "close"
+    assert respuesta.json() == {"detail": "Cuerpo de la request demasiado grande"}
+
+
+def test_413_en_streaming_chunked(cliente_limitado):
+    # Un generador se envía chunked: sin Content-Length, el tope se aplica al leer
+    assert cliente_limitado.post("/chico", content=_chunks(2)).json() == {"bytes": 2 * CHUNK}
+    respuesta = cliente_limitado.post("/chico", content=_chunks(50))
+    assert respuesta.status_code == 413
+
+
+def test_corta_la_lectura_en_el_primer_chunk_que_excede():
+    """Content-Length mentiroso: la lectura se corta sin consumir el resto del cuerpo."""
+    leidos = 0
+    enviados = []
+
+    async def receive():
+        nonlocal leidos
+        leidos += 1
+        return {"type": "http.request", "body": b"x" * CHUNK, "more_body": leidos < 100}
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/chico", "raw_path": b"/chico", "query_string": b"",
+        "headers": [(b"content-length", b"10")], "http_version": "1.1", "scheme": "http",
+        "server": ("testserver", 80), "client": ("127.0.0.1", 1234), "root_path": "",
+    }
+    asyncio.run(crear_app()(scope, receive, send))
+    assert enviados[0]["status"] == 413
+    assert leidos == 3  # Tope de 2 chunks + el que lo excede
+
+
+def test_formulario_acotado(cliente):
+    formulario = {**FORMULARIO, "respuestas": {"q1": "no"}}
+    assert cliente.post("/api/diagnostico", json=formulario).status_code == 200
+
+    for respuestas in ({"q42": "no"}, {"pregunta": "no"}, {"q1": "x" * 9}):
+        formulario = {**FORMULARIO, "respuestas": respuestas}
+        assert cliente.post("/api/diagnostico", json=formulario).status_code == 422
+
+    enorme = {**FORMULARIO, "empresa": "x" * 20_000}
+    assert cliente.post("/api/diagnostico", json=enorme).status_code == 413
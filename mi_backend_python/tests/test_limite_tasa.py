@@ -0,0 +1,193 @@
+# tests/test_limite_tasa.py
+import logging
+
+import pytest
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from limite_tasa import (
+    CUBETA, TAM_CABECERA, LimitadorTasa, LimiteTasaMiddleware, Presupuesto, TablaCompartida,
+    _presupuesto_env, crear_limitador_por_defecto,
+)
+
+T0 = 1_700_000_000.0
+CINCO_POR_MINUTO = Presupuesto("api", 5, 60)  # Una request cada 12 s, ráfaga de 5
+
+
+@pytest.fixture
+def tabla(tmp_path):
+    tabla = TablaCompartida(tmp_path / "limite.bin", cubetas=8)
+    yield tabla
+    tabla.cerrar()
+
+
+def test_gcra_permite_la_rafaga_y_luego_rechaza(tabla):
+    decisiones = [tabla.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0) for _ in range(5)]
+    assert all(decision.permitida for decision in decisiones)
+    assert [decision.restantes for decision in decisiones] == [4, 3, 2, 1, 0]
+
+    rechazo = tabla.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0)
+    assert not rechazo.permitida
+    assert rechazo.reintentar == pytest.approx(12.0)
+    assert tabla.consumir("ip|5.6.7.8", CINCO_POR_MINUTO, ahora=T0).permitida  # Cada clave tiene su presupuesto
+
+    # Se repone una request cada ventana/limite segundos
+    assert not tabla.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0 + 11.9).permitida
+    assert tabla.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0 + 12).permitida
+    assert tabla.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0 + 200).restantes == 4  # Ráfaga completa otra vez
+
+
+def test_encabezados_ratelimit(tabla):
+    permitida = tabla.consumir("clave", CINCO_POR_MINUTO, ahora=T0)
+    assert dict(permitida.encabezados()) == {
+        b"ratelimit-limit": b"5",
+        b"ratelimit-remaining": b"4",
+        b"ratelimit-reset": b"12",
+        b"ratelimit-policy": b"5;w=60",
+    }
+    for _ in range(4):
+        tabla.consumir("clave", CINCO_POR_MINUTO, ahora=T0)
+    rechazo = dict(tabla.consumir("clave", CINCO_POR_MINUTO, ahora=T0 + 0.5).encabezados())
+    assert (rechazo[b"ratelimit-remaining"], rechazo[b"ratelimit-reset"], rechazo[b"retry-after"]) == (b"0", b"60", b"12")
+
+
+def test_tabla_compartida_entre_procesos(tmp_path):
+    """Dos mapeos del mismo archivo (dos workers) comparten el presupuesto."""
+    worker_a = TablaCompartida(tmp_path / "limite.bin", cubetas=8)
+    worker_b = TablaCompartida(tmp_path / "limite.bin", cubetas=8)
+    try:
+        for _ in range(3):
+            assert worker_a.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0).permitida
+        assert worker_b.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0).restantes == 1
+        assert worker_a.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0).permitida
+        assert not worker_b.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0).permitida
+    finally:
+        worker_a.cerrar()
+        worker_b.cerrar()
+
+    # Otro número de cubetas: formato incompatible, la tabla se rehace vacía
+    distinta = TablaCompartida(tmp_path / "limite.bin", cubetas=2)
+    try:
+        assert (tmp_path / "limite.bin").stat().st_size == TAM_CABECERA + 2 * CUBETA.size
+        assert distinta.consumir("ip|1.2.3.4", CINCO_POR_MINUTO, ahora=T0).restantes == 4
+    finally:
+        distinta.cerrar()
+
+
+def test_memoria_fija_desaloja_la_clave_mas_proxima_a_reponerse(tmp_path):
+    tabla = TablaCompartida(tmp_path / "limite.bin", cubetas=1)  # Una sola cubeta de 4 claves
+    try:
+        for _ in range(5):
+            tabla.consumir("abusivo", CINCO_POR_MINUTO, ahora=T0)
+        for i in range(3):
+            tabla.consumir(f"ocasional-{i}", CINCO_POR_MINUTO, ahora=T0)
+        tabla.consumir("nuevo", CINCO_POR_MINUTO, ahora=T0)  # Cubeta llena: desaloja un ocasional, no al abusivo
+        assert (tmp_path / "limite.bin").stat().st_size == TAM_CABECERA + CUBETA.size
+        assert not tabla.consumir("abusivo", CINCO_POR_MINUTO, ahora=T0).permitida
+    finally:
+        tabla.cerrar()
+
+
+def test_limite_por_sesion(tabla, caplog):
+    limitador = LimitadorTasa(tabla, lambda scope: None, Presupuesto("sesion", 2, 60), proxies_confiables=0)
+    limitador.verificar_sesion("a1b2c3d4-sesion")
+    limitador.verificar_sesion("a1b2c3d4-sesion")
+    with caplog.at_level(logging.INFO), pytest.raises(HTTPException) as error:
+        limitador.verificar_sesion("a1b2c3d4-sesion")
+    assert error.value.status_code == 429
+    assert error.value.headers["ratelimit-policy"] == "2;w=60"
+    assert int(error.value.headers["retry-after"]) >= 1
+    assert [registro.levelno for registro in caplog.records] == [logging.INFO]
+
+
+async def ok(request):
+    return JSONResponse({"ok": True})
+
+
+async def sesion(request):
+    request.app.state.limitador.verificar_sesion("misma-sesion")
+    return JSONResponse({"ok": True})
+
+
+@pytest.fixture
+def cliente_limitado(tabla):
+    def clasificar(scope):
+        return None if scope["path"] == "/libre" else Presupuesto("api", 3, 60)
+
+    limitador = LimitadorTasa(tabla, clasificar, Presupuesto("sesion", 1, 60), proxies_confiables=1)
+    app = Starlette(routes=[Route("/api/x", ok), Route("/api/sesion", sesion), Route("/libre", ok)])
+    app.state.limitador = limitador
+    return TestClient(LimiteTasaMiddleware(app, limitador))
+
+
+def test_middleware_429_por_ip(cliente_limitado, caplog):
+    respuestas = [cliente_limitado.get("/api/x") for _ in range(3)]
+    assert [respuesta.headers["ratelimit-remaining"] for respuesta in respuestas] == ["2", "1", "0"]
+    assert all(respuesta.headers["ratelimit-policy"] == "3;w=60" for respuesta in respuestas)
+
+    with caplog.at_level(logging.INFO):
+        rechazo = cliente_limitado.get("/api/x")
+    assert rechazo.status_code == 429
+    assert rechazo.json()["detail"].startswith("Demasiadas requests")
+    assert int(rechazo.headers["retry-after"]) == 20
+    # INFO: un cliente abusivo no debe inflar los warnings de /health
+    assert {registro.levelno for registro in caplog.records} == {logging.INFO}
+
+    # Otra IP detrás del proxy confiable tiene su propio presupuesto
+    assert cliente_limitado.get("/api/x", headers={"x-forwarded-for": "203.0.113.9"}).status_code == 200
+    libre = cliente_limitado.get("/libre")
+    assert libre.status_code == 200 and "ratelimit-limit" not in libre.headers
+
+
+def test_429_por_sesion_conserva_sus_encabezados(cliente_limitado):
+    assert cliente_limitado.get("/api/sesion").headers["ratelimit-policy"] == "3;w=60"
+    rechazo = cliente_limitado.get("/api/sesion")
+    assert rechazo.status_code == 429
+    assert rechazo.headers["ratelimit-policy"] == "1;w=60"  # El presupuesto más restrictivo, sin duplicar
+    assert rechazo.headers.get_list("ratelimit-limit") == ["1"]
+
+
+@pytest.mark.parametrize("valor", ["abc", "10/x", "0/60", "10/0", "10/inf"])
+def test_presupuesto_env_invalido(monkeypatch, valor):
+    monkeypatch.setenv("RATE_LIMIT_API", valor)
+    with pytest.raises(ValueError, match="RATE_LIMIT_API"):
+        _presupuesto_env("api", 120, 60)
+
+
+def test_presupuesto_env(monkeypatch):
+    assert _presupuesto_env("api", 120, 60) == Presupuesto("api", 120, 60)
+    monkeypatch.setenv("RATE_LIMIT_API", "30")
+    assert _presupuesto_env("api", 120, 60) == Presupuesto("api", 30, 60)  # Sin ventana: la por defecto
+    monkeypatch.setenv("RATE_LIMIT_API", "30/10")
+    assert _presupuesto_env("api", 120, 60) == Presupuesto("api", 30, 10.0)
+
+
+def test_limitador_por_defecto(tmp_path, monkeypatch):
+    assert crear_limitador_por_defecto() is None  # conftest: RATE_LIMIT_HABILITADO=0
+
+    monkeypatch.setenv("RATE_LIMIT_HABILITADO", "1")
+    monkeypatch.setenv("RATE_LIMIT_ARCHIVO", str(tmp_path / "limite.bin"))
+    monkeypatch.setenv("RATE_LIMIT_CUBETAS", "4")
+    limitador = crear_limitador_por_defecto()
+    try:
+        def presupuesto(metodo, ruta):
+            resultado = limitador.clasificador({"method": metodo, "path": ruta})
+            return resultado and resultado.nombre
+
+        assert presupuesto("POST", "/api/diagnostico") == "diagnostico"
+        assert presupuesto("GET", "/api/diagnostico") == "api"
+        assert presupuesto("POST", "/api/analytics/session") == "sesiones"
+        assert presupuesto("POST", "/api/analytics/events/batch") == "analytics"
+        assert presupuesto("GET", "/api/leads/export") == "api"
+        assert presupuesto("GET", "/") is None
+        assert presupuesto("GET", "/health") is None
+        assert limitador.presupuesto_sesion == Presupuesto("sesion", 60, 60)
+
+        monkeypatch.setenv("RATE_LIMIT_CUBETAS", "0")
+        with pytest.raises(ValueError, match="RATE_LIMIT_CUBETAS"):
+            crear_limitador_por_defecto()
+    finally:
+        limitador.tabla.cerrar()
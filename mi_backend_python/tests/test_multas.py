@@ -0,0 +1,94 @@
+# tests/test_multas.py
+"""
+Paridad del motor de catálogo con el cálculo anterior (pandas + constants.py).
+
+fixtures/multas_baseline.json se generó una vez con la implementación
+anterior a las jurisdicciones sobre 132 formularios (tipos válidos e
+inválidos, cada borde de rango de trabajadores, respuestas en mayúsculas y
+preguntas exentas). El catálogo 2026.1 debe dar exactamente lo mismo.
+"""
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+import catalogo
+import main
+from conftest import FORMULARIO
+
+CASOS = json.loads((Path(__file__).parent / "fixtures" / "multas_baseline.json").read_text(encoding="utf-8"))
+
+CHILE = {
+    "nombre": "Chile - Dirección del Trabajo",
+    "moneda": "CLP",
+    "simbolo_moneda": "$",
+    "valor_referencia": 67000,
+    "clasificacion": {
+        "clases": ["micro", "grande"],
+        "por_defecto": "grande",
+        "por_trabajadores": [{"hasta": 9, "clase": "micro"}, {"hasta": None, "clase": "grande"}],
+    },
+    "tablas_multas": {
+        clase: {"unidad": "referencia", "pesos_severidad": {"Leves": 1, "Grave": 5, "Muy Grave": 10},
+                "rangos": [{"etiqueta": "todos", "hasta": None, "base": base}]}
+        for clase, base in (("micro", 1), ("grande", 3))
+    },
+    "infracciones": {"q1": {"severidad": "Grave", "articulo": "Art. 184 CT"}},
+}
+
+
+@pytest.fixture
+def con_chile(monkeypatch):
+    datos = json.loads(catalogo.CATALOGO_PATH.read_text(encoding="utf-8"))
+    datos = copy.deepcopy(datos)
+    datos["jurisdicciones"]["CL"] = CHILE
+    monkeypatch.setattr(catalogo, "_activo", catalogo.compilar(datos))
+
+
+@pytest.mark.parametrize("caso", CASOS, ids=[f"caso{i}" for i in range(len(CASOS))])
+def test_paridad_con_el_calculo_anterior(caso):
+    resultado = main.calcular_multa_sunafil(caso["entrada"])
+    esperado = caso["esperado"]
+    assert resultado["lead"]["tipo_empresa"] == esperado["tipo_empresa"]
+    assert resultado["diagnostico"]["severidad_maxima"] == esperado["severidad_maxima"]
+    assert resultado["diagnostico"]["total_incumplimientos"] == esperado["total_incumplimientos"]
+    assert resultado["diagnostico"]["resumen_hallazgos"] == esperado["resumen_hallazgos"]
+    assert [h["articulo"] for h in resultado["diagnostico"]["detalle_hallazgos"]] == esperado["articulos"]
+    assert resultado["multa"]["monto_final_soles"] == pytest.approx(esperado["monto_final_soles"], abs=1e-6)
+
+
+def test_los_casos_cubren_multas_y_exenciones():
+    assert catalogo.catalogo_activo().version == "2026.1"  # La base se generó con estos valores
+    assert sum(1 for caso in CASOS if caso["esperado"]["monto_final_soles"]) > 50
+    assert {"Micro", "Pequena", "No Mype", "Mediana", ""} <= {caso["esperado"]["tipo_empresa"] for caso in CASOS}
+
+
+def test_jurisdiccion_desconocida_usa_peru():
+    resultado = main.calcular_multa_sunafil(FORMULARIO, "BR")
+    assert resultado["jurisdiccion"]["codigo"] == "PE"
+    assert (resultado["multa"]["monto_final_soles"], resultado["multa"]["simbolo_moneda"]) == (2407.5, "S/")
+
+
+def test_otra_jurisdiccion_con_el_mismo_motor(con_chile):
+    resultado = main.calcular_multa_sunafil({**FORMULARIO, "tipo_empresa": "pequena", "numero_trabajadores": 50}, "cl")
+    assert resultado["jurisdiccion"]["codigo"] == "CL"
+    assert resultado["lead"]["tipo_empresa"] == "Pequena"  # El tipo declarado se conserva...
+    assert resultado["diagnostico"]["resumen_hallazgos"] == {"Leves": 0, "Grave": 1, "Muy Grave": 0}
+    assert resultado["multa"] == {"monto_final_soles": 3 * 5 * 67000.0, "rango_trabajadores": "todos",
+                                  "clase_empresa": "grande",  # ...pero no es clase de CL: se clasifica por trabajadores
+                                  "moneda": "CLP", "simbolo_moneda": "$"}
+    # Perú sigue igual en el mismo catálogo
+    assert main.calcular_multa_sunafil(FORMULARIO)["multa"]["monto_final_soles"] == 2407.5
+
+
+def test_endpoint_diagnostico(cliente, con_chile):
+    respuesta = cliente.post("/api/diagnostico", json=FORMULARIO)
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    assert datos["diagnostico"] == {"severidad_maxima": "Grave", "total_incumplimientos": 1, "monto_multa_soles": 2407.5}
+    informe = cliente.get(f"/api/diagnostico/{datos['diagnostico_id']}/report")
+    assert "S/ 2,407.50" in informe.text
+
+    chile = cliente.post("/api/diagnostico", json={**FORMULARIO, "jurisdiccion": "CL"}).json()
+    assert chile["diagnostico"]["monto_multa_soles"] == 5 * 67000.0  # "micro" sí es clase de CL
@@ -0,0 +1,107 @@
+# tests/test_perfilador.py
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+import perfilador
+from perfilador import MAX_SEGUNDOS, PerfilEnCurso, formatear, perfilar, perfilar_todos, workers_vivos
+
+
+def girar(parar: threading.Event) -> None:
+    while not parar.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def hilos():
+    """Un hilo trabajando (girar) y otro ocioso esperando un Event."""
+    parar = threading.Event()
+    trabajando = threading.Thread(target=girar, args=(parar,), name="trabajando", daemon=True)
+    ocioso = threading.Thread(target=parar.wait, name="ocioso", daemon=True)
+    trabajando.start()
+    ocioso.start()
+    yield
+    parar.set()
+    trabajando.join()
+    ocioso.join()
+
+
+def _pilas_de(conteos: Counter, hilo: str):
+    return [pila for pila in conteos if pila.startswith(f"{hilo};")]
+
+
+def test_muestrea_las_pilas_en_formato_collapsed(hilos):
+    conteos, muestras = asyncio.run(perfilar(0.3, hz=100))
+    assert muestras >= 10
+    pilas = _pilas_de(conteos, "trabajando")
+    assert pilas and all(";girar (test_perfilador.py:" in pila for pila in pilas)
+    assert not _pilas_de(conteos, "ocioso")  # Solo esperaba: se omite por defecto
+    assert not _pilas_de(conteos, "perfilador")  # El propio muestreador nunca aparece
+
+    conteos, _ = asyncio.run(perfilar(0.1, hz=100, incluir_ociosos=True))
+    assert _pilas_de(conteos, "ocioso")
+
+
+def test_un_solo_perfil_por_worker():
+    async def escenario():
+        primero = asyncio.create_task(perfilar(0.2))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PerfilEnCurso):
+            await perfilar(0.1)
+        await primero
+        await perfilar(0.01)  # Liberado al terminar
+
+    asyncio.run(escenario())
+
+
+def test_formatear():
+    conteos = Counter({"MainThread;main (app.py:1);a (app.py:5)": 3, "MainThread;main (app.py:1)": 7})
+    assert formatear(conteos, "worker-7;") == (
+        "worker-7;MainThread;main (app.py:1) 7\n"
+        "worker-7;MainThread;main (app.py:1);a (app.py:5) 3\n"
+    )
+
+
+def test_workers_vivos_por_latido(tmp_path, monkeypatch):
+    monkeypatch.setattr(perfilador, "PERFIL_DIR", tmp_path)
+    (tmp_path / "worker-101.vivo").touch()
+    caido = tmp_path / "worker-102.vivo"
+    caido.touch()
+    viejo = time.time() - perfilador.VIGENCIA_LATIDO - 1
+    os.utime(caido, (viejo, viejo))
+    (tmp_path / "worker-basura.vivo").touch()
+    assert workers_vivos() == {101}
+
+
+def test_fan_out_a_los_workers(tmp_path, monkeypatch, hilos):
+    monkeypatch.setattr(perfilador, "PERFIL_DIR", tmp_path)
+    monkeypatch.setattr(perfilador, "MARGEN_FAN_OUT", 0.3)
+    monkeypatch.setattr(perfilador, "INTERVALO_WATCHER", 0.05)
+    (tmp_path / "worker-999999.vivo").touch()  # Worker que dejó de responder
+
+    async def escenario():
+        watcher = asyncio.create_task(perfilador.vigilar_solicitudes(intervalo=0.05))
+        try:
+            return await perfilar_todos(0.3, hz=50)
+        finally:
+            watcher.cancel()
+
+    salida, respondieron, faltantes = asyncio.run(escenario())
+    assert respondieron == [os.getpid()]
+    assert faltantes == [999999]
+    assert salida and all(linea.startswith(f"worker-{os.getpid()};") for linea in salida.splitlines())
+
+
+def test_endpoint_requiere_admin(cliente, auth_admin, auth_dashboard):
+    assert cliente.get("/debug/profile", params={"seconds": 0.1}).status_code == 401
+    assert cliente.get("/debug/profile", params={"seconds": 0.1}, headers=auth_dashboard).status_code == 401
+    assert cliente.get("/debug/profile", params={"seconds": MAX_SEGUNDOS + 1}, headers=auth_admin).status_code == 422
+
+    respuesta = cliente.get("/debug/profile", params={"seconds": 0.2, "hz": 100}, headers=auth_admin)
+    assert respuesta.status_code == 200
+    assert int(respuesta.headers["x-profile-samples"]) > 0
+    assert respuesta.headers["x-profile-workers"] == "1"
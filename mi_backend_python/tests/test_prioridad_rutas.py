@@ -0,0 +1,173 @@
+# tests/test_prioridad_rutas.py
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from prioridad_rutas import (
+    ClaseRuta,
+    PlanificadorPrioridades,
+    PriorityLimiterMiddleware,
+    RequestDescartada,
+    clasificar_ruta,
+)
+
+
+async def ceder():
+    """Deja correr a las tareas despertadas (wait_for agrega pasos intermedios)."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def planificador(capacidad=4, reserva=2, max_cola=2, espera=1.0):
+    return PlanificadorPrioridades(
+        [
+            ClaseRuta("diagnostico", prioridad=0, limite=capacidad, max_cola=10, espera_max=espera, usa_reserva=True),
+            ClaseRuta("api", prioridad=1, limite=capacidad, max_cola=10, espera_max=espera),
+            ClaseRuta("analytics", prioridad=3, limite=capacidad, max_cola=max_cola, espera_max=espera,
+                      codigo_rechazo=429),
+        ],
+        capacidad=capacidad,
+        reserva_critica=reserva,
+    )
+
+
+@pytest.mark.parametrize("ruta, clase", [
+    ("/api/diagnostico", "diagnostico"),
+    ("/api/diagnostico/abc/informe", "api"),
+    ("/api/analytics/events/batch", "analytics"),
+    ("/api/analytics/stream", None),
+    ("/health", None),
+    ("/debug/profile", None),
+    ("/assets/index.js", "estatico"),
+])
+def test_clasificar_ruta(ruta, clase):
+    assert clasificar_ruta({"path": ruta}) == clase
+
+
+def test_reserva_solo_para_diagnostico():
+    async def escenario():
+        p = planificador()
+        analytics, diagnostico = p.clases["analytics"], p.clases["diagnostico"]
+        await p.adquirir(analytics)
+        await p.adquirir(analytics)
+        # La capacidad compartida (4 - 2 reservados) está llena: analytics espera...
+        espera = asyncio.create_task(p.adquirir(analytics))
+        await asyncio.sleep(0)
+        assert analytics.en_cola == 1
+        # ...pero el diagnóstico entra directo por la reserva
+        await asyncio.wait_for(p.adquirir(diagnostico), 0.1)
+        await asyncio.wait_for(p.adquirir(diagnostico), 0.1)
+        assert p.en_curso_total == 4
+        p.liberar(diagnostico)
+        p.liberar(diagnostico)
+        assert not espera.done()  # Liberar reserva no alcanza: sigue sobre el techo compartido
+        p.liberar(analytics)
+        await asyncio.wait_for(espera, 0.1)
+        assert analytics.en_curso == 2 and analytics.en_cola == 0
+
+    asyncio.run(escenario())
+
+
+def test_cola_llena_y_espera_agotada():
+    async def escenario():
+        p = planificador(max_cola=1, espera=0.05)
+        analytics = p.clases["analytics"]
+        await p.adquirir(analytics)
+        await p.adquirir(analytics)
+        espera = asyncio.create_task(p.adquirir(analytics))
+        await asyncio.sleep(0)
+        with pytest.raises(RequestDescartada, match="cola llena"):
+            await p.adquirir(analytics)
+        with pytest.raises(RequestDescartada, match="espera agotada"):
+            await espera
+        assert analytics.en_cola == 0
+        assert analytics.descartadas == 2
+
+    asyncio.run(escenario())
+
+
+def test_cupo_liberado_va_a_la_clase_mas_prioritaria():
+    async def escenario():
+        p = planificador(capacidad=2, reserva=0)
+        api, analytics, diagnostico = p.clases["api"], p.clases["analytics"], p.clases["diagnostico"]
+        await p.adquirir(api)
+        await p.adquirir(api)
+        orden = []
+
+        async def esperar(clase):
+            await p.adquirir(clase)
+            orden.append(clase.nombre)
+
+        tareas = [asyncio.create_task(esperar(analytics)), asyncio.create_task(esperar(diagnostico))]
+        await asyncio.sleep(0)
+        p.liberar(api)
+        await ceder()
+        assert orden == ["diagnostico"]
+        p.liberar(api)
+        await asyncio.gather(*tareas)
+        assert orden == ["diagnostico", "analytics"]
+
+    asyncio.run(escenario())
+
+
+def test_cancelar_mientras_espera_no_pierde_cupos():
+    async def escenario():
+        p = planificador(capacidad=1, reserva=0)
+        api = p.clases["api"]
+        await p.adquirir(api)
+        espera = asyncio.create_task(p.adquirir(api))
+        await asyncio.sleep(0)
+        espera.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await espera
+        assert api.en_cola == 0
+        p.liberar(api)
+        assert p.en_curso_total == 0
+        await asyncio.wait_for(p.adquirir(api), 0.1)
+
+    asyncio.run(escenario())
+
+
+def test_middleware_libera_el_cupo_antes_de_las_background_tasks():
+    p = planificador(capacidad=1, reserva=0)
+    observado = {}
+
+    async def tarea_lenta():
+        observado["en_curso_durante_background"] = p.en_curso_total
+
+    async def endpoint(request):
+        return PlainTextResponse("ok", background=BackgroundTask(tarea_lenta))
+
+    app = PriorityLimiterMiddleware(Starlette(routes=[Route("/api/x", endpoint)]), planificador=p)
+    with TestClient(app) as cliente:
+        assert cliente.get("/api/x").text == "ok"
+    assert observado["en_curso_durante_background"] == 0
+    assert p.en_curso_total == 0
+    assert p.clases["api"].atendidas == 1
+
+
+def test_middleware_rechaza_con_el_codigo_de_la_clase():
+    p = planificador(capacidad=2, reserva=2, max_cola=0)
+
+    async def endpoint(request):
+        return PlainTextResponse("ok")
+
+    app = PriorityLimiterMiddleware(Starlette(routes=[Route("/api/analytics/event", endpoint)]), planificador=p)
+    with TestClient(app) as cliente:
+        respuesta = cliente.get("/api/analytics/event")
+    assert respuesta.status_code == 429
+    assert respuesta.headers["retry-after"] == "1"
+    assert p.clases["analytics"].descartadas == 1
+
+
+def test_health_prioridades_requiere_token_admin(cliente, auth_admin, auth_dashboard):
+    assert cliente.get("/health/prioridades").status_code == 401
+    assert cliente.get("/health/prioridades", headers=auth_dashboard).status_code == 401
+    respuesta = cliente.get("/health/prioridades", headers=auth_admin)
+    assert respuesta.status_code == 200
+    assert set(respuesta.json()["clases"]) == {"diagnostico", "api", "estatico", "analytics"}
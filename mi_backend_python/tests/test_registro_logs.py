@@ -0,0 +1,141 @@
+# tests/test_registro_logs.py
+import logging
+
+import pytest
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from analytics_store import AnalyticsStore
+from prioridad_rutas import ClaseRuta, PlanificadorPrioridades, PriorityLimiterMiddleware
+from registro_logs import UMBRAL_CRITICO, ContadorVentana, MonitorLogs
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalyticsStore(str(tmp_path / "analytics.db"), tmp_path / "eventos")
+
+
+@pytest.fixture
+def logger(store):
+    """Logger aislado con el handler del monitor (instalar() lo pondría en el root)."""
+    monitor = MonitorLogs(store, tamano=5)
+    logger = logging.getLogger("prueba.registro_logs")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(monitor.manejador)
+    yield logger, monitor
+    logger.removeHandler(monitor.manejador)
+
+
+def test_contador_ventana_deslizante():
+    contador = ContadorVentana(ventana=180, resolucion=60)
+    contador.sumar(0)
+    contador.sumar(61, 2)
+    assert contador.total(120) == 3
+    assert contador.total(180) == 2  # La cubeta del minuto 0 salió de la ventana
+    contador.sumar(10)  # Demasiado viejo: se ignora
+    assert contador.total(180) == 2
+    assert contador.total(10_000) == 0
+
+
+def test_solo_se_persiste_warning_o_superior(logger, store):
+    logger, monitor = logger
+    logger.info("request atendida")
+    logger.warning("lento")
+    try:
+        raise RuntimeError("falló")
+    except RuntimeError:
+        logger.exception("error con traceback")
+    assert len(monitor.pendientes) == 2  # INFO no llega al buffer ni a SQLite
+
+    monitor.sincronizar()
+    assert not monitor.pendientes
+    assert [fila[2] for fila in store.logs_despues_de(0, 10)] == ["WARNING", "ERROR"]
+    recientes = monitor.ultimos(10)
+    assert [log["message"] for log in recientes] == ["error con traceback", "lento"]
+    assert recientes[0]["module"] == "prueba.registro_logs"
+    assert "RuntimeError: falló" in recientes[0]["traceback"]
+    assert monitor.ultimos(10, "error") == recientes[:1]
+    assert monitor.ultimos(10, "DEBUG") == []
+
+
+def test_buffer_circular_y_merge_por_id(logger):
+    logger, monitor = logger
+    for i in range(8):
+        logger.error(f"error {i}")
+    logger.critical("crítico")  # Mismo buffer que ERROR
+    logger.warning("aviso")
+    monitor.sincronizar()
+    assert [log["message"] for log in monitor.ultimos(10, "ERROR")] == ["crítico"] + [f"error {i}" for i in (7, 6, 5, 4)]
+    assert [log["message"] for log in monitor.ultimos(3)] == ["aviso", "crítico", "error 7"]
+
+
+def test_salud_desde_contadores(logger, store):
+    logger, monitor = logger
+    assert monitor.salud()["status"] == "healthy"
+    logger.warning("aviso")
+    logger.error("uno")
+    monitor.sincronizar()
+    salud = monitor.salud()
+    assert (salud["status"], salud["errors_24h"], salud["errors_1h"], salud["warnings_24h"]) == ("warning", 1, 1, 1)
+
+    for i in range(UMBRAL_CRITICO):
+        logger.error(f"más {i}")
+    monitor.sincronizar()
+    assert monitor.salud()["status"] == "critical"
+
+    store.crear_sesion("desktop", "pytest", "desktop", None, None, None)
+    monitor.sincronizar()
+    assert monitor.salud()["sessions_today"] == 1
+
+
+def test_otro_worker_ve_los_logs_y_arranca_con_historial(logger, store):
+    logger, monitor = logger
+    logger.error("desde el worker A")
+    monitor.sincronizar()
+
+    otro = MonitorLogs(store, tamano=5)
+    otro.cargar_inicial()
+    assert otro.ultimos(1)[0]["message"] == "desde el worker A"
+    assert otro.salud()["errors_24h"] == 1
+
+    logger.error("nuevo en A")
+    monitor.sincronizar()
+    otro.sincronizar()
+    assert otro.ultimos(1)[0]["message"] == "nuevo en A"
+    assert otro.salud()["errors_24h"] == 2
+
+
+def test_fallo_de_la_base_no_pierde_logs(logger, store, monkeypatch):
+    logger, monitor = logger
+    logger.error("pendiente")
+
+    def sin_base(logs):
+        raise OSError("base bloqueada")
+
+    monkeypatch.setattr(store, "insertar_logs", sin_base)
+    monitor.sincronizar()
+    assert [log[2] for log in monitor.pendientes] == ["pendiente"]  # Vuelve a la cola para el próximo ciclo
+    monkeypatch.undo()
+    monitor.sincronizar()
+    assert [log["message"] for log in monitor.ultimos(5)][-1] == "pendiente"
+
+
+def test_descartes_por_sobrecarga_no_se_persisten(caplog):
+    """Los 429/descartes van a INFO: bajo carga no inundan system_logs ni la salud."""
+    planificador = PlanificadorPrioridades(
+        [ClaseRuta("analytics", prioridad=3, limite=0, max_cola=0, espera_max=0.1, codigo_rechazo=429)],
+        capacidad=1,
+        reserva_critica=0,
+    )
+    with caplog.at_level(logging.INFO), TestClient(PriorityLimiterMiddleware(Starlette(), planificador=planificador)) as c:
+        assert c.get("/api/analytics/event").status_code == 429
+    descartes = [r for r in caplog.records if "descartada" in r.getMessage()]
+    assert [r.levelno for r in descartes] == [logging.INFO]
+
+
+def test_endpoints_requieren_dashboard(cliente, auth_dashboard):
+    assert cliente.get("/api/analytics/logs").status_code == 401
+    assert cliente.get("/api/analytics/health").status_code == 401
+    assert cliente.get("/api/analytics/logs", params={"level": "ERROR", "limit": 20}, headers=auth_dashboard).status_code == 200
+    assert cliente.get("/api/analytics/health", headers=auth_dashboard).json()["status"] in ("healthy", "warning", "critical")
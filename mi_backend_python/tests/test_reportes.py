@@ -0,0 +1,137 @@
+# tests/test_reportes.py
+import asyncio
+import os
+import time
+
+import pytest
+
+from conftest import FORMULARIO
+from reportes import GeneradorReportes, clave_reporte, renderizar_html
+
+RESULTADO = {
+    "lead": {"tipo_empresa": "Micro Empresa"},
+    "diagnostico": {
+        "severidad_maxima": "Muy Grave",
+        "total_incumplimientos": 2,
+        "resumen_hallazgos": {"Muy Grave": 1, "Grave": 1, "Leves": 0},
+        "detalle_hallazgos": [
+            {"articulo": "Art. 28.10", "severidad": "Muy Grave", "descripcion": "<script>x</script>"},
+            {"articulo": "Art. 27.11", "severidad": "Grave", "descripcion": "Sin política de SST"},
+        ],
+    },
+    "multa": {"monto_final_soles": 2407.5, "rango_trabajadores": "10"},
+    "catalogo_version": "2026.1",
+}
+
+
+class Contador:
+    """cargar_resultado que cuenta las llamadas (solo debe correr en un cache miss)."""
+
+    def __init__(self):
+        self.llamadas = 0
+
+    def __call__(self):
+        self.llamadas += 1
+        return RESULTADO
+
+
+@pytest.fixture
+def generador(tmp_path):
+    generador = GeneradorReportes(tmp_path / "reportes", procesos=1)
+    yield generador
+    generador.cerrar()
+
+
+def test_html_escapa_y_formatea():
+    documento = renderizar_html(RESULTADO)
+    assert "S/ 2,407.50" in documento
+    assert "&lt;script&gt;" in documento and "<script>" not in documento
+    assert "Sin política de SST" in documento
+    assert "No se identificaron incumplimientos" in renderizar_html({})
+
+
+def test_clave_depende_solo_de_las_entradas():
+    base = clave_reporte("2026.1", 3, 1, "Micro", "10")
+    assert base == clave_reporte("2026.1", 3, 1, "micro", "10")
+    assert base == clave_reporte("2026.1", 3, 1, "Micro", "10", "PE")  # Las claves de Perú no cambian
+    assert base != clave_reporte("2026.1", 3, 1, "Micro", "10", "CL")
+    assert base != clave_reporte("2026.2", 3, 1, "Micro", "10")
+    assert clave_reporte(None, None, None, None, None, resultado_json="{}") != clave_reporte(
+        None, None, None, None, None, resultado_json="{ }")
+
+
+def test_renders_concurrentes_se_coalescen(generador):
+    cargar = Contador()
+
+    async def escenario():
+        rutas = await asyncio.gather(*(generador.obtener("abc", "html", cargar) for _ in range(5)))
+        assert len(set(rutas)) == 1
+        await generador.obtener("abc", "html", cargar)  # Ya en caché
+
+    asyncio.run(escenario())
+    assert cargar.llamadas == 1
+    assert "Informe de Diagnóstico SST" in (generador.directorio / "abc.html").read_text(encoding="utf-8")
+    assert [p.name for p in generador.directorio.iterdir()] == ["abc.html"]  # Sin temporales
+
+
+def test_leer_regenera_si_el_barrido_borra_el_archivo(generador, monkeypatch):
+    cargar = Contador()
+    obtener = generador.obtener
+    barridos = []
+
+    async def obtener_y_barrer(clave, formato, cargar_resultado):
+        destino = await obtener(clave, formato, cargar_resultado)
+        if not barridos:
+            barridos.append(destino)
+            destino.unlink()  # Otro worker barrió la caché entre obtener y leer
+        return destino
+
+    monkeypatch.setattr(generador, "obtener", obtener_y_barrer)
+    contenido = asyncio.run(generador.leer("abc", "html", cargar))
+    assert b"Informe de Diagn" in contenido
+    assert cargar.llamadas == 2
+
+
+def test_leer_se_rinde_tras_varios_barridos(generador, monkeypatch):
+    async def siempre_barrido(clave, formato, cargar_resultado):
+        return generador.ruta(clave, formato)
+
+    monkeypatch.setattr(generador, "obtener", siempre_barrido)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(generador.leer("abc", "html", Contador()))
+
+
+def test_limpiar_por_antiguedad_y_tamano(generador):
+    directorio = generador.directorio
+    ahora = time.time()
+    for i in range(10):
+        archivo = directorio / f"r{i}.html"
+        archivo.write_bytes(b"x" * 100_000)
+        os.utime(archivo, (ahora - i * 3600, ahora - i * 3600))
+    vencido = directorio / "viejo.pdf"
+    vencido.write_bytes(b"x")
+    os.utime(vencido, (ahora - 40 * 86400, ahora - 40 * 86400))
+    (directorio / "abc.html.123.tmp").write_bytes(b"x" * 500_000)  # Render en curso: no se toca
+
+    borrados, restantes = generador.limpiar(ttl_dias=30, max_mb=0.5)
+    assert not vencido.exists()
+    # Sobre el tope se borran los más antiguos hasta quedar en el 90 %
+    assert sorted(p.name for p in directorio.glob("*.html")) == [f"r{i}.html" for i in range(4)]
+    assert (borrados, restantes) == (7, 400_000)
+    assert (directorio / "abc.html.123.tmp").exists()
+
+
+def test_endpoint_informe_con_etag(cliente):
+    diagnostico_id = cliente.post("/api/diagnostico", json=FORMULARIO).json()["diagnostico_id"]
+    url = f"/api/diagnostico/{diagnostico_id}/report"
+
+    respuesta = cliente.get(url)
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"] == "text/html; charset=utf-8"
+    assert "Constructora" not in respuesta.text and "ana@example.com" not in respuesta.text  # Sin datos personales
+    etag = respuesta.headers["etag"]
+
+    assert cliente.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert cliente.get(url, params={"formato": "docx"}).status_code == 422
+    assert cliente.get("/api/diagnostico/no-es-un-id/report").status_code == 404
+    assert cliente.get(f"/api/diagnostico/{'0' * 32}/report").status_code == 404
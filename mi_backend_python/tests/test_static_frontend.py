@@ -0,0 +1,108 @@
+# tests/test_static_frontend.py
+import gzip
+import os
+
+import brotli
+import pytest
+from starlette.testclient import TestClient
+
+from static_frontend import (
+    CACHE_CORTO,
+    CACHE_INMUTABLE,
+    CACHE_SIN_CACHE,
+    MAX_BYTES_EN_MEMORIA,
+    StaticFrontend,
+    precomprimir,
+)
+
+INDEX = b"<!DOCTYPE html><html><body><div id=root></div>" + b" " * 2048 + b"</body></html>"
+SCRIPT = b"console.log('calculadora');\n" * 200
+
+
+@pytest.fixture
+def build(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(INDEX)
+    (tmp_path / "assets" / "index-3f9a1c.js").write_bytes(SCRIPT)
+    (tmp_path / "assets" / "grande-77aa00.js").write_bytes(os.urandom(MAX_BYTES_EN_MEMORIA * 3))
+    (tmp_path / "favicon.ico").write_bytes(b"\x00\x00\x01\x00")
+    precomprimir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def cliente_estatico(build):
+    return TestClient(StaticFrontend(build))
+
+
+def test_precomprimir_genera_variantes_solo_si_reducen(build):
+    assert gzip.decompress((build / "assets" / "index-3f9a1c.js.gz").read_bytes()) == SCRIPT
+    assert brotli.decompress((build / "assets" / "index-3f9a1c.js.br").read_bytes()) == SCRIPT
+    assert not (build / "favicon.ico.gz").exists()  # Muy pequeño y no comprimible
+    assert not (build / "assets" / "grande-77aa00.js.gz").exists()  # Aleatorio: no gana nada
+
+
+@pytest.mark.parametrize("accept_encoding, esperada", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+])
+def test_elige_variante_segun_accept_encoding(cliente_estatico, accept_encoding, esperada):
+    respuesta = cliente_estatico.get("/assets/index-3f9a1c.js", headers={"Accept-Encoding": accept_encoding})
+    assert respuesta.status_code == 200
+    assert respuesta.headers.get("content-encoding") == esperada
+    assert respuesta.headers["vary"] == "Accept-Encoding"
+    assert respuesta.content == SCRIPT
+
+
+def test_cache_control_por_tipo_de_archivo(cliente_estatico):
+    assert cliente_estatico.get("/assets/index-3f9a1c.js").headers["cache-control"] == CACHE_INMUTABLE
+    assert cliente_estatico.get("/").headers["cache-control"] == CACHE_SIN_CACHE
+    assert cliente_estatico.get("/favicon.ico").headers["cache-control"] == CACHE_CORTO
+
+
+def test_etag_por_variante_y_304(cliente_estatico):
+    gzip_etag = cliente_estatico.get("/assets/index-3f9a1c.js", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    br_etag = cliente_estatico.get("/assets/index-3f9a1c.js", headers={"Accept-Encoding": "br"}).headers["etag"]
+    assert gzip_etag != br_etag
+
+    respuesta = cliente_estatico.get(
+        "/assets/index-3f9a1c.js", headers={"Accept-Encoding": "gzip", "If-None-Match": f"W/{gzip_etag}"}
+    )
+    assert respuesta.status_code == 304
+    assert respuesta.content == b""
+    # El ETag de otra variante no valida la caché de esta
+    respuesta = cliente_estatico.get(
+        "/assets/index-3f9a1c.js", headers={"Accept-Encoding": "gzip", "If-None-Match": br_etag}
+    )
+    assert respuesta.status_code == 200
+
+
+def test_if_modified_since(cliente_estatico):
+    ultima = cliente_estatico.get("/favicon.ico").headers["last-modified"]
+    assert cliente_estatico.get("/favicon.ico", headers={"If-Modified-Since": ultima}).status_code == 304
+
+
+def test_fallback_spa_y_rutas_de_api(cliente_estatico):
+    respuesta = cliente_estatico.get("/dashboard/resumen")
+    assert respuesta.status_code == 200
+    assert respuesta.content == INDEX
+    assert cliente_estatico.get("/api/no-existe").status_code == 404
+
+
+def test_archivo_grande_se_sirve_desde_disco(build, cliente_estatico):
+    frontend = cliente_estatico.app
+    assert frontend.archivos["/assets/grande-77aa00.js"].variantes["identity"].contenido is None
+    respuesta = cliente_estatico.get("/assets/grande-77aa00.js")
+    assert respuesta.status_code == 200
+    assert respuesta.content == (build / "assets" / "grande-77aa00.js").read_bytes()
+
+
+def test_head_y_metodos_no_permitidos(cliente_estatico):
+    respuesta = cliente_estatico.head("/assets/index-3f9a1c.js", headers={"Accept-Encoding": "identity"})
+    assert respuesta.status_code == 200
+    assert respuesta.content == b""
+    assert int(respuesta.headers["content-length"]) == len(SCRIPT)
+    assert cliente_estatico.post("/index.html").status_code == 405
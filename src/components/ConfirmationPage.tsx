@@ -1,6 +1,6 @@
 import React from 'react';
 import { motion } from 'framer-motion';
-import { UserCheck, Clock, CheckCircle, MessageCircle } from 'lucide-react';
+import { UserCheck, Clock, CheckCircle, MessageCircle, FileText } from 'lucide-react';
 
 interface ConfirmationPageProps {
   email: string;
@@ -11,6 +11,7 @@ interface ConfirmationPageProps {
   tipoEmpresa: 'micro' | 'pequena' | 'no_mype' | '';
   multaPotencial: number;
   hasInfractions: boolean;
+  reporteUrl?: string;
   onRestart: () => void;
 }
 
@@ -99,7 +100,8 @@ export const ConfirmationPage: React.FC<ConfirmationPageProps> = ({
   numeroTrabajadores,
   tipoEmpresa,
   multaPotencial,
-  hasInfractions
+  hasInfractions,
+  reporteUrl
 }) => {
   // Helper para formatear tipo de empresa
   const formatTipoEmpresa = (tipo: string) => {
@@ -325,6 +327,21 @@ export const ConfirmationPage: React.FC<ConfirmationPageProps> = ({
             </motion.a>
           </motion.div>
 
+          {/* Informe descargable (detalle de hallazgos con artículo y severidad) */}
+          {reporteUrl && (
+            <motion.div className="mt-4 relative z-10" variants={itemVariants}>
+              <a
+                href={reporteUrl}
+                target="_blank"
+                rel="noopener noreferrer"
+                className="inline-flex items-center gap-2 text-sm font-semibold text-[#0056b4] dark:text-[#4d9fff] hover:underline underline-offset-2"
+              >
+                <FileText className="w-4 h-4" />
+                Ver informe detallado del diagnóstico
+              </a>
+            </motion.div>
+          )}
+
           {/* Contact Information - Minimal, professional */}
           <motion.div
             className="mt-6 text-xs text-slate-500 dark:text-slate-500 relative z-10"
@@ -29,6 +29,7 @@ export const SSTDiagnosis: React.FC = () => {
   const [questionnaireData, setQuestionnaireData] = useState<QuestionnaireData>({});
   const [calculatedFine, setCalculatedFine] = useState<number>(0);
   const [hasInfractions, setHasInfractions] = useState<boolean>(true);
+  const [diagnosticoId, setDiagnosticoId] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
@@ -79,6 +80,8 @@ export const SSTDiagnosis: React.FC = () => {
         throw new Error('La respuesta del servidor no fue exitosa.');
       }
 
+      const resultado = await response.json();
+      setDiagnosticoId(resultado.diagnostico_id ?? null);
       setCurrentStep(3);
     } catch (error) {
       setError("Ocurrió un error al procesar el diagnóstico. Por favor, inténtalo de nuevo más tarde.");
@@ -100,6 +103,7 @@ export const SSTDiagnosis: React.FC = () => {
       tipoEmpresa: '',
     });
     setQuestionnaireData({});
+    setDiagnosticoId(null);
     setError(null);
   };
 
@@ -145,6 +149,7 @@ export const SSTDiagnosis: React.FC = () => {
             tipoEmpresa={companyData.tipoEmpresa}
             multaPotencial={calculatedFine}
             hasInfractions={hasInfractions}
+            reporteUrl={diagnosticoId ? `${import.meta.env.VITE_API_URL}/api/diagnostico/${diagnosticoId}/report` : undefined}
             onRestart={handleRestart}
           />
         </Suspense>
@@ -6,6 +6,75 @@ const HEARTBEAT_INTERVAL = 60000; // 60 segundos
 // Clave para almacenar session_id en sessionStorage
 const SESSION_STORAGE_KEY = 'analytics_session_id';
 
+// Eventos acumulados y enviados en lote a /api/analytics/events/batch
+const BATCH_FLUSH_INTERVAL = 5000; // 5 segundos
+const BATCH_MAX_EVENTS = 25;
+
+interface QueuedEvent {
+  event_type: string;
+  event_data: string | null;
+  ts: number;
+}
+
+// Cola compartida entre todas las instancias del hook
+let eventQueue: QueuedEvent[] = [];
+let flushTimeout: number | null = null;
+
+/**
+ * Envía los eventos acumulados en un solo request.
+ * Con useBeacon=true (al ocultar/cerrar la página) usa navigator.sendBeacon,
+ * que sobrevive a la descarga de la página. Se envía como text/plain para
+ * evitar el preflight CORS.
+ */
+function flushEvents(useBeacon = false): void {
+  if (flushTimeout !== null) {
+    window.clearTimeout(flushTimeout);
+    flushTimeout = null;
+  }
+  const sessionId = sessionStorage.getItem(SESSION_STORAGE_KEY);
+  if (!sessionId || eventQueue.length === 0) return;
+
+  const events = eventQueue;
+  eventQueue = [];
+  const url = `${API_URL}/api/analytics/events/batch`;
+  const body = JSON.stringify({ session_id: sessionId, events });
+
+  if (useBeacon && navigator.sendBeacon?.(url, new Blob([body], { type: 'text/plain' }))) {
+    return;
+  }
+
+  fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'text/plain' },
+    body,
+    keepalive: true
+  }).then(() => {
+    if (import.meta.env.DEV) {
+      console.log(`📊 Batch enviado: ${events.length} eventos`);
+    }
+  }).catch((error) => {
+    if (import.meta.env.DEV) {
+      console.warn('⚠️ Failed to send event batch:', error);
+    }
+  });
+}
+
+function scheduleFlush(): void {
+  if (eventQueue.length >= BATCH_MAX_EVENTS) {
+    flushEvents();
+  } else if (flushTimeout === null) {
+    flushTimeout = window.setTimeout(() => flushEvents(), BATCH_FLUSH_INTERVAL);
+  }
+}
+
+// Vaciar la cola cuando la página se oculta o se cierra
+if (typeof window !== 'undefined') {
+  window.addEventListener('pagehide', () => flushEvents(true));
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flushEvents(true);
+  });
+}
+
 /**
  * Hook para tracking de analytics.
  * Gestiona sesiones, eventos y heartbeats.
@@ -53,7 +122,7 @@ export function useAnalytics() {
   }, []);
 
   /**
-   * Envía un evento de tracking.
+   * Encola un evento de tracking (se envía en lote).
    */
   const trackEvent = useCallback(async (
     eventType: string, 
@@ -73,24 +142,15 @@ export function useAnalytics() {
       return;
     }
 
-    try {
-      await fetch(`${API_URL}/api/analytics/event`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          session_id: sessionId,
-          event_type: eventType,
-          event_data: eventData ? JSON.stringify(eventData) : null
-        })
-      });
+    eventQueue.push({
+      event_type: eventType,
+      event_data: eventData ? JSON.stringify(eventData) : null,
+      ts: Date.now()
+    });
+    scheduleFlush();
 
-      if (import.meta.env.DEV) {
-        console.log(`📊 Event tracked: ${eventType}`, eventData || '');
-      }
-    } catch (error) {
-      if (import.meta.env.DEV) {
-        console.warn('⚠️ Failed to track event:', error);
-      }
+    if (import.meta.env.DEV) {
+      console.log(`📊 Event queued: ${eventType}`, eventData || '');
     }
   }, [getSessionId]);
 
@@ -148,6 +208,7 @@ export function useAnalytics() {
   useEffect(() => {
     return () => {
       stopHeartbeat();
+      flushEvents();
     };
   }, [stopHeartbeat]);
 
@@ -157,6 +218,7 @@ export function useAnalytics() {
     sendHeartbeat,
     startHeartbeat,
     stopHeartbeat,
-    getCurrentSessionId
+    getCurrentSessionId,
+    flushEvents
   };
 }
@@ -140,6 +140,26 @@ interface HealthStatus {
     timestamp: string;
 }
 
+interface LiveSnapshot {
+    active_users: number;
+    sessions_today: number;
+    conversions_today: number;
+    conversion_amount_today: number;
+    errors_24h: number;
+    status: HealthStatus['status'];
+    timestamp: string;
+}
+
+interface LiveDelta {
+    new_sessions?: number;
+    conversions?: number;
+    conversion_amount?: number;
+    active_users?: number;
+    errors_24h?: number;
+    status?: HealthStatus['status'];
+    errors?: SystemLog[];
+}
+
 interface DevicesResponse {
     devices: DeviceData[];
     total_sessions: number;
@@ -168,6 +188,19 @@ const API_URL = import.meta.env.VITE_API_URL || '';
 const DASHBOARD_USER = import.meta.env.VITE_DASHBOARD_USER || '';
 const DASHBOARD_PASSWORD = import.meta.env.VITE_DASHBOARD_PASSWORD || '';
 
+// Refresco completo (KPIs por rango, embudo, mapa, canales). Lo que cambia en
+// tiempo real llega por el stream SSE de /api/analytics/stream.
+const FULL_REFRESH_MS = 5 * 60 * 1000;
+const LIVE_RETRY_MS = 5000;
+
+const authHeaders = (): HeadersInit => {
+    const headers: HeadersInit = {};
+    if (DASHBOARD_USER && DASHBOARD_PASSWORD) {
+        headers['Authorization'] = `Basic ${btoa(`${DASHBOARD_USER}:${DASHBOARD_PASSWORD}`)}`;
+    }
+    return headers;
+};
+
 // Chart configurations
 const funnelChartConfig: ChartConfig = {
     count: { label: "Cantidad" },
@@ -282,10 +315,7 @@ export default function Dashboard() {
         setLoading(true);
         setError(null);
         try {
-            const headers: HeadersInit = {};
-            if (DASHBOARD_USER && DASHBOARD_PASSWORD) {
-                headers['Authorization'] = `Basic ${btoa(`${DASHBOARD_USER}:${DASHBOARD_PASSWORD}`)}`;
-            }
+            const headers = authHeaders();
 
             // Construir query params de fecha
             const dateParams = `start_date=${startDate}&end_date=${endDate}`;
@@ -347,10 +377,93 @@ export default function Dashboard() {
 
     useEffect(() => {
         fetchData();
-        const interval = setInterval(fetchData, 30000);
+        const interval = setInterval(fetchData, FULL_REFRESH_MS);
         return () => clearInterval(interval);
     }, [startDate, endDate]);
 
+    // Feed en vivo: SSE leído con fetch (EventSource no permite enviar el header
+    // Authorization). Snapshot al conectar y luego a lo sumo un delta por segundo.
+    useEffect(() => {
+        const controller = new AbortController();
+        let retryTimer: ReturnType<typeof setTimeout> | undefined;
+        const includesToday = endDate >= new Date().toISOString().split('T')[0];
+
+        const applyEvent = (type: string, payload: LiveSnapshot | LiveDelta) => {
+            if (type === 'snapshot') {
+                const snapshot = payload as LiveSnapshot;
+                setData(prev => prev && { ...prev, kpis: { ...prev.kpis, active_users: snapshot.active_users } });
+                setHealth({
+                    status: snapshot.status,
+                    errors_24h: snapshot.errors_24h,
+                    sessions_today: snapshot.sessions_today,
+                    timestamp: snapshot.timestamp,
+                });
+            } else if (type === 'delta') {
+                const delta = payload as LiveDelta;
+                setData(prev => prev && {
+                    ...prev,
+                    kpis: {
+                        ...prev.kpis,
+                        active_users: delta.active_users ?? prev.kpis.active_users,
+                        total_conversions: prev.kpis.total_conversions + (includesToday ? delta.conversions ?? 0 : 0),
+                    },
+                });
+                if (delta.new_sessions || delta.errors_24h !== undefined) {
+                    setHealth(prev => prev && {
+                        ...prev,
+                        sessions_today: prev.sessions_today + (delta.new_sessions ?? 0),
+                        errors_24h: delta.errors_24h ?? prev.errors_24h,
+                        status: delta.status ?? prev.status,
+                    });
+                }
+                if (delta.errors?.length) {
+                    const newest = [...delta.errors].reverse();
+                    setCriticalLogs(prev => [...newest, ...prev].slice(0, 20));
+                    setLogs(prev => [...newest, ...prev].slice(0, 50));
+                }
+            }
+            setLastUpdated(new Date());
+        };
+
+        const connect = async () => {
+            try {
+                const response = await fetch(`${API_URL}/api/analytics/stream`, {
+                    headers: authHeaders(),
+                    signal: controller.signal,
+                });
+                if (!response.ok || !response.body) throw new Error(`Stream no disponible (${response.status})`);
+                const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += value;
+                    let separator: number;
+                    while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                        const block = buffer.slice(0, separator);
+                        buffer = buffer.slice(separator + 2);
+                        let eventType = 'message';
+                        let eventData = '';
+                        for (const line of block.split('\n')) {
+                            if (line.startsWith('event: ')) eventType = line.slice(7);
+                            else if (line.startsWith('data: ')) eventData += line.slice(6);
+                        }
+                        if (eventData) applyEvent(eventType, JSON.parse(eventData));
+                    }
+                }
+            } catch {
+                // Se reintenta abajo; el refresco completo sigue funcionando sin el stream
+            }
+            if (!controller.signal.aborted) retryTimer = setTimeout(connect, LIVE_RETRY_MS);
+        };
+
+        connect();
+        return () => {
+            controller.abort();
+            clearTimeout(retryTimer);
+        };
+    }, [endDate]);
+
     const formatCurrency = (value: number) =>
         new Intl.NumberFormat('es-PE', { style: 'currency', currency: 'PEN', minimumFractionDigits: 0 }).format(value);
 